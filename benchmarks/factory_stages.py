@@ -0,0 +1,319 @@
+"""
+Times every ZineFactory stage (scan, thumbnails, LaTeX content, LaTeX index) on its own and end
+to end, cold and warm, on a reproducible synthetic corpus of JPEG images with realistic EXIF data
+and sidecar files. Records wall time, CPU time (including worker processes) and peak RSS.
+Every measurement runs in a fresh process, its prerequisites in another one (see run_stage), so
+that the peak RSS is the one of the stage. It is the largest of the main process and of any single
+worker process, and includes the library loaded from the metadata cache for the stages after the scan.
+
+Results can be saved as JSON, and compared against a previous result file: any metric worse than
+the baseline by more than the threshold is flagged as a regression (exit code 1).
+
+Usage: python -m benchmarks.factory_stages [--count 200] [--width 3000] [--height 2000]
+                                           [--output results.json] [--baseline baseline.json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import logging
+import platform
+import resource
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from PIL import Image
+from PIL.ExifTags import Base, IFD
+from PIL.TiffImagePlugin import IFDRational
+
+from ziny.zine_factory import ZineFactory
+
+
+CAMERAS = [('FUJIFILM', 'X-T10'), ('FUJIFILM', 'X-T4'), ('SONY', 'ILCE-7M3')]
+LENSES = [('FUJIFILM', 'XF14mmF2.8 R'), ('FUJIFILM', 'XF35mmF2 R WR'), ('FUJIFILM', 'XF90mmF2 R LM WR'),
+          ('COSINA', 'VOIGTLANDER ULTRON 27mm F2')]
+APERTURES = [(2, 1), (28, 10), (4, 1), (56, 10), (8, 1), (11, 1)]
+SPEEDS = [(1, 60), (1, 125), (1, 250), (1, 1000), (1, 4000), (1, 2)]
+COMPENSATIONS = [(0, 1), (1, 3), (-2, 3), (1, 1)]
+
+STAGES = ('scan', 'thumbnails', 'latex_content', 'latex_index', 'end_to_end', 'end_to_end_warm')
+METRICS = ('wall_s', 'cpu_s', 'peak_rss_mb')
+
+corpus_file_name = 'corpus.json'
+repository_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthetic_image(width:int, height:int, rng:random.Random) -> Image.Image:
+    """
+    Smooth gradients with some grain: compresses and decodes like a photo, unlike pure noise.
+    """
+
+    channels = list()
+    for _ in range(3):
+        gradient = Image.linear_gradient('L').rotate(rng.choice([0, 90, 180, 270]))
+        channels.append(gradient.resize((width, height), Image.Resampling.BILINEAR))
+
+    grain = Image.effect_noise((width, height), rng.uniform(20, 60)).convert('RGB')
+
+    return Image.blend(Image.merge('RGB', channels), grain, 0.15)
+
+
+def synthetic_exif(index:int, rng:random.Random) -> Image.Exif:
+    """
+    EXIF data as written by the cameras of the zine: IFD0 plus the Exif sub-IFD.
+    """
+
+    make, model = rng.choice(CAMERAS)
+    lens_make, lens_model = rng.choice(LENSES)
+
+    exif = Image.Exif()
+    exif[Base.Make] = make
+    exif[Base.Model] = model
+
+    ifd = exif.get_ifd(IFD.Exif)
+    ifd[Base.DateTimeOriginal] = f'20{rng.randint(14, 24)}:{rng.randint(1, 12):02d}:{rng.randint(1, 28):02d} 12:00:{index % 60:02d}'
+    ifd[Base.FNumber] = IFDRational(*rng.choice(APERTURES))
+    ifd[Base.ExposureTime] = IFDRational(*rng.choice(SPEEDS))
+    ifd[Base.ExposureBiasValue] = IFDRational(*rng.choice(COMPENSATIONS))
+    ifd[Base.ISOSpeedRatings] = rng.choice([160, 200, 400, 800, 3200])
+    ifd[Base.MeteringMode] = rng.choice([2, 3, 5])
+    ifd[Base.ExposureProgram] = rng.choice([1, 2, 3])
+    ifd[Base.WhiteBalance] = rng.choice([0, 1])
+    ifd[Base.LensMake] = lens_make
+    ifd[Base.LensModel] = lens_model
+
+    return exif
+
+
+def generate_corpus(folder:str, count:int, width:int, height:int, seed:int = 0) -> dict:
+    """
+    Create the corpus in folder (images/, sidecar files, dictionary.json) unless a corpus with
+    the same parameters is already there. Return the corpus parameters.
+    """
+
+    config = dict(count=count, width=width, height=height, seed=seed)
+    corpus_file_path = os.path.join(folder, corpus_file_name)
+    try:
+        with open(corpus_file_path) as corpus_file:
+            if json.load(corpus_file) == config:
+                return config
+    except Exception:
+        pass
+
+    shutil.rmtree(folder, ignore_errors=True)
+    image_folder = os.path.join(folder, 'images')
+    os.makedirs(image_folder)
+    shutil.copy(os.path.join(repository_folder, 'dictionary.json'), folder)
+
+    rng = random.Random(seed)
+    for index in range(count):
+        # About a third of portrait images.
+        size = (height, width) if rng.random() < 0.33 else (width, height)
+        image_path = os.path.join(image_folder, f'{index:05d}.jpg')
+        synthetic_image(*size, rng).save(image_path, exif=synthetic_exif(index, rng), quality=90)
+
+        sidecar = json.loads(ZineFactory.sidecar_template)
+        if index % 5 == 0:
+            sidecar['overwrites']['description'] = f'Synthetic photo {index}.'
+        with open(image_path + '.json', 'w') as sidecar_file:
+            json.dump(sidecar, sidecar_file, indent=4)
+
+    with open(corpus_file_path, 'w') as corpus_file:
+        json.dump(config, corpus_file)
+
+    return config
+
+
+def clean_outputs(folder:str) -> None:
+    """
+    Remove everything ZineFactory generates, so that a run starts cold.
+    """
+
+    shutil.rmtree(os.path.join(folder, ZineFactory.thumbnail_folder), ignore_errors=True)
+    for path in (os.path.join('images', ZineFactory.metadata_cache_file_name), 'images.tex', 'index.tex',
+                 'images.tex.fragments.json', 'index.tex.fragments.json'):
+        if os.path.exists(os.path.join(folder, path)):
+            os.remove(os.path.join(folder, path))
+
+
+def get_steps(factory:ZineFactory) -> dict:
+    """
+    Factory methods run by every stage.
+    """
+
+    steps = dict(
+        scan=[factory.scan],
+        thumbnails=[factory.generate_thumbnails],
+        latex_content=[factory.generate_latex_content],
+        latex_index=[factory.generate_latex_index],
+    )
+    steps['end_to_end'] = [step for name in ('scan', 'thumbnails', 'latex_content', 'latex_index') for step in steps[name]]
+    steps['end_to_end_warm'] = steps['end_to_end']
+
+    return steps
+
+
+def prepare_stage(folder:str, stage:str, jobs:int) -> None:
+    """
+    Start from a clean corpus folder, then run the prerequisites of a stage: a first scan (filling
+    the metadata cache), or a first complete run for the warm measurement. Runs in its own process.
+    """
+
+    logging.disable(logging.WARNING)
+    os.chdir(folder)
+    clean_outputs(folder)
+
+    factory = ZineFactory(image_folder='images/', jobs=jobs)
+    if stage == 'end_to_end_warm':
+        for step in get_steps(factory)['end_to_end']:
+            step()
+    elif stage not in ('scan', 'end_to_end'):
+        factory.scan()
+
+
+def run_stage(folder:str, stage:str, jobs:int) -> dict:
+    """
+    Run one stage in the prepared corpus folder (see prepare_stage), in a fresh process. Stages after
+    the scan first load the library from the metadata cache, which is not measured.
+    """
+
+    logging.disable(logging.WARNING)
+    os.chdir(folder)
+
+    factory = ZineFactory(image_folder='images/', jobs=jobs)
+    if stage not in ('scan', 'end_to_end', 'end_to_end_warm'):
+        factory.scan()
+    measured = get_steps(factory)[stage]
+
+    self_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+
+    for step in measured:
+        step()
+
+    wall_time = time.perf_counter() - start
+    self_after = resource.getrusage(resource.RUSAGE_SELF)
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    cpu_time = sum(
+        after.ru_utime - before.ru_utime + after.ru_stime - before.ru_stime
+        for before, after in ((self_before, self_after), (children_before, children_after))
+    )
+
+    # ru_maxrss is in kB on Linux, bytes on macOS. Worker processes count for their own peak.
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    peak_rss = max(self_after.ru_maxrss, children_after.ru_maxrss) / scale
+
+    return dict(wall_s=wall_time, cpu_s=cpu_time, peak_rss_mb=peak_rss)
+
+
+def measure_stage(folder:str, stage:str, jobs:int, repeat:int) -> dict:
+    """
+    Median wall and CPU time, and maximal peak RSS, over repeated runs of a stage.
+    """
+
+    # Spawned, not forked: a forked process starts with the memory of this one (eg. the corpus generation).
+    context = multiprocessing.get_context('spawn')
+    runs = list()
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            pool.submit(prepare_stage, folder, stage, jobs).result()
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            runs.append(pool.submit(run_stage, folder, stage, jobs).result())
+
+    return dict(
+        wall_s=statistics.median(run['wall_s'] for run in runs),
+        cpu_s=statistics.median(run['cpu_s'] for run in runs),
+        peak_rss_mb=max(run['peak_rss_mb'] for run in runs),
+    )
+
+
+def compare(results:dict, baseline:dict, threshold:float) -> list:
+    """
+    Return the (stage, metric, baseline value, value) regressions: values worse than the baseline
+    by more than threshold (relative). Differences under 10 ms or 1 MB are ignored as noise.
+    """
+
+    noise = dict(wall_s=0.01, cpu_s=0.01, peak_rss_mb=1.0)
+    regressions = list()
+    for stage, metrics in results['stages'].items():
+        reference = baseline.get('stages', dict()).get(stage)
+        if reference is None:
+            continue
+        for metric in METRICS:
+            value, reference_value = metrics[metric], reference.get(metric)
+            if reference_value is None:
+                continue
+            if value - reference_value > max(noise[metric], threshold * reference_value):
+                regressions.append((stage, metric, reference_value, value))
+
+    return regressions
+
+
+@click.command()
+@click.option('--count', type=int, default=200, help='Number of images in the synthetic corpus')
+@click.option('--width', type=int, default=3000, help='Long edge of the synthetic images, in pixels')
+@click.option('--height', type=int, default=2000, help='Short edge of the synthetic images, in pixels')
+@click.option('--seed', type=int, default=0, help='Seed of the synthetic corpus')
+@click.option('--corpus', default='.benchmark_corpus/', help='Folder of the synthetic corpus, reused between runs')
+@click.option('--jobs', type=int, default=None, help='Number of worker processes (default: CPU count)')
+@click.option('--repeat', type=int, default=3, help='Runs per stage, the median is kept')
+@click.option('--stage', 'stages', multiple=True, type=click.Choice(STAGES), help='Stages to measure (default: all)')
+@click.option('--output', default=None, help='Save the results to this JSON file')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='Compare the results with this JSON result file')
+@click.option('--threshold', type=float, default=0.10, help='Relative increase over the baseline flagged as a regression')
+def main(count:int, width:int, height:int, seed:int, corpus:str, jobs:int, repeat:int, stages:tuple,
+         output:str, baseline:str, threshold:float) -> int:
+
+    folder = os.path.abspath(corpus)
+    print(f'Generating corpus in `{folder}`...')
+    config = generate_corpus(folder, count, width, height, seed)
+
+    results = dict(
+        corpus=config,
+        jobs=jobs or os.cpu_count() or 1,
+        repeat=repeat,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        stages=dict(),
+    )
+
+    print(f'{"stage":<18} {"wall (s)":>9} {"cpu (s)":>9} {"peak RSS (MB)":>14}')
+    for stage in stages or STAGES:
+        metrics = measure_stage(folder, stage, jobs, repeat)
+        results['stages'][stage] = metrics
+        print(f'{stage:<18} {metrics["wall_s"]:>9.3f} {metrics["cpu_s"]:>9.3f} {metrics["peak_rss_mb"]:>14.1f}')
+
+    if output is not None:
+        with open(output, 'w') as output_file:
+            json.dump(results, output_file, indent=4)
+        print(f'Results saved to `{output}`.')
+
+    if baseline is None:
+        return 0
+
+    with open(baseline) as baseline_file:
+        reference = json.load(baseline_file)
+
+    if reference.get('corpus') != config or reference.get('jobs') != results['jobs']:
+        print('Warning: the baseline was measured on a different corpus or number of jobs.')
+
+    regressions = compare(results, reference, threshold)
+    for stage, metric, reference_value, value in regressions:
+        increase = f'+{(value - reference_value) / reference_value:.0%}' if reference_value else 'was 0'
+        print(f'REGRESSION {stage} {metric}: {reference_value:.3f} -> {value:.3f} ({increase})')
+    if not regressions:
+        print(f'No regression against `{baseline}` (threshold {threshold:.0%}).')
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(standalone_mode=False))
@@ -0,0 +1,86 @@
+"""
+Measures the memory footprint of a ZineFactory library, in bytes per image, for a synthetic
+catalog of metadata records with a realistic amount of repetition (few cameras and lenses,
+mostly untouched sidecars).
+
+Usage: python -m benchmarks.metadata_memory [--count 100000]
+"""
+
+import gc
+import sys
+import json
+import random
+import tracemalloc
+
+import click
+
+from ziny.zine_factory import ZineFactory
+from ziny.zine_image_metadata import ZineImageMetadata
+
+
+CAMERAS = [('Fujifilm', 'X-T10'), ('Fujifilm', 'X-T4'), ('Sony', 'ILCE-7M3')]
+LENSES = [('Fujifilm', 'XF 14mm f/2.8 R'), ('Fujifilm', 'XF 35mm f/2.0'), ('Cosina', 'Voigtländer Ultron 27mm f/2.0')]
+
+
+def synthetic_record(index:int, rng:random.Random) -> ZineImageMetadata:
+    """
+    Build one record the way the metadata cache does (from_dict), with a template sidecar.
+    """
+
+    make, model = rng.choice(CAMERAS)
+    lens_make, lens_model = rng.choice(LENSES)
+    meta = ZineImageMetadata.from_dict(dict(
+        id = index + 1,
+        image_path = f'images/{index:06d}.jpg',
+        thumbnail_path = f'thumbnails/{index:06d}.jpg',
+        timestamp = rng.choice(['March 2016', 'April 2016', 'July 2021']),
+        description = None,
+        make = make,
+        model = model,
+        lens_make = lens_make,
+        lens_model = lens_model,
+        aperture = f'f/{rng.choice([2.0, 2.8, 5.6, 8.0]):.1f}',
+        speed = f'1/{rng.choice([60, 125, 250, 500])} sec',
+        iso = rng.choice([200, 400, 800]),
+        exposure_compensation = rng.choice(['+0', '+1/3', '-2/3']),
+        program = 'Aperture Priority',
+        metering_mode = 'Matrix',
+        white_balance = 'Auto'
+    ))
+    meta.sidecar = ZineImageMetadata.share_sidecar(json.loads(ZineFactory.sidecar_template))
+
+    return meta
+
+
+@click.command()
+@click.option('--count', type=int, default=100000, help='Number of images in the synthetic library')
+def main(count:int) -> int:
+
+    rng = random.Random(0)
+
+    # Warm up shared state (substitution dictionary, shared sidecar) outside the measurement.
+    synthetic_record(0, rng)
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    factory = ZineFactory(image_folder='images/', use_cache=False)
+    for index in range(count):
+        meta = synthetic_record(index, rng)
+        factory.library[meta.image_path] = meta
+
+    gc.collect()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'Images:            {count}')
+    print(f'Library size:      {(after - before) / 1024 / 1024:.1f} MB')
+    print(f'Bytes per image:   {(after - before) / count:.0f}')
+    print(f'Peak during build: {(peak - before) / 1024 / 1024:.1f} MB')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(standalone_mode=False))
@@ -0,0 +1,78 @@
+"""
+Compares the per-entry LaTeX rendering (ZineIndexTemplate, content_template.format) with the
+batch rendering of ZineTemplateEngine on a synthetic library, and checks both produce the
+exact same output.
+
+Usage: python -m benchmarks.template_engine [--count 100000]
+"""
+
+import sys
+import time
+import random
+
+import click
+
+from ziny.zine_factory import ZineFactory
+from ziny.zine_index_template import ZineIndexTemplate
+from ziny.zine_template_engine import ZineTemplateEngine
+from benchmarks.metadata_memory import synthetic_record
+
+
+def render_per_entry(metas:list) -> tuple:
+    """
+    Previous rendering: one template object per index entry, string concatenation, one format per figure.
+    """
+
+    content = str()
+    index = str()
+    for meta in metas:
+        content += ZineFactory.content_template.format(**meta.to_dict())
+        template = ZineIndexTemplate()
+        template.configure(meta=meta)
+        index += template.get_template()
+
+    return content, index
+
+
+def render_batch(metas:list) -> tuple:
+    """
+    ZineTemplateEngine rendering, joined once per output.
+    """
+
+    engine = ZineTemplateEngine(ZineFactory.content_template)
+
+    return ''.join(engine.render_content_batch(metas)), ''.join(engine.render_index_batch(metas))
+
+
+@click.command()
+@click.option('--count', type=int, default=100000, help='Number of images in the synthetic library')
+def main(count:int) -> int:
+
+    rng = random.Random(0)
+    metas = list()
+    for index in range(count):
+        meta = synthetic_record(index, rng)
+        if index % 10 == 0:
+            meta.description = f'Description of photo {index}.'
+        metas.append(meta)
+
+    start = time.perf_counter()
+    reference = render_per_entry(metas)
+    per_entry_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    candidate = render_batch(metas)
+    batch_time = time.perf_counter() - start
+
+    identical = reference == candidate
+
+    print(f'Entries:        {count}')
+    print(f'Per entry:      {per_entry_time:.3f} s')
+    print(f'Batch engine:   {batch_time:.3f} s ({per_entry_time / batch_time:.1f}x)')
+    print(f'Identical:      {identical}')
+
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(standalone_mode=False))
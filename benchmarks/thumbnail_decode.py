@@ -0,0 +1,94 @@
+"""
+Compares the thumbnail decoding profiles of ZineFactory: wall time and peak RSS per image, and
+the visual difference of every profile against the full resolution decode.
+
+Usage: python -m benchmarks.thumbnail_decode [--folder images/] [--tolerance 4.0]
+"""
+
+import os
+import sys
+import time
+import resource
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from PIL import Image, ImageChops, ImageStat
+
+from ziny.zine_factory import ZineFactory
+from ziny.zine_image_processing import render_thumbnail
+
+
+def measure(job:tuple) -> tuple:
+    """
+    Render one thumbnail in a fresh process. Returns (wall time, peak RSS increase in MB, error).
+    """
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    _, error = render_thumbnail(job)
+    wall_time = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in kB on Linux, bytes on macOS.
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return wall_time, (rss_after - rss_before) / scale, error
+
+
+def visual_difference(reference_path:str, candidate_path:str) -> float:
+    """
+    Mean absolute pixel difference (0-255) between two thumbnails, averaged over channels.
+    """
+
+    with Image.open(reference_path) as reference, Image.open(candidate_path) as candidate:
+        if reference.size != candidate.size:
+            candidate = candidate.resize(reference.size, Image.Resampling.LANCZOS)
+        difference = ImageChops.difference(reference.convert('RGB'), candidate.convert('RGB'))
+        channels = ImageStat.Stat(difference).mean
+
+    return sum(channels) / len(channels)
+
+
+@click.command()
+@click.option('--folder', default='images/', help='Folder of source JPEG images')
+@click.option('--tolerance', type=float, default=4.0, help='Maximum mean pixel difference (0-255) against the full decode')
+def main(folder:str, tolerance:float) -> int:
+
+    images = sorted(
+        os.path.join(root, file)
+        for root, _, files in os.walk(folder) for file in files
+        if file.endswith('.jpg') and not file.endswith('front.jpg')
+    )
+
+    failed = False
+    with tempfile.TemporaryDirectory() as output_folder:
+
+        print(f'{"image":<32} {"profile":<8} {"wall (s)":>9} {"peak RSS (MB)":>14} {"diff":>6}')
+
+        for image_path in images:
+            outputs = dict()
+            for profile, reducing_gap in ZineFactory.thumbnail_profiles.items():
+                outputs[profile] = os.path.join(output_folder, f'{profile}-{os.path.basename(image_path)}')
+                job = (image_path, outputs[profile], ZineFactory.thumbnail_size,
+                       ZineFactory.thumbnail_resampling, reducing_gap)
+
+                # One process per measurement so that peak RSS is not shared between runs.
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    wall_time, peak_rss, error = pool.submit(measure, job).result()
+
+                if error is not None:
+                    print(f'{image_path:<32} {profile:<8} {error}')
+                    failed = True
+                    continue
+
+                difference = visual_difference(outputs['full'], outputs[profile])
+                verdict = '' if difference <= tolerance else ' FAIL'
+                failed = failed or bool(verdict)
+
+                print(f'{image_path:<32} {profile:<8} {wall_time:>9.3f} {peak_rss:>14.1f} {difference:>6.2f}{verdict}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(standalone_mode=False))
@@ -0,0 +1,96 @@
+"""
+Compares the web build with screen resolution images against the originals: rendering time and
+image payload for a few long edge / quality settings and, if pdflatex is available, the size and
+compile time of the content PDF built with images.tex (originals) and images-web.tex.
+Run from the zine folder, after make.py (images.tex, images-web.tex, index.tex and thumbnails).
+
+Usage: python -m benchmarks.web_images [--folder images/] [--setting 2000:85] [--pdflatex pdflatex]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+import click
+
+from ziny.zine_factory import ZineFactory
+from ziny.zine_image_processing import render_web_image
+
+
+def compile_content(pdflatex:str, images_file:str, output_folder:str) -> tuple:
+    """
+    Compile content.tex (two passes) with the given images file. Return (PDF size, time), or None.
+    """
+
+    os.makedirs(output_folder, exist_ok=True)
+    command = [
+        pdflatex, '-interaction=nonstopmode', '-halt-on-error', '-output-directory=' + output_folder,
+        '-jobname=content', f'\\def\\zineimages{{{images_file}}}\\input{{content.tex}}'
+    ]
+
+    start = time.perf_counter()
+    for _ in range(2):
+        if subprocess.run(command, capture_output=True).returncode != 0:
+            return None
+
+    return os.path.getsize(os.path.join(output_folder, 'content.pdf')), time.perf_counter() - start
+
+
+@click.command()
+@click.option('--folder', default='images/', help='Folder of source JPEG images')
+@click.option('--setting', 'settings', multiple=True, default=['1600:80', '2000:85', '2500:90'],
+              help='Long edge and JPEG quality, as LONG_EDGE:QUALITY (repeatable)')
+@click.option('--pdflatex', default='pdflatex', help='pdflatex executable, for the PDF comparison')
+def main(folder:str, settings:tuple, pdflatex:str) -> int:
+
+    images = sorted(
+        os.path.join(root, file)
+        for root, _, files in os.walk(folder) for file in files
+        if file.endswith('.jpg') and not file.endswith('front.jpg')
+    )
+    original_size = sum(os.path.getsize(image_path) for image_path in images)
+
+    print(f'Images: {len(images)}, originals: {original_size / 1e6:.1f} MB')
+    print(f'{"long edge":>9} {"quality":>8} {"render (s)":>11} {"size (MB)":>10} {"ratio":>6}')
+
+    with tempfile.TemporaryDirectory() as output_folder:
+        for setting in settings:
+            long_edge, quality = (int(value) for value in setting.split(':'))
+
+            start = time.perf_counter()
+            web_size = 0
+            for image_path in images:
+                web_image_path = os.path.join(output_folder, os.path.basename(image_path))
+                _, error = render_web_image((image_path, web_image_path, long_edge, quality))
+                if error is not None:
+                    print(f'{image_path}: {error}')
+                    return 1
+                web_size += os.path.getsize(web_image_path)
+            render_time = time.perf_counter() - start
+
+            print(f'{long_edge:>9} {quality:>8} {render_time:>11.2f} {web_size / 1e6:>10.1f} {web_size / original_size:>6.0%}')
+
+        if shutil.which(pdflatex) is None:
+            print(f'{pdflatex} not found, PDF comparison skipped.')
+            return 0
+
+        if not os.path.isdir(ZineFactory.web_image_folder) or not os.path.exists('images-web.tex'):
+            print('No web images, run make.py first. PDF comparison skipped.')
+            return 0
+
+        for label, images_file in (('originals', 'images'), ('web images', 'images-web')):
+            result = compile_content(pdflatex, images_file, os.path.join(output_folder, images_file))
+            if result is None:
+                print(f'content.tex with {images_file}.tex failed to compile.')
+                return 1
+            pdf_size, compile_time = result
+            print(f'content.pdf with {label:<10}: {pdf_size / 1e6:>7.1f} MB, compiled in {compile_time:.1f} s')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(standalone_mode=False))
@@ -1,8 +1,15 @@
+import os
+import sys
 import logging
 import chromalog
 import click
 
 from ziny.zine_factory import ZineFactory
+from ziny.zine_builder import ZineBuilder
+from ziny.zine_profiler import ZineProfiler
+from ziny.zine_catalog import ZineCatalog
+from ziny.zine_batch import ZineBatch
+from ziny.zine_duplicate_index import ZineDuplicateIndex
 
 chromalog.basicConfig(
     level=logging.INFO,
@@ -11,26 +18,250 @@ chromalog.basicConfig(
 
 logger = logging.getLogger('Main App')
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.option('--verbose', is_flag=True, help='More logs')
-def main(verbose:bool) -> int:
+@click.option('--no-cache', is_flag=True, help='Ignore the metadata cache, decode all EXIF data again')
+@click.option('--jobs', type=int, default=None, help='Number of worker processes (default: CPU count)')
+@click.option('--thumbnail-profile', type=click.Choice(list(ZineFactory.thumbnail_profiles)), default='quality',
+              help='Thumbnail decoding profile, quality/speed trade-off')
+@click.option('--stream', is_flag=True, help='Process images one by one through all stages, with bounded memory')
+@click.option('--scan-concurrency', type=int, default=1, help='Number of images read concurrently during the scan')
+@click.option('--sidecar-store', is_flag=True, help='Use one sidecars.jsonl file per image folder instead of per-image sidecar files')
+@click.option('--migrate-sidecars', is_flag=True, help='Import per-image sidecar files into the sidecar stores, then exit')
+@click.option('--templates', type=click.Path(exists=True, file_okay=False), default=None,
+              help='Folder of LaTeX template overrides (content.tex.tpl, index.tex.tpl, index_description.tex.tpl)')
+@click.option('--first-page', type=int, default=None,
+              help='Page number of the first image: write page numbers in the index, build content.tex in one pass')
+@click.option('--web-long-edge', type=int, default=ZineFactory.web_image_long_edge,
+              help='Long edge of the images of the web PDF, in pixels')
+@click.option('--web-quality', type=click.IntRange(1, 95), default=ZineFactory.web_image_quality,
+              help='JPEG quality of the images of the web PDF')
+@click.option('--normalize-print', is_flag=True,
+              help='Embed print images resampled to the exact printed size (16 cm at the print dpi) instead of the originals')
+@click.option('--print-dpi', type=int, default=ZineFactory.print_image_dpi,
+              help='Resolution of the print images, in dots per inch')
+@click.option('--memory-budget', type=int, default=None,
+              help='Memory budget of the image decodes running at once, in MB (default: unlimited)')
+@click.option('--skip-duplicates', is_flag=True, help='Leave exact copies of an image (same content) out of the zine')
+@click.option('--near-duplicates', type=click.IntRange(0, ZineDuplicateIndex.max_indexed_distance), default=None,
+              metavar='DISTANCE',
+              help='Report images whose thumbnails look alike, within DISTANCE differing perceptual hash bits (eg. 4)')
+@click.option('--auto-layout', is_flag=True,
+              help='Share pages between landscape or portrait images, honour the sidecar layout, position and visibility')
+@click.option('--index-atlas', is_flag=True,
+              help='Compose the thumbnails of each index page into a single image (contact sheet) at the print dpi')
+@click.option('--catalog', 'catalog_file_path', type=click.Path(dir_okay=False), default='catalog.sqlite',
+              help='Photo catalog, for --index-catalog and --select')
+@click.option('--index-catalog', 'index_folders', type=click.Path(exists=True, file_okay=False), multiple=True,
+              help='Add the images of this folder to the catalog, or update them, then exit unless --select is given (repeatable)')
+@click.option('--select', 'query', default=None,
+              help='Build the zine from the catalog images matching the query (eg. "date:2023-05 lens:*35mm*") instead of images/')
+@click.option('--batch', 'manifest', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='Generate (and build) the zines of a batch manifest one after the other, in one process '
+                   'sharing its worker pool and caches, see ZineBatch')
+@click.option('--profile', type=click.Path(dir_okay=False, writable=True), default=None,
+              help='Profile the stages of the generation, write a Chrome trace (chrome://tracing, Perfetto) to this file')
+@click.option('--watch', is_flag=True,
+              help='Keep running, regenerate (and build, with the build command) whenever images, sidecars or the dictionary change')
+@click.pass_context
+def main(context:click.Context, verbose:bool, no_cache:bool, jobs:int, thumbnail_profile:str, stream:bool,
+         scan_concurrency:int, sidecar_store:bool, migrate_sidecars:bool, templates:str, first_page:int,
+         web_long_edge:int, web_quality:int, normalize_print:bool, print_dpi:int, memory_budget:int, skip_duplicates:bool,
+         near_duplicates:int, auto_layout:bool, index_atlas:bool, catalog_file_path:str,
+         index_folders:tuple, query:str, manifest:str, profile:str, watch:bool) -> int:
+    """
+    Generate the zine LaTeX inputs (images.tex, index.tex) and thumbnails from the image folder.
+    """
+
     logger.info('Welcome to the Photo Zine Generator.')
 
     if verbose:
         force_verbose()
 
-    factory = ZineFactory(image_folder = 'images/')
-    factory.scan()
-    factory.generate_thumbnails()
-    factory.generate_latex_content()
-    factory.generate_latex_index()
+    if watch and stream:
+        raise click.UsageError('--watch keeps the library in memory, it can not be combined with --stream.')
+    if auto_layout and stream:
+        raise click.UsageError('--auto-layout lays out the whole library, it can not be combined with --stream.')
+    if index_atlas and stream:
+        raise click.UsageError('--index-atlas lays out the whole index, it can not be combined with --stream.')
+
+    options = dict(use_cache = not no_cache, jobs = jobs, thumbnail_profile = thumbnail_profile,
+                   scan_concurrency = scan_concurrency, sidecar_store = sidecar_store or migrate_sidecars,
+                   first_page = first_page, template_folder = templates, web_image_long_edge = web_long_edge,
+                   web_image_quality = web_quality, normalize_print = normalize_print,
+                   print_image_dpi = print_dpi, memory_budget_mb = memory_budget,
+                   skip_duplicates = skip_duplicates, near_duplicate_distance = near_duplicates,
+                   auto_layout = auto_layout, index_atlas = index_atlas)
+
+    if manifest is not None:
+        if watch or stream or migrate_sidecars or index_folders or query is not None or profile is not None:
+            raise click.UsageError('--batch can not be combined with --watch, --stream, --migrate-sidecars, '
+                                   '--index-catalog, --select or --profile.')
+
+        # Zines are processed from their own folder.
+        options['template_folder'] = os.path.abspath(templates) if templates else None
+        try:
+            context.obj = ZineBatch(manifest, options)
+        except ValueError as err:
+            raise click.BadParameter(str(err), param_hint='--batch')
+
+        # With the build command, each zine is built right after its generation.
+        if context.invoked_subcommand is None and not context.obj.run():
+            context.exit(1)
+
+        return 0
+
+    factory = ZineFactory(image_folder = 'images/', **options)
+
+    if migrate_sidecars:
+        factory.sidecar_store.import_sidecar_files(factory.image_folder)
+        context.exit(0)
+
+    if index_folders or query is not None:
+        catalog = ZineCatalog(catalog_file_path)
+        catalog.open()
+        try:
+            for folder in index_folders:
+                factory.index_catalog(catalog, folder)
+            if query is not None:
+                try:
+                    factory.select(catalog, query)
+                except ValueError as err:
+                    raise click.BadParameter(str(err), param_hint='--select')
+                logger.info(f'{len(factory.selection)} of {catalog.count()} cataloged images selected.')
+        finally:
+            catalog.close()
+
+        if query is None:
+            context.exit(0)
+
+    if profile is not None:
+        factory.profiler = ZineProfiler()
+
+    if stream:
+        factory.stream()
+    else:
+        factory.scan()
+        factory.generate()
+
+    if profile is not None:
+        factory.profiler.report()
+        factory.profiler.save(profile)
+
+    context.obj = factory
+
+    # With the build command, watching starts after the first build.
+    if watch and context.invoked_subcommand is None:
+        watch_library(factory)
+
+    return 0
+
+@main.command()
+@click.option('--pdflatex', default='pdflatex', help='pdflatex executable')
+@click.pass_context
+def build(context:click.Context, pdflatex:str) -> int:
+    """
+    Then compile the zine PDFs into print/ and web/, only rebuilding the documents whose inputs changed.
+    """
+
+    if isinstance(context.obj, ZineBatch):
+        if not context.obj.run(lambda factory: build_zine(factory, pdflatex)):
+            sys.exit(1)
+        return 0
+
+    factory = context.obj
+    succeeded = build_zine(factory, pdflatex)
+
+    if context.parent.params['watch']:
+        watch_library(factory, lambda: build_zine(factory, pdflatex))
+
+    if not succeeded:
+        sys.exit(1)
 
     return 0
 
+def build_zine(factory:ZineFactory, pdflatex:str) -> bool:
+    """
+    Compile the zine PDFs. Return False if a document failed or the index page numbers are wrong.
+    """
+
+    # The index embeds the atlases instead of the thumbnails, with index atlases.
+    index_image_folder = factory.atlas_folder if factory.index_atlas else factory.thumbnail_folder
+    thumbnail_paths = sorted(
+        os.path.join(index_image_folder, file) for file in os.listdir(index_image_folder)
+        if file.endswith('.jpg')
+    )
+
+    content_passes = 2 if factory.first_page is None else 1
+    image_paths = [image_path for image_path in factory.discover_images() if image_path not in factory.duplicates]
+    web_image_paths = [factory.get_web_image_path(image_path) for image_path in image_paths]
+    content_image_paths = image_paths
+    if factory.normalize_print:
+        content_image_paths = [factory.get_print_image_path(image_path) for image_path in image_paths]
+    builder = ZineBuilder(
+        ZineBuilder.get_zine_targets(content_image_paths, thumbnail_paths, content_passes, web_image_paths,
+                                     factory.image_folder),
+        jobs = factory.jobs, pdflatex = pdflatex
+    )
+
+    if not builder.build():
+        return False
+
+    # Resolved page numbers are checked against the labels of the actual build.
+    if factory.first_page is None:
+        return True
+    if not factory.library:
+        logger.warning('Index page numbers not verified: the library is not kept in memory (--stream).')
+        return True
+
+    try:
+        mismatches = factory.verify_page_numbers(builder.get_work_folder(builder.targets['content']))
+    except ValueError as err:
+        logger.error(f'Index page numbers could not be verified. {err}')
+        return False
+
+    for image_path, page, actual_page in mismatches:
+        logger.error(f'`{image_path}` is on page {actual_page}, not {page} as written in the index.')
+    if mismatches:
+        first_page = factory.find_first_page(mismatches)
+        if first_page is None:
+            logger.error('Index page numbers are wrong. Omit --first-page to use page references.')
+        else:
+            logger.error(f'Index page numbers are wrong: the first image is on page {first_page}. Use --first-page {first_page}.')
+        return False
+
+    return True
+
+def watch_library(factory:ZineFactory, on_update = None) -> None:
+    """
+    Regenerate on changes until interrupted (Ctrl+C).
+    """
+
+    try:
+        factory.watch(on_update)
+    except KeyboardInterrupt:
+        logger.info('Stopped watching.')
+
 def force_verbose():
     logging.getLogger('Main App').setLevel(logging.DEBUG)
     logging.getLogger('Zine Factory').setLevel(logging.DEBUG)
     logging.getLogger('Zine Image Metadata').setLevel(logging.DEBUG)
+    logging.getLogger('Zine Metadata Cache').setLevel(logging.DEBUG)
+    logging.getLogger('Zine EXIF Reader').setLevel(logging.DEBUG)
+    logging.getLogger('Zine Thumbnail Manifest').setLevel(logging.DEBUG)
+    logging.getLogger('Zine Substitution Dictionary').setLevel(logging.DEBUG)
+    logging.getLogger('Zine Latency Recorder').setLevel(logging.DEBUG)
+    logging.getLogger('Zine Sidecar Store').setLevel(logging.DEBUG)
+    logging.getLogger('Zine Latex Output').setLevel(logging.DEBUG)
+    logging.getLogger('Zine Builder').setLevel(logging.DEBUG)
+    logging.getLogger('Zine Job Scheduler').setLevel(logging.DEBUG)
+    logging.getLogger('Zine Template Engine').setLevel(logging.DEBUG)
+    logging.getLogger('Zine Profiler').setLevel(logging.DEBUG)
+    logging.getLogger('Zine Watcher').setLevel(logging.DEBUG)
+    logging.getLogger('Zine Duplicate Index').setLevel(logging.DEBUG)
+    logging.getLogger('Zine Catalog').setLevel(logging.DEBUG)
+    logging.getLogger('Zine Batch').setLevel(logging.DEBUG)
+    logging.getLogger('Zine Layout').setLevel(logging.DEBUG)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,36 @@
+import os
+import sys
+import shutil
+
+import pytest
+
+# The tests import the ziny package from the repository root, and use its sample images.
+repository_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository_folder)
+
+
+@pytest.fixture
+def sample_image():
+    """
+    Path of a sample JPEG image of the repository, with EXIF data.
+    """
+
+    return os.path.join(repository_folder, 'images', '002.jpg')
+
+
+@pytest.fixture
+def dictionary_file_path():
+    return os.path.join(repository_folder, 'dictionary.json')
+
+
+@pytest.fixture
+def copy_image(sample_image):
+    """
+    Copy the sample image to the given path, creating its folder.
+    """
+
+    def copy(image_path):
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        shutil.copyfile(sample_image, image_path)
+
+    return copy
@@ -0,0 +1,157 @@
+import os
+import sys
+import stat
+
+import pytest
+
+from ziny.zine_builder import ZineBuilder, ZineBuildTarget
+
+# Stands in for pdflatex: like pdflatex, writes the aux file of every \include'd file under the
+# output directory without creating its folder (fails if it is missing), then the PDF. Without
+# aux file of its own yet, asks for another pass, as unresolved references do.
+stub_compiler = """#!{python}
+import os, re, sys
+arguments = dict(argument[1:].split('=', 1) for argument in sys.argv[1:-1] if '=' in argument)
+folder, name = arguments['output-directory'], arguments['jobname']
+source = re.search(r'([^{{}}]+\\.tex)}}?$', sys.argv[-1]).group(1)
+with open(os.path.join(os.path.dirname(folder.rstrip('/')), 'calls.log'), 'a') as log:
+    log.write(name + '\\n')
+for include in re.findall(r'\\\\include{{([^}}]+)}}', open(source).read()):
+    try:
+        open(os.path.join(folder, include + '.aux'), 'w').close()
+    except OSError:
+        print("! I can't write on file `" + include + ".aux'.")
+        sys.exit(1)
+aux = os.path.join(folder, name + '.aux')
+if not os.path.exists(aux):
+    open(aux, 'w').write('labels')
+    print('LaTeX Warning: Label(s) may have changed. Rerun to get cross-references right.')
+open(os.path.join(folder, name + '.pdf'), 'w').write('%PDF ' + name)
+"""
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """
+    A project with a document including a template, and a stub compiler. Returns the compiler path.
+    """
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('template')
+    with open('main.tex', 'w') as main:
+        main.write('\\documentclass{book}\\begin{document}\\include{template/prints}\\end{document}\n')
+    with open('template/prints.tex', 'w') as prints:
+        prints.write('Prints\n')
+
+    compiler = tmp_path / 'pdflatex'
+    compiler.write_text(stub_compiler.format(python=sys.executable))
+    compiler.chmod(compiler.stat().st_mode | stat.S_IEXEC)
+
+    return str(compiler)
+
+
+def get_calls() -> list:
+    try:
+        with open(os.path.join(ZineBuilder.build_folder, 'calls.log')) as log:
+            return log.read().split()
+    except FileNotFoundError:
+        return list()
+
+
+def get_targets() -> list:
+    return [
+        ZineBuildTarget('main', ['main.tex', 'template/prints.tex']),
+        ZineBuildTarget('web', ['main.tex', 'template/prints.tex'], dependencies=['main'],
+                        publish_path=os.path.join('web', 'zine.pdf'), source='main.tex'),
+    ]
+
+
+def test_included_files_get_their_aux_folder(project):
+    builder = ZineBuilder(get_targets(), jobs=2, pdflatex=project)
+
+    assert builder.build()
+    assert os.path.exists(os.path.join(ZineBuilder.build_folder, 'main', 'template', 'prints.aux'))
+    assert open(os.path.join('print', 'main.pdf')).read() == '%PDF main'
+    assert open(os.path.join('web', 'zine.pdf')).read() == '%PDF web'
+
+
+def test_unchanged_targets_are_not_compiled_again(project):
+    assert ZineBuilder(get_targets(), pdflatex=project).build()
+    assert sorted(get_calls()) == ['main', 'web']
+
+    assert ZineBuilder(get_targets(), pdflatex=project).build()
+    assert sorted(get_calls()) == ['main', 'web']
+
+    # Changing an input rebuilds the documents using it, and the documents depending on them.
+    with open('template/prints.tex', 'a') as prints:
+        prints.write('More prints\n')
+    assert ZineBuilder(get_targets(), pdflatex=project).build()
+    assert sorted(get_calls()) == ['main', 'main', 'web', 'web']
+
+
+def test_stale_publications_are_removed(project):
+    for path in (os.path.join('print', 'old.pdf'), os.path.join('web', 'stale', 'zine.pdf')):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'w').close()
+
+    assert ZineBuilder(get_targets(), pdflatex=project).build()
+
+    assert sorted(os.listdir('print')) == ['main.pdf']
+    assert sorted(os.listdir('web')) == ['zine.pdf']
+
+
+def test_failed_target_leaves_no_stale_publication(project):
+    assert ZineBuilder(get_targets(), pdflatex=project).build()
+
+    with open('main.tex', 'a') as main:
+        main.write('\\include{missing/folder/../file}\n')
+    assert not ZineBuilder(get_targets(), pdflatex=project).build()
+
+    assert not os.path.exists(os.path.join('print', 'main.pdf'))
+    assert not os.path.exists(os.path.join('web', 'zine.pdf'))
+
+
+def test_same_document_reuses_the_cross_references(project):
+    targets = [
+        ZineBuildTarget('main', ['main.tex', 'template/prints.tex'], max_passes=2),
+        ZineBuildTarget('main-web', ['main.tex', 'template/prints.tex'], dependencies=['main'], max_passes=2,
+                        publish_path=None, source='main.tex', aux_source='main'),
+    ]
+
+    assert ZineBuilder(targets, pdflatex=project).build()
+
+    assert get_calls() == ['main', 'main', 'main-web']
+    assert open(os.path.join(ZineBuilder.build_folder, 'main-web', 'main-web.aux')).read() == 'labels'
+
+
+def test_new_cover_photo_rebuilds_the_cover(project):
+    for source in ('front', 'content', 'spine', 'back', 'cover', 'web'):
+        with open(source + '.tex', 'w') as tex:
+            tex.write(source + '\n')
+    os.makedirs('images')
+    with open(os.path.join('images', 'front.jpg'), 'w') as front:
+        front.write('cover')
+
+    def build():
+        targets = ZineBuilder.get_zine_targets(['images/001.jpg'], [], 1, [], 'images/')
+        assert ZineBuilder(targets, pdflatex=project).build()
+
+    build()
+    calls = len(get_calls())
+
+    with open(os.path.join('images', 'front.jpg'), 'w') as front:
+        front.write('another cover')
+    build()
+
+    assert sorted(get_calls()[calls:]) == ['cover', 'front', 'web']
+
+
+def test_file_system_errors_only_fail_their_target(project):
+    os.makedirs(ZineBuilder.build_folder)
+    open(os.path.join(ZineBuilder.build_folder, 'main'), 'w').close()
+    targets = get_targets() + [ZineBuildTarget('solo', ['main.tex', 'template/prints.tex'], source='main.tex')]
+
+    assert not ZineBuilder(targets, pdflatex=project).build()
+
+    assert get_calls() == ['solo']
+    assert open(os.path.join('print', 'solo.pdf')).read() == '%PDF solo'
@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+from ziny.zine_catalog import ZineCatalog
+from ziny.zine_factory import ZineFactory
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = ZineCatalog(str(tmp_path / 'catalog.sqlite'))
+    catalog.open()
+    yield catalog
+    catalog.close()
+
+
+@pytest.fixture
+def factory(tmp_path, monkeypatch, dictionary_file_path):
+    monkeypatch.chdir(tmp_path)
+    return ZineFactory(image_folder='images/', use_cache=False, dictionary_file_path=dictionary_file_path)
+
+
+def test_folder_names_are_not_patterns(catalog, factory, copy_image):
+    copy_image('arch/aXb/sub/002.jpg')
+    copy_image('arch/a_b/001.jpg')
+
+    factory.index_catalog(catalog, 'arch/aXb')
+    assert factory.index_catalog(catalog, 'arch/a_b') == (1, 0)
+
+    assert catalog.select('folder:arch') == ['arch/aXb/sub/002.jpg', 'arch/a_b/001.jpg']
+    assert catalog.select('folder:arch/a_b') == ['arch/a_b/001.jpg']
+    assert catalog.select('folder:arch/a%') == []
+
+
+def test_folders_match_case(catalog, factory, copy_image):
+    copy_image('arch/Trip/day1/001.jpg')
+    copy_image('arch/trip/002.jpg')
+
+    factory.index_catalog(catalog, 'arch/Trip')
+    assert factory.index_catalog(catalog, 'arch/trip') == (1, 0)
+
+    assert catalog.select('folder:arch/trip') == ['arch/trip/002.jpg']
+    assert catalog.count() == 2
+
+
+def test_subfolders_match_but_not_siblings(catalog, factory, copy_image):
+    copy_image('arch/2023/05/001.jpg')
+    copy_image('arch/2023-old/002.jpg')
+
+    factory.index_catalog(catalog, 'arch')
+
+    assert catalog.select('folder:arch/2023/') == ['arch/2023/05/001.jpg']
+    assert sorted(catalog.get_signatures('arch/2023')) == ['arch/2023/05/001.jpg']
+
+
+def test_removed_images_leave_the_catalog(catalog, factory, copy_image, tmp_path):
+    copy_image('arch/a/001.jpg')
+    copy_image('arch/a/002.jpg')
+    factory.index_catalog(catalog, 'arch')
+
+    (tmp_path / 'arch' / 'a' / '002.jpg').unlink()
+
+    assert factory.index_catalog(catalog, 'arch') == (0, 1)
+    assert catalog.select('folder:arch') == ['arch/a/001.jpg']
+
+
+def test_selections_are_loaded_from_the_catalog(catalog, factory, copy_image, monkeypatch):
+    copy_image('arch/001.jpg')
+    copy_image('arch/002.jpg')
+    factory.index_catalog(catalog, 'arch')
+    indexed = factory.load_image('arch/002.jpg', 2).to_dict()
+
+    loaded = list()
+    extract_metadata = factory.extract_metadata
+    def record_extraction(image_path, *args):
+        loaded.append(image_path)
+        return extract_metadata(image_path, *args)
+    monkeypatch.setattr(factory, 'extract_metadata', record_extraction)
+
+    assert factory.select(catalog, 'folder:arch') == ['arch/001.jpg', 'arch/002.jpg']
+    factory.scan()
+
+    assert loaded == []
+    assert factory.library['arch/002.jpg'].to_dict() == indexed
+
+    os.utime(factory.get_sidecar_file_path('arch/002.jpg'), ns=(0, 0))
+    factory.scan()
+
+    assert loaded == ['arch/002.jpg']
+
+
+def test_selections_keep_the_metadata_cache(copy_image, tmp_path, monkeypatch, dictionary_file_path):
+    monkeypatch.chdir(tmp_path)
+    copy_image('images/a/001.jpg')
+    copy_image('images/b/002.jpg')
+    factory = ZineFactory(image_folder='images/', dictionary_file_path=dictionary_file_path)
+    factory.scan()
+
+    factory.selection = ['images/a/001.jpg']
+    factory.scan()
+
+    factory.metadata_cache.open()
+    entries = factory.metadata_cache._connection.execute('SELECT image_path FROM entries').fetchall()
+    factory.metadata_cache.close(prune=False)
+    assert sorted(row[0] for row in entries) == ['images/a/001.jpg', 'images/b/002.jpg']
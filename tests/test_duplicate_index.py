@@ -0,0 +1,18 @@
+import pytest
+
+from ziny.zine_duplicate_index import ZineDuplicateIndex
+
+
+def test_close_hashes_are_found():
+    index = ZineDuplicateIndex(4)
+    index.add('a.jpg', 0)
+
+    assert index.add('b.jpg', 0b1011) == [('a.jpg', 3)]
+    assert index.add('c.jpg', 0b11111) == [('b.jpg', 2)]
+
+
+def test_distance_is_capped():
+    ZineDuplicateIndex(ZineDuplicateIndex.max_indexed_distance)
+
+    with pytest.raises(ValueError):
+        ZineDuplicateIndex(ZineDuplicateIndex.max_indexed_distance + 1)
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+from PIL import Image
+from PIL.ExifTags import Base, IFD
+from PIL.TiffImagePlugin import IFDRational
+
+from ziny.zine_exif_reader import ZineExifReader
+
+from conftest import repository_folder
+
+sample_images = sorted(
+    os.path.join(repository_folder, 'images', file)
+    for file in os.listdir(os.path.join(repository_folder, 'images')) if file.endswith('.jpg')
+)
+
+
+def get_pil_exif(image_path):
+    """
+    The tags of the reader, as read by PIL.
+    """
+
+    with Image.open(image_path) as imgfile:
+        exifdata = imgfile._getexif() or dict()
+
+    return {tag: value for tag, value in exifdata.items() if tag in ZineExifReader.tags}
+
+
+@pytest.fixture
+def reader():
+    return ZineExifReader()
+
+
+@pytest.mark.parametrize('image_path', sample_images)
+def test_sample_images_read_as_pil(reader, image_path):
+    assert reader.read(image_path) == get_pil_exif(image_path)
+
+
+@pytest.mark.parametrize('image_path', sample_images)
+def test_sample_image_dimensions(reader, image_path):
+    with Image.open(image_path) as imgfile:
+        assert reader.read_dimensions(image_path) == imgfile.size
+
+
+@pytest.mark.parametrize('endian', ['<', '>'])
+@pytest.mark.parametrize('progressive', [False, True])
+def test_written_tags_read_as_pil(reader, tmp_path, endian, progressive):
+    exif = Image.Exif()
+    exif.endian = endian
+    exif[Base.Make] = 'Nikon'
+    exif[Base.Model] = 'Z 6'
+    exif[Base.ImageDescription] = 'Harbour at dawn'
+    exif_ifd = exif.get_ifd(IFD.Exif)
+    exif_ifd[Base.ExposureTime] = IFDRational(1, 250)
+    exif_ifd[Base.FNumber] = IFDRational(28, 10)
+    exif_ifd[Base.ExposureBiasValue] = IFDRational(-2, 3)
+    exif_ifd[Base.ISOSpeedRatings] = 400
+    exif_ifd[Base.DateTimeOriginal] = '2023:05:14 06:12:00'
+    exif_ifd[Base.MeteringMode] = 5
+    image_path = str(tmp_path / 'written.jpg')
+    Image.new('RGB', (120, 80), 'grey').save(image_path, exif=exif, progressive=progressive)
+
+    exifdata = reader.read(image_path)
+
+    assert exifdata == get_pil_exif(image_path)
+    assert exifdata[Base.Make.value] == 'Nikon'
+    assert exifdata[Base.ISOSpeedRatings.value] == 400
+    assert reader.read_dimensions(image_path) == (120, 80)
+
+
+def test_only_the_header_is_read(reader, sample_image):
+    reader.read(sample_image)
+
+    assert 0 < reader.bytes_read < 128 * 1024 < os.path.getsize(sample_image)
+
+
+def test_files_without_exif_fall_back(reader, tmp_path):
+    Image.new('RGB', (16, 16)).save(tmp_path / 'plain.jpg')
+    Image.new('RGB', (16, 16)).save(tmp_path / 'image.png')
+
+    assert reader.read(str(tmp_path / 'plain.jpg')) is None
+    assert reader.read(str(tmp_path / 'image.png')) is None
+    assert reader.read_dimensions(str(tmp_path / 'image.png')) is None
+
+
+def test_truncated_exif_falls_back(reader, tmp_path, sample_image):
+    with open(sample_image, 'rb') as source:
+        header = source.read(2048)
+    (tmp_path / 'truncated.jpg').write_bytes(header)
+
+    assert reader.read(str(tmp_path / 'truncated.jpg')) is None
@@ -0,0 +1,58 @@
+import gc
+import json
+
+import pytest
+
+from ziny.zine_image_metadata import ZineImageMetadata, ZineSidecar
+
+
+@pytest.fixture
+def meta(dictionary_file_path):
+    ZineImageMetadata.dictionary_file_path = dictionary_file_path
+    meta = ZineImageMetadata(image_path='images/001.jpg')
+    meta.make = 'Nikon'
+    return meta
+
+
+def test_overwrites_only_reach_public_fields(meta):
+    meta.sidecar = ZineImageMetadata.share_sidecar(dict(overwrites=dict(
+        make='Leica', page=12, sidecar='x', _dictionary='x', image_path='x.jpg'
+    )))
+    dictionary = meta._dictionary
+
+    meta.apply_sidecar_overwrites()
+
+    assert meta.make == 'Leica'
+    assert meta.page is None
+    assert meta.image_path == 'images/001.jpg'
+    assert meta._dictionary is dictionary
+    assert isinstance(meta.sidecar, ZineSidecar)
+
+
+def test_identical_sidecars_are_shared_read_only():
+    first = ZineImageMetadata.share_sidecar(dict(tags=['a'], layout='single'))
+    second = ZineImageMetadata.share_sidecar(json.loads('{"layout": "single", "tags": ["a"]}'))
+
+    assert first is second
+    with pytest.raises(TypeError):
+        first['layout'] = 'auto'
+    with pytest.raises(TypeError):
+        first.update(layout='auto')
+
+
+def test_unused_sidecars_are_released():
+    fingerprint = json.dumps(dict(description='released'), sort_keys=True)
+    ZineImageMetadata.share_sidecar(dict(description='released'))
+    gc.collect()
+
+    assert fingerprint not in ZineImageMetadata._shared_sidecars
+
+
+def test_only_repeated_fields_are_interned():
+    record = dict(image_path='images/001.jpg', make='Nikon', description='A unique caption')
+    first = ZineImageMetadata.from_dict(json.loads(json.dumps(record)))
+    second = ZineImageMetadata.from_dict(json.loads(json.dumps(record)))
+
+    assert first.make is second.make
+    assert first.image_path is not second.image_path
+    assert first.description is not second.description
@@ -0,0 +1,24 @@
+import pytest
+
+from ziny.zine_factory import ZineFactory
+
+
+@pytest.fixture
+def factory(tmp_path, monkeypatch, dictionary_file_path, copy_image):
+    monkeypatch.chdir(tmp_path)
+    copy_image('images/001.jpg')
+    copy_image('images/002.jpg')
+    # Headers only: the EXIF data reads, the image does not decode.
+    (tmp_path / 'images' / '002.jpg').write_bytes((tmp_path / 'images' / '001.jpg').read_bytes()[:20000])
+    return ZineFactory(image_folder='images/', use_cache=False, dictionary_file_path=dictionary_file_path, jobs=1)
+
+
+def test_images_without_thumbnail_are_left_out(factory, tmp_path):
+    factory.scan()
+    assert factory.generate_thumbnails() == ['images/002.jpg']
+
+    factory.generate_latex_index('index.tex')
+
+    index = (tmp_path / 'index.tex').read_text()
+    assert '{thumbnails/001.jpg}' in index
+    assert 'None' not in index
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+from PIL import Image
+
+from ziny.zine_factory import ZineFactory
+
+
+@pytest.fixture
+def factory(tmp_path, monkeypatch, dictionary_file_path, copy_image):
+    monkeypatch.chdir(tmp_path)
+    for name in ('001', '002', '003', '004'):
+        copy_image(f'images/{name}.jpg')
+    factory = ZineFactory(image_folder='images/', use_cache=False, dictionary_file_path=dictionary_file_path,
+                          jobs=1, print_image_dpi=50, index_atlas=True)
+    factory.index_atlas_rows = 3
+    return factory
+
+
+def generate(factory:ZineFactory) -> list:
+    factory.scan()
+    factory.generate_thumbnails()
+    failed = factory.generate_index_atlases()
+    factory.generate_latex_index()
+    return failed
+
+
+def test_index_pages_embed_their_atlas(factory):
+    assert generate(factory) == []
+
+    assert [(atlas_path, len(metas)) for atlas_path, metas in factory.atlas_pages] == [
+        ('atlases/index-001.jpg', 3), ('atlases/index-002.jpg', 1)
+    ]
+    with Image.open('atlases/index-001.jpg') as atlas:
+        assert atlas.size == (79, 3 * 94)
+
+    index = open('index.tex').read()
+    assert index.count('\\includegraphics') == 2
+    assert '{atlases/index-001.jpg}' in index and 'thumbnails/' not in index
+
+
+def test_atlases_follow_the_thumbnails(factory, monkeypatch):
+    generate(factory)
+    rendered = list()
+    run_jobs = factory.run_jobs
+    def record_jobs(worker, jobs, stage = 'job', *args, **kwargs):
+        if stage == 'atlas':
+            rendered.extend(job[0] for job in jobs)
+        return run_jobs(worker, jobs, stage, *args, **kwargs)
+    monkeypatch.setattr(factory, 'run_jobs', record_jobs)
+
+    generate(factory)
+    assert rendered == []
+
+    # A new thumbnail only changes the atlas of its page.
+    with Image.open('images/004.jpg') as imgfile:
+        imgfile.transpose(Image.Transpose.ROTATE_90).save('images/004.jpg', exif=imgfile.info['exif'])
+    generate(factory)
+    assert rendered == ['atlases/index-002.jpg']
+
+    os.remove('images/004.jpg')
+    generate(factory)
+    assert rendered == ['atlases/index-002.jpg']
+    assert sorted(os.listdir('atlases')) == ['index-001.jpg', ZineFactory.thumbnail_manifest_file_name]
@@ -0,0 +1,23 @@
+import pytest
+
+from ziny.zine_latency_recorder import ZineLatencyRecorder
+
+
+@pytest.fixture
+def recorder():
+    recorder = ZineLatencyRecorder()
+    for duration in (0.5, 0.1, 0.4, 0.2, 0.3):
+        recorder.record('exif read', duration)
+    return recorder
+
+
+def test_percentiles_use_the_nearest_rank(recorder):
+    assert recorder.get_percentile('exif read', 50) == 0.3
+    assert recorder.get_percentile('exif read', 90) == 0.5
+    assert recorder.get_percentile('exif read', 20) == 0.1
+    assert recorder.get_percentile('exif read', 21) == 0.2
+    assert recorder.get_percentile('exif read', 0) == 0.1
+
+
+def test_unknown_stages_have_no_latency(recorder):
+    assert recorder.get_percentile('sidecar read', 50) == 0.0
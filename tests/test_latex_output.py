@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from ziny.zine_latex_output import ZineLatexOutput
+
+
+def generate(fragments:dict) -> ZineLatexOutput:
+    with ZineLatexOutput('images.tex') as latex:
+        for key, fragment in fragments.items():
+            latex.write(key, fragment)
+    return latex
+
+
+@pytest.fixture
+def output(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    latex = generate({'001.jpg': 'one\n', '002.jpg': 'two\n'})
+    os.utime('images.tex', ns=(0, 0))
+    return latex
+
+
+def test_unchanged_outputs_are_not_rewritten(output):
+    assert output.changed
+
+    latex = generate({'001.jpg': 'one\n', '002.jpg': 'two\n'})
+
+    assert not latex.changed
+    assert os.stat('images.tex').st_mtime_ns == 0
+    assert sorted(os.listdir('.')) == ['images.tex', 'images.tex.fragments.json']
+
+
+def test_changed_entries_are_reported(output):
+    latex = ZineLatexOutput('images.tex')
+    with latex:
+        latex.write_all(['001.jpg', '003.jpg'], ['one, edited\n', 'three\n'])
+
+    assert latex.changed
+    assert open('images.tex').read() == 'one, edited\nthree\n'
+    assert latex.get_changed_entries() == ['001.jpg', '003.jpg']
+    assert latex.get_removed_entries() == ['002.jpg']
+
+
+def test_failed_generations_keep_the_output(output):
+    with pytest.raises(RuntimeError):
+        with ZineLatexOutput('images.tex') as latex:
+            latex.write('001.jpg', 'partial')
+            raise RuntimeError('Template error')
+
+    assert open('images.tex').read() == 'one\ntwo\n'
+    assert not os.path.exists('images.tex.tmp')
@@ -0,0 +1,62 @@
+import pytest
+
+from ziny.zine_factory import ZineFactory
+from ziny.zine_layout import ZineLayout, ZineLayoutEntry
+
+
+def landscape(name:str, **sidecar) -> ZineLayoutEntry:
+    return ZineLayoutEntry(name, 3000, 1500, **sidecar)
+
+
+def portrait(name:str, **sidecar) -> ZineLayoutEntry:
+    return ZineLayoutEntry(name, 2000, 3000, **sidecar)
+
+
+def get_pages(entries, window:int = None) -> list:
+    return [(page.kind, page.image_paths) for page in ZineLayout(window).plan(entries)]
+
+
+def test_compatible_images_share_a_page():
+    entries = [landscape('l1'), portrait('p1'), landscape('l2'), ZineLayoutEntry('square', 1000, 1000),
+               portrait('p2'), landscape('hidden', visibility='hidden'), landscape('l3')]
+
+    assert get_pages(entries) == [
+        ('landscape_pair', ['l1', 'l2']),
+        ('portrait_pair', ['p1', 'p2']),
+        ('single', ['square']),
+        ('single', ['l3']),
+    ]
+
+
+def test_pairs_stay_within_the_window():
+    entries = [landscape('l1')] + [ZineLayoutEntry(f's{index}', None, None) for index in range(2)] + [landscape('l2')]
+
+    assert get_pages(entries, window=2) == [('single', ['l1']), ('single', ['s0']), ('single', ['s1']), ('single', ['l2'])]
+    assert get_pages(entries, window=3)[0] == ('landscape_pair', ['l1', 'l2'])
+
+
+def test_single_layouts_keep_their_page_and_position():
+    entries = [landscape('l1', layout='single', position='bottom'), landscape('l2'), portrait('p1', layout='single')]
+
+    assert get_pages(entries) == [('single_bottom', ['l1']), ('single', ['l2']), ('single', ['p1'])]
+
+
+@pytest.fixture
+def factory(tmp_path, monkeypatch, dictionary_file_path, copy_image):
+    monkeypatch.chdir(tmp_path)
+    for name in ('001', '002', '003', '004'):
+        copy_image(f'images/{name}.jpg')
+    factory = ZineFactory(image_folder='images/', use_cache=False, dictionary_file_path=dictionary_file_path,
+                          first_page=5, auto_layout=True)
+    factory.scan()
+    return factory
+
+
+def test_images_sharing_a_page_get_its_number(factory, monkeypatch):
+    dimensions = {'images/001.jpg': (3000, 1500), 'images/002.jpg': (2000, 3000),
+                  'images/003.jpg': (3000, 1500), 'images/004.jpg': (2000, 3000)}
+    monkeypatch.setattr(factory, 'get_image_dimensions', dimensions.get)
+
+    factory.plan_layout()
+
+    assert [factory.library.get(image_path).page for image_path in sorted(dimensions)] == [5, 6, 5, 6]
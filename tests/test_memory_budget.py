@@ -0,0 +1,51 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ziny.zine_factory import ZineFactory
+from ziny.zine_image_processing import estimate_decode_memory
+from ziny.zine_job_scheduler import ZineJobScheduler
+
+
+def test_decode_memory_follows_the_dct_scaling():
+    # 4000x3000 fitted in 400x400: 400x300, decoded at 1/4 scale (1000x750) with a reducing gap of 2.
+    assert estimate_decode_memory((4000, 3000, 3, 'JPEG'), (400, 400), 2.0) == (1000 * 750 + 400 * 300) * 4
+    assert estimate_decode_memory((4000, 3000, 3, 'JPEG'), (400, 400), None) == (4000 * 3000 + 400 * 300) * 4
+    assert estimate_decode_memory((4000, 3000, 3, 'PNG'), (400, 400), 2.0) == (4000 * 3000 + 400 * 300) * 4
+    assert estimate_decode_memory((400, 300, 1, 'JPEG'), (800, 800), 2.0) == 400 * 300 * 2
+
+
+def test_running_jobs_stay_within_the_budget():
+    lock = threading.Lock()
+    running = list()
+    observed = list()
+
+    def worker(job):
+        with lock:
+            running.append(job)
+            observed.append(list(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(job)
+        return job, None
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        scheduler = ZineJobScheduler(pool, 4, memory_budget=10)
+        futures = [scheduler.submit(worker, (index, cost), cost) for index, cost in enumerate((6, 6, 3, 3, 12, 1))]
+        results = [future.result() for future in futures]
+
+    assert [job for job, _ in results] == [(index, cost) for index, cost in enumerate((6, 6, 3, 3, 12, 1))]
+    assert all(sum(cost for _, cost in jobs) <= 10 or jobs == [(4, 12)] for jobs in observed)
+    assert scheduler.waits > 0
+
+
+def test_oversized_images_are_still_rendered(tmp_path, monkeypatch, dictionary_file_path, copy_image):
+    monkeypatch.chdir(tmp_path)
+    for name in ('001', '002', '003'):
+        copy_image(f'images/{name}.jpg')
+    factory = ZineFactory(image_folder='images/', use_cache=False, dictionary_file_path=dictionary_file_path,
+                          jobs=2, memory_budget_mb=1)
+    factory.scan()
+
+    assert factory.generate_thumbnails() == []
+    assert sorted(factory.oversized_images) == ['images/001.jpg', 'images/002.jpg', 'images/003.jpg']
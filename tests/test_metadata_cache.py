@@ -0,0 +1,15 @@
+import ziny.zine_exif_reader
+
+from ziny.zine_metadata_cache import ZineMetadataCache
+
+
+def test_exif_reader_changes_invalidate_the_cache(tmp_path, monkeypatch, dictionary_file_path):
+    reader_source = tmp_path / 'zine_exif_reader.py'
+    reader_source.write_text('# Reader\n')
+    monkeypatch.setattr(ziny.zine_exif_reader, '__file__', str(reader_source))
+    cache = ZineMetadataCache(str(tmp_path / 'cache.sqlite'), dictionary_file_path)
+    version = cache.compute_version()
+
+    reader_source.write_text('# Reader, fixed\n')
+
+    assert cache.compute_version() != version
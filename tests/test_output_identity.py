@@ -0,0 +1,54 @@
+import pytest
+
+from ziny.zine_factory import ZineFactory
+from ziny.zine_index_template import ZineIndexTemplate
+from ziny.zine_template_engine import ZineTemplateEngine
+
+output_files = ('images.tex', 'images-web.tex', 'index.tex')
+
+
+@pytest.fixture
+def make_factory(tmp_path, monkeypatch, dictionary_file_path, copy_image):
+    monkeypatch.chdir(tmp_path)
+    for number in range(1, 4):
+        copy_image(f'images/{number:03d}.jpg')
+
+    def make(**options):
+        return ZineFactory(image_folder='images/', use_cache=False, dictionary_file_path=dictionary_file_path,
+                           jobs=1, **options)
+
+    return make
+
+
+def read_outputs(folder):
+    return {file: (folder / file).read_bytes() for file in output_files}
+
+
+@pytest.mark.parametrize('first_page', [None, 7])
+def test_stream_writes_the_batch_output(make_factory, tmp_path, first_page):
+    factory = make_factory(first_page=first_page)
+    factory.scan()
+    factory.generate()
+    batch = read_outputs(tmp_path)
+
+    make_factory(first_page=first_page).stream(buffer_size=2)
+
+    assert read_outputs(tmp_path) == batch
+
+
+@pytest.mark.parametrize('first_page', [None, 7])
+def test_template_engine_renders_as_the_per_entry_templates(make_factory, first_page):
+    factory = make_factory(first_page=first_page)
+    factory.scan()
+    metas = list(factory.library.values())
+    metas[1].description = 'Harbour at dawn, 50% fog & {braces}'
+
+    engine = ZineTemplateEngine(ZineFactory.content_template)
+    for meta in metas:
+        index_template = ZineIndexTemplate()
+        index_template.configure(meta=meta)
+
+        assert engine.render_content(meta) == ZineFactory.content_template.format(**meta.to_dict())
+        assert engine.render_index(meta) == index_template.get_template()
+
+    assert engine.render_index_batch(metas) == list(map(engine.render_index, metas))
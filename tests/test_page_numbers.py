@@ -0,0 +1,49 @@
+import pytest
+
+from ziny.zine_factory import ZineFactory
+
+
+@pytest.fixture
+def factory(tmp_path, monkeypatch, dictionary_file_path, copy_image):
+    monkeypatch.chdir(tmp_path)
+    for name in ('001', '002', '003'):
+        copy_image(f'images/{name}.jpg')
+    factory = ZineFactory(image_folder='images/', use_cache=False, dictionary_file_path=dictionary_file_path,
+                          first_page=5)
+    factory.scan()
+    return factory
+
+
+def write_aux(folder, first_page):
+    folder.mkdir(exist_ok=True)
+    labels = ''.join(
+        f'\\newlabel{{img:images/{name}.jpg}}{{{{}}{{{first_page + index}}}}}\n'
+        for index, name in enumerate(('001', '002', '003'))
+    )
+    (folder / 'content.aux').write_text(labels)
+
+
+def test_matching_pages(factory, tmp_path):
+    write_aux(tmp_path / 'aux', 5)
+
+    assert factory.verify_page_numbers(str(tmp_path / 'aux')) == []
+
+
+def test_front_matter_offset_is_found(factory, tmp_path):
+    write_aux(tmp_path / 'aux', 7)
+
+    mismatches = factory.verify_page_numbers(str(tmp_path / 'aux'))
+
+    assert mismatches == [('images/001.jpg', 5, '7'), ('images/002.jpg', 6, '8'), ('images/003.jpg', 7, '9')]
+    assert factory.find_first_page(mismatches) == 7
+
+
+def test_partial_mismatches_have_no_first_page(factory):
+    assert factory.find_first_page([('images/002.jpg', 6, '8')]) is None
+
+
+def test_missing_labels_fail(factory, tmp_path):
+    (tmp_path / 'aux').mkdir()
+
+    with pytest.raises(ValueError):
+        factory.verify_page_numbers(str(tmp_path / 'aux'))
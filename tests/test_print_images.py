@@ -0,0 +1,54 @@
+import os
+
+import pytest
+from PIL import Image
+
+from ziny.zine_factory import ZineFactory
+
+
+@pytest.fixture
+def factory(tmp_path, monkeypatch, dictionary_file_path, copy_image):
+    monkeypatch.chdir(tmp_path)
+    for name in ('001', '002'):
+        copy_image(f'images/{name}.jpg')
+    factory = ZineFactory(image_folder='images/', use_cache=False, dictionary_file_path=dictionary_file_path,
+                          jobs=1, normalize_print=True, print_image_dpi=50)
+    factory.scan()
+    return factory
+
+
+def test_print_images_fit_the_content_box(factory):
+    assert factory.get_print_image_box() == (315, 472)
+    assert factory.generate_print_images() == []
+
+    with Image.open(factory.get_print_image_path('images/001.jpg')) as print_image:
+        assert print_image.size == (315, 210)
+        assert 'exif' not in print_image.info
+
+
+def test_content_embeds_the_print_images(factory):
+    factory.generate_latex_content()
+
+    content = open('images.tex').read()
+    assert '{' + factory.get_print_image_path('images/001.jpg') + '}' in content
+    assert '{images/001.jpg}' not in content
+
+
+def test_print_images_follow_the_content_of_their_source(factory, monkeypatch):
+    factory.generate_print_images()
+    rendered = list()
+    run_jobs = factory.run_jobs
+    def record_jobs(worker, jobs, stage = 'job', *args, **kwargs):
+        if stage == 'print image':
+            rendered.extend(job[0] for job in jobs)
+        return run_jobs(worker, jobs, stage, *args, **kwargs)
+    monkeypatch.setattr(factory, 'run_jobs', record_jobs)
+
+    # Touching an image does not change its content.
+    os.utime('images/001.jpg', ns=(0, 0))
+    factory.generate_print_images()
+    assert rendered == []
+
+    factory.print_image_dpi = 60
+    factory.generate_print_images()
+    assert rendered == ['images/001.jpg', 'images/002.jpg']
@@ -0,0 +1,37 @@
+import os
+import json
+
+from ziny.zine_factory import ZineFactory
+from ziny.zine_profiler import ZineProfiler
+
+
+def test_events_are_summed_per_stage_and_image():
+    profiler = ZineProfiler()
+    profiler.add_event('exif read', profiler.origin, 2_000_000, image_path='images/001.jpg')
+    profiler.add_event('exif read', profiler.origin, 3_000_000, image_path='images/001.jpg')
+    profiler.add_event('thumbnail', profiler.origin, 5_000_000, pid=1, image_path='images/001.jpg')
+    profiler.count('bytes read', 10)
+    profiler.count('bytes read', 5)
+
+    assert profiler.image_durations == {'images/001.jpg': {'exif read': 0.005, 'thumbnail': 0.005}}
+    assert profiler.counters == {'bytes read': 15}
+
+
+def test_trace_covers_the_workers(tmp_path, monkeypatch, dictionary_file_path, copy_image):
+    monkeypatch.chdir(tmp_path)
+    for name in ('001', '002', '003'):
+        copy_image(f'images/{name}.jpg')
+    factory = ZineFactory(image_folder='images/', use_cache=False, dictionary_file_path=dictionary_file_path, jobs=2)
+    factory.profiler = ZineProfiler()
+
+    factory.scan()
+    factory.generate_thumbnails()
+    factory.profiler.save('trace.json')
+
+    with open('trace.json') as trace_file:
+        events = json.load(trace_file)['traceEvents']
+    stages = {event['name'] for event in events if event['ph'] == 'X'}
+    assert {'scan', 'load image', 'thumbnails', 'thumbnail'} <= stages
+    assert {event['pid'] for event in events if event['name'] == 'thumbnail'} - {os.getpid()}
+    assert sorted(factory.profiler.image_durations) == ['images/001.jpg', 'images/002.jpg', 'images/003.jpg']
+    assert factory.profiler.counters['images processed'] == 3
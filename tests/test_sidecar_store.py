@@ -0,0 +1,58 @@
+import os
+import json
+
+import pytest
+
+from ziny.zine_factory import ZineFactory
+from ziny.zine_sidecar_store import ZineSidecarStore
+
+
+@pytest.fixture
+def default_sidecar():
+    return json.loads(ZineFactory.sidecar_template)
+
+
+@pytest.fixture
+def image_folder(tmp_path, monkeypatch, default_sidecar):
+    """
+    An image folder with per-image sidecar files: edited, untouched, broken, and in a subfolder.
+    """
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join('images', 'trip'))
+    edited = dict(default_sidecar, description='Edited')
+    for path, content in (('images/001.jpg.json', json.dumps(edited)),
+                          ('images/002.jpg.json', json.dumps(default_sidecar)),
+                          ('images/003.jpg.json', '{broken'),
+                          ('images/trip/004.jpg.json', json.dumps(edited))):
+        with open(path, 'w') as sidecar_file:
+            sidecar_file.write(content)
+
+    return 'images'
+
+
+def test_sidecar_files_are_migrated_and_removed(image_folder, default_sidecar):
+    assert ZineSidecarStore(default_sidecar).import_sidecar_files(image_folder) == 3
+
+    assert sorted(os.listdir('images')) == ['003.jpg.json', 'sidecars.jsonl', 'trip']
+    assert os.listdir(os.path.join('images', 'trip')) == ['sidecars.jsonl']
+
+    store = ZineSidecarStore(default_sidecar)
+    assert store.get('images/001.jpg')['description'] == 'Edited'
+    assert store.get('images/trip/004.jpg')['description'] == 'Edited'
+    # Untouched sidecars are not recorded, they get the default.
+    assert store.get('images/002.jpg', use_default=False) is None
+    assert store.get('images/002.jpg') == default_sidecar
+
+
+def test_sidecar_files_can_be_kept(image_folder, default_sidecar):
+    ZineSidecarStore(default_sidecar).import_sidecar_files(image_folder, remove_files=False)
+
+    assert sorted(os.listdir('images')) == ['001.jpg.json', '002.jpg.json', '003.jpg.json', 'sidecars.jsonl', 'trip']
+
+
+def test_invalid_records_are_ignored(tmp_path, default_sidecar):
+    with open(tmp_path / 'sidecars.jsonl', 'w') as store_file:
+        store_file.write('{"image": "001.jpg", "sidecar": {"layout": "single"}}\n\nnot json\n{"sidecar": {}}\n')
+
+    assert ZineSidecarStore(default_sidecar).load_folder(str(tmp_path)) == {'001.jpg': {'layout': 'single'}}
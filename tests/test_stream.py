@@ -0,0 +1,46 @@
+import threading
+
+import pytest
+
+from ziny.zine_factory import ZineFactory
+
+
+@pytest.fixture
+def factory(tmp_path, monkeypatch, dictionary_file_path, copy_image):
+    monkeypatch.chdir(tmp_path)
+    for number in range(1, 9):
+        copy_image(f'images/{number:03d}.jpg')
+    return ZineFactory(image_folder='images/', dictionary_file_path=dictionary_file_path, jobs=1)
+
+
+def test_stage_stops_when_the_consumer_fails(factory):
+    closed = threading.Event()
+
+    def stage():
+        try:
+            for item in range(1000):
+                yield item
+        finally:
+            closed.set()
+
+    threads = threading.active_count()
+    items = factory.buffer_stage(stage(), 2)
+    with pytest.raises(RuntimeError):
+        for item in items:
+            if item == 3:
+                raise RuntimeError('Consumer failed.')
+    items.close()
+
+    assert closed.is_set()
+    assert threading.active_count() == threads
+
+
+def test_stream_closes_the_cache_when_writing_fails(factory, monkeypatch):
+    def fail(meta):
+        raise RuntimeError('Template failed.')
+    monkeypatch.setattr(factory, 'render_latex_content', fail)
+
+    with pytest.raises(RuntimeError):
+        factory.stream(buffer_size=1)
+
+    assert not factory.metadata_cache.is_open
@@ -0,0 +1,43 @@
+import os
+import json
+
+from ziny.zine_substitution_dictionary import ZineSubstitutionDictionary
+
+
+def make_dictionary(*pairs) -> ZineSubstitutionDictionary:
+    return ZineSubstitutionDictionary([dict(original=original, substitution=substitution) for original, substitution in pairs])
+
+
+def test_longest_original_wins():
+    dictionary = make_dictionary(('XF', 'Fujinon XF'), ('XF35mmF2 R WR', 'Fujinon 35mm f/2'))
+
+    assert dictionary.substitute_and_sanitize('XF35mmF2 R WR') == 'Fujinon 35mm f/2'
+    assert dictionary.substitute_and_sanitize('XF90mm') == 'Fujinon XF90mm'
+
+
+def test_substituted_text_is_not_substituted_again():
+    dictionary = make_dictionary(('SONY', 'Sony'), ('Sony', 'Sony Corp.'))
+
+    assert dictionary.substitute_and_sanitize('SONY') == 'Sony'
+    assert dictionary.substitute_and_sanitize('SONY Sony') == 'Sony Sony Corp.'
+
+
+def test_first_duplicate_wins_and_output_is_escaped():
+    dictionary = make_dictionary(('Leica', 'Leitz & Co'), ('Leica', 'Ernst Leitz'))
+
+    assert dictionary.substitute_and_sanitize('Leica\0') == 'Leitz \\& Co'
+
+
+def test_dictionaries_are_shared_until_the_file_changes(tmp_path):
+    dictionary_file_path = str(tmp_path / 'dictionary.json')
+    with open(dictionary_file_path, 'w') as dico:
+        json.dump([dict(original='A', substitution='B')], dico)
+
+    first = ZineSubstitutionDictionary.load(dictionary_file_path)
+    assert ZineSubstitutionDictionary.load(dictionary_file_path) is first
+
+    with open(dictionary_file_path, 'w') as dico:
+        json.dump([dict(original='A', substitution='C')], dico)
+    os.utime(dictionary_file_path, ns=(0, 0))
+
+    assert ZineSubstitutionDictionary.load(dictionary_file_path).substitute_and_sanitize('A') == 'C'
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from ziny.zine_factory import ZineFactory
+
+
+@pytest.fixture
+def factory(tmp_path, monkeypatch, dictionary_file_path, copy_image):
+    monkeypatch.chdir(tmp_path)
+    for name in ('001', '002', '003'):
+        copy_image(f'images/{name}.jpg')
+    return ZineFactory(image_folder='images/', use_cache=False, dictionary_file_path=dictionary_file_path, jobs=1)
+
+
+@pytest.fixture
+def rendered(factory, monkeypatch):
+    """
+    Source images of the thumbnails rendered by the factory, in order.
+    """
+
+    rendered = list()
+    run_jobs = factory.run_jobs
+    def record_jobs(worker, jobs, stage = 'job', *args, **kwargs):
+        if stage == 'thumbnail':
+            rendered.extend(job[0] for job in jobs)
+        return run_jobs(worker, jobs, stage, *args, **kwargs)
+    monkeypatch.setattr(factory, 'run_jobs', record_jobs)
+
+    return rendered
+
+
+def generate(factory:ZineFactory) -> list:
+    factory.scan()
+    return factory.generate_thumbnails()
+
+
+def test_only_new_and_modified_images_are_rendered(factory, rendered):
+    assert generate(factory) == []
+    assert rendered == ['images/001.jpg', 'images/002.jpg', 'images/003.jpg']
+
+    generate(factory)
+    assert len(rendered) == 3
+
+    os.utime('images/002.jpg', ns=(0, 0))
+    generate(factory)
+    assert rendered[3:] == ['images/002.jpg']
+
+
+def test_rendering_settings_are_part_of_the_signature(factory, rendered):
+    generate(factory)
+
+    factory.thumbnail_size = (100, 100)
+    generate(factory)
+
+    assert len(rendered) == 6
+
+
+def test_orphaned_and_missing_thumbnails(factory, rendered):
+    generate(factory)
+    thumbnail_paths = sorted(factory.library.get(key).thumbnail_path for key in factory.library_keys)
+
+    os.remove('images/001.jpg')
+    os.remove(thumbnail_paths[1])
+    open(os.path.join(factory.thumbnail_folder, 'stray.jpg'), 'w').close()
+    generate(factory)
+
+    assert rendered[3:] == ['images/002.jpg']
+    assert sorted(os.listdir(factory.thumbnail_folder)) == sorted(
+        [os.path.basename(path) for path in thumbnail_paths[1:]] + [ZineFactory.thumbnail_manifest_file_name]
+    )
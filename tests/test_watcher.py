@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from ziny.zine_watcher import ZineWatcher
+
+
+@pytest.fixture
+def watcher(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('images/trip')
+    for path in ('images/001.jpg', 'images/trip/002.jpg', 'dictionary.json'):
+        open(path, 'w').close()
+
+    watcher = ZineWatcher(['images', 'dictionary.json'])
+    if watcher._fd is None:
+        pytest.skip('inotify is not available.')
+    yield watcher
+    watcher.close()
+
+
+def test_queue_overflow_reports_every_watched_file(watcher):
+    # The overflow event has no watch descriptor (-1) nor name, and the events before it are lost.
+    read_end, write_end = os.pipe()
+    os.write(write_end, ZineWatcher.event_header.pack(-1, ZineWatcher.IN_Q_OVERFLOW, 0, 0))
+    inotify_fd, watcher._fd = watcher._fd, read_end
+    try:
+        changed = watcher._read_events()
+    finally:
+        watcher._fd = inotify_fd
+        os.close(read_end)
+        os.close(write_end)
+
+    assert changed == {'images/001.jpg', 'images/trip/002.jpg', 'dictionary.json'}
+
+
+def test_changes_are_reported(watcher):
+    with open('images/trip/002.jpg', 'w') as image:
+        image.write('changed')
+
+    assert watcher.wait_for_changes() == {'images/trip/002.jpg'}
@@ -0,0 +1,51 @@
+import pytest
+from PIL import Image
+
+from ziny.zine_factory import ZineFactory
+
+
+@pytest.fixture
+def factory(tmp_path, monkeypatch, dictionary_file_path, copy_image):
+    monkeypatch.chdir(tmp_path)
+    for name in ('001', '002'):
+        copy_image(f'images/{name}.jpg')
+    factory = ZineFactory(image_folder='images/', use_cache=False, dictionary_file_path=dictionary_file_path,
+                          jobs=1, web_image_long_edge=200, web_image_quality=70)
+    factory.scan()
+    return factory
+
+
+def test_web_images_are_resized_without_exif(factory):
+    assert factory.generate_web_images() == []
+
+    with Image.open(factory.get_web_image_path('images/001.jpg')) as web_image:
+        assert web_image.size == (200, 133)
+        assert 'exif' not in web_image.info
+        assert 'icc_profile' in web_image.info
+
+
+def test_web_content_embeds_the_web_images(factory):
+    factory.generate_latex_web_content()
+    factory.generate_latex_content()
+
+    web_content = open('images-web.tex').read()
+    assert factory.get_web_image_path('images/001.jpg') in web_content
+    assert '{images/001.jpg}' not in web_content
+    assert factory.get_web_image_path('images/001.jpg') not in open('images.tex').read()
+
+
+def test_web_images_follow_the_settings(factory, monkeypatch):
+    factory.generate_web_images()
+    rendered = list()
+    run_jobs = factory.run_jobs
+    def record_jobs(worker, jobs, stage = 'job', *args, **kwargs):
+        rendered.extend(job[0] for job in jobs)
+        return run_jobs(worker, jobs, stage, *args, **kwargs)
+    monkeypatch.setattr(factory, 'run_jobs', record_jobs)
+
+    factory.generate_web_images()
+    assert rendered == []
+
+    factory.web_image_quality = 80
+    factory.generate_web_images()
+    assert rendered == ['images/001.jpg', 'images/002.jpg']
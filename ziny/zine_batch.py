@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+from ziny.zine_factory import ZineFactory
+
+logger = logging.getLogger('Zine Batch')
+logger.setLevel(logging.INFO)
+
+
+class ZineBatch():
+    """
+    Generates (and builds) several zine projects in a single process, one after the other, instead
+    of one make.py process per zine: Python modules, the substitution dictionary and a single
+    process pool are shared by all zines, and so is the metadata cache if the manifest names one.
+    Each project is a folder laid out like this one (images/, content.tex...), processed from
+    within that folder. Within a zine, the longest thumbnail and pdflatex jobs start first (see
+    ZineFactory.run_jobs and ZineBuilder).
+    Zines don't overlap: the pool is idle while a zine is scanned and built. ZineFactory and
+    ZineBuilder work with paths relative to the current folder, which the whole process shares,
+    so the next zine can't be generated while one builds. The build keeps the CPUs busy with up
+    to `jobs` pdflatex processes anyway.
+
+    Manifest (JSON, paths relative to the manifest):
+        {
+            "dictionary": "dictionary.json",    Optional, shared by all zines (default: their own)
+            "cache": "zines.sqlite",            Optional, metadata cache shared by all zines
+            "zines": [
+                {"name": "lisbon", "folder": "trips/lisbon"},
+                "trips/porto"
+            ]
+        }
+    """
+
+    def __init__(self, manifest_file_path:str, factory_options:dict = None):
+
+        self.manifest_file_path = manifest_file_path
+        self.factory_options = dict(factory_options or dict())
+        self.zines = list() # (name, absolute folder)
+        self.timings = dict() # Zine name -> {stage: seconds}
+        self.failed = list()
+
+        self.load_manifest()
+
+    def load_manifest(self) -> None:
+        """
+        Read the zines and shared files of the manifest. Raise ValueError if it is malformed.
+        """
+
+        root = os.path.dirname(os.path.abspath(self.manifest_file_path))
+        try:
+            with open(self.manifest_file_path) as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError) as err:
+            raise ValueError(f'Batch manifest `{self.manifest_file_path}` could not be loaded. {err}')
+
+        for key in ('dictionary', 'cache'):
+            if manifest.get(key):
+                option = 'dictionary_file_path' if key == 'dictionary' else 'metadata_cache_file_path'
+                self.factory_options[option] = os.path.join(root, manifest[key])
+
+        # Entries of a shared cache are only valid for one dictionary, see ZineMetadataCache.
+        if manifest.get('cache') and not manifest.get('dictionary'):
+            raise ValueError('A shared metadata cache needs a shared dictionary.')
+
+        for zine in manifest.get('zines', list()):
+            if isinstance(zine, str):
+                zine = dict(folder=zine)
+            folder = os.path.join(root, zine['folder'])
+            name = zine.get('name') or os.path.basename(os.path.normpath(folder))
+            if not os.path.isdir(folder):
+                raise ValueError(f'Zine folder `{folder}` not found.')
+            if name in (existing for existing, _ in self.zines):
+                raise ValueError(f'Zine name `{name}` used twice.')
+            self.zines.append((name, folder))
+
+        if not self.zines:
+            raise ValueError(f'No zines in the batch manifest `{self.manifest_file_path}`.')
+
+    @contextmanager
+    def in_folder(self, folder:str):
+        """
+        Context manager running the enclosed code from the folder of a zine.
+        """
+
+        previous_folder = os.getcwd()
+        os.chdir(folder)
+        try:
+            yield
+        finally:
+            os.chdir(previous_folder)
+
+    def run(self, build = None) -> bool:
+        """
+        Scan and generate every zine, then build it with build(factory) if given (returns success).
+        A failing zine does not stop the batch. Return True if all zines succeeded.
+        """
+
+        self.timings.clear()
+        self.failed.clear()
+        jobs = self.factory_options.get('jobs') or os.cpu_count() or 1
+
+        logger.info(f'Batch of {len(self.zines)} zines, {jobs} worker processes.')
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for name, folder in self.zines:
+                logger.info(f'Zine `{name}` ({folder}).')
+                timings = self.timings[name] = dict()
+
+                try:
+                    with self.in_folder(folder):
+                        start = time.perf_counter()
+                        factory = ZineFactory(image_folder='images/', **self.factory_options)
+                        factory.pool = pool
+                        factory.scan()
+                        factory.generate()
+                        timings['images'] = len(factory.library_keys)
+                        timings['generate'] = time.perf_counter() - start
+
+                        if build is not None:
+                            start = time.perf_counter()
+                            succeeded = build(factory)
+                            timings['build'] = time.perf_counter() - start
+                            if not succeeded:
+                                self.failed.append(name)
+
+                except Exception as err:
+                    logger.error(f'Zine `{name}` failed. {type(err).__name__}: {err}')
+                    self.failed.append(name)
+
+        self.report()
+
+        return not self.failed
+
+    def report(self) -> None:
+        """
+        Log the time spent on every zine.
+        """
+
+        width = max(len(name) for name, _ in self.zines)
+        logger.info(f'{"zine":<{width}} {"images":>7} {"generate (s)":>13} {"build (s)":>10}  status')
+        for name, _ in self.zines:
+            timings = self.timings.get(name, dict())
+            build = f'{timings["build"]:>10.1f}' if 'build' in timings else f'{"-":>10}'
+            logger.info(
+                f'{name:<{width}} {timings.get("images", 0):>7} {timings.get("generate", 0):>13.1f} {build}  '
+                + ('failed' if name in self.failed else 'ok')
+            )
+
+        total = sum(timings.get('generate', 0) + timings.get('build', 0) for timings in self.timings.values())
+        logger.info(f'Batch completed in {total:.1f} s: {len(self.zines) - len(self.failed)} zines ok, {len(self.failed)} failed.')
@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import shutil
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger('Zine Builder')
+logger.setLevel(logging.INFO)
+
+
+class ZineBuildTarget():
+    """
+    One pdflatex document of the zine: its source files, the targets whose PDF it includes,
+    and where the resulting PDF is published (None: not published).
+    A target can compile another target's source (eg. content.tex) under its own name, with
+    TeX definitions run before the source (eg. to select other images). It can then start from
+    the aux files of that target (aux_source, a dependency): cross-references are already
+    resolved, and a single pass is enough.
+    """
+
+    def __init__(self, name:str, inputs:list, dependencies:list = None, max_passes:int = 1,
+                 publish_path:str = '', source:str = None, definitions:str = None, aux_source:str = None):
+
+        self.name = name
+        self.inputs = inputs
+        self.dependencies = dependencies or list()
+        self.max_passes = max_passes
+        self.publish_path = os.path.join('print', name + '.pdf') if publish_path == '' else publish_path
+        self.source = source or name + '.tex'
+        self.definitions = definitions
+        self.aux_source = aux_source
+
+    def get_source_path(self) -> str:
+        return self.source
+
+
+class ZineBuilder():
+    """
+    Replaces make.sh. Builds the zine documents as a dependency graph: independent documents are
+    compiled in parallel, each in its own work directory (aux, log and pdf files never collide),
+    and a document is only compiled again if one of its inputs changed since its last build.
+    Documents including the PDF of another document (cover, web) find it through TEXINPUTS.
+    Among the documents ready to be compiled, the ones that took longest last time start first.
+    """
+
+    build_folder = '.build/'
+    stamp_file_name = 'stamp.json'
+    timings_file_name = 'timings.json'
+
+    def __init__(self, targets:list, jobs:int = None, pdflatex:str = 'pdflatex'):
+
+        self.targets = {target.name: target for target in targets}
+        self.jobs = jobs or os.cpu_count() or 1
+        self.pdflatex = pdflatex
+        self.timings = dict() # Target name -> compile time of its last build, in seconds
+
+        for target in targets:
+            for dependency in target.dependencies:
+                if dependency not in self.targets:
+                    raise ValueError(f'Target `{target.name}` depends on unknown target `{dependency}`.')
+            if target.aux_source is not None and target.aux_source not in target.dependencies:
+                raise ValueError(f'Target `{target.name}` takes the aux files of `{target.aux_source}`, not a dependency.')
+
+    @classmethod
+    def get_zine_targets(cls, image_paths:list, thumbnail_paths:list, content_passes:int = 2,
+                         web_image_paths:list = None, image_folder:str = 'images/') -> list:
+        """
+        The documents of the zine, as previously built by make.sh.
+        The content document needs a second pass for the page references of the index,
+        unless the page numbers were resolved ahead of the build.
+        The web PDF includes content-web, the content document compiled with images-web.tex,
+        which embeds the screen resolution images instead of the originals. Its pages are the
+        same, so it reuses the cross-references of the content build, in a single pass.
+        The cover photo is front.jpg in the image folder (graphicspath of front.tex), tracked even
+        when missing so that adding it rebuilds the front page.
+        """
+
+        customs = ['defines.tex', 'template/customs.tex']
+        content_inputs = ['content.tex', 'copyright.tex', 'index.tex', 'template/prints.tex',
+                          'template/marmot.jpg'] + customs + list(thumbnail_paths)
+
+        return [
+            ZineBuildTarget('front', ['front.tex', os.path.join(image_folder, 'front.jpg')] + customs),
+            ZineBuildTarget(
+                'content', content_inputs + ['images.tex'] + list(image_paths), max_passes=content_passes
+            ),
+            ZineBuildTarget(
+                'content-web', content_inputs + ['images-web.tex'] + list(web_image_paths or list()),
+                dependencies=['content'], max_passes=content_passes, publish_path=None, source='content.tex',
+                definitions='\\def\\zineimages{images-web}', aux_source='content'
+            ),
+            ZineBuildTarget('spine', ['spine.tex', 'defines.tex']),
+            ZineBuildTarget('back', ['back.tex', 'template/marmot.jpg'] + customs),
+            ZineBuildTarget('cover', ['cover.tex'], dependencies=['back', 'spine', 'front']),
+            ZineBuildTarget(
+                'web', ['web.tex'], dependencies=['front', 'content-web', 'back'],
+                publish_path=os.path.join('web', 'zine.pdf')
+            ),
+        ]
+
+    def get_work_folder(self, target:ZineBuildTarget) -> str:
+        return os.path.join(self.build_folder, target.name)
+
+    def get_output_path(self, target:ZineBuildTarget) -> str:
+        return os.path.join(self.get_work_folder(target), target.name + '.pdf')
+
+    def get_signature(self, target:ZineBuildTarget) -> dict:
+        """
+        Size and modification time of every input of a target, including the PDFs of its dependencies.
+        """
+
+        paths = [target.get_source_path()] + list(target.inputs)
+        paths += [self.get_output_path(self.targets[dependency]) for dependency in target.dependencies]
+
+        signature = dict()
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature[path] = [stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                signature[path] = None
+
+        return dict(passes=target.max_passes, pdflatex=self.pdflatex, definitions=target.definitions,
+                    inputs=signature)
+
+    def is_up_to_date(self, target:ZineBuildTarget, signature:dict) -> bool:
+        """
+        Check whether the target was already built from these exact inputs.
+        """
+
+        stamp_path = os.path.join(self.get_work_folder(target), self.stamp_file_name)
+        try:
+            with open(stamp_path) as stamp:
+                return json.load(stamp) == signature and os.path.exists(self.get_output_path(target))
+        except Exception:
+            return False
+
+    def compile(self, target:ZineBuildTarget) -> tuple:
+        """
+        Run pdflatex on a target in its own work directory. Return (skipped, error).
+        """
+
+        signature = self.get_signature(target)
+        if self.is_up_to_date(target, signature):
+            logger.info(f'`{target.name}` is up to date.')
+            return True, None
+
+        work_folder = self.get_work_folder(target)
+        os.makedirs(work_folder, exist_ok=True)
+
+        # pdflatex writes the aux file of an \include'd file (eg. template/prints.tex) at the same
+        # relative path in the output directory, but does not create its folder.
+        for path in target.inputs:
+            folder = os.path.dirname(os.path.normpath(path))
+            if path.endswith('.tex') and folder and not os.path.isabs(folder) and not folder.startswith('..'):
+                os.makedirs(os.path.join(work_folder, folder), exist_ok=True)
+
+        if target.aux_source is not None:
+            self.copy_aux_files(self.targets[target.aux_source], target)
+
+        # Let pdflatex find the PDFs of the dependencies, then the default search path (trailing separator).
+        search_path = [os.path.abspath(self.get_work_folder(self.targets[dependency])) for dependency in target.dependencies]
+        environment = dict(os.environ)
+        environment['TEXINPUTS'] = os.pathsep.join(['.'] + search_path) + os.pathsep
+
+        command = [
+            self.pdflatex, '-interaction=nonstopmode', '-halt-on-error',
+            '-output-directory=' + work_folder, '-jobname=' + target.name
+        ]
+        if target.definitions is None:
+            command.append(target.get_source_path())
+        else:
+            command.append(target.definitions + '\\input{' + target.get_source_path() + '}')
+
+        start = time.perf_counter()
+        for run in range(1, target.max_passes + 1):
+            logger.info(f'Compiling `{target.name}` (pass {run}).')
+            try:
+                completed = subprocess.run(command, env=environment, capture_output=True, text=True, errors='replace')
+            except OSError as err:
+                return False, f'{self.pdflatex} could not be started. {err}'
+
+            if completed.returncode != 0:
+                log_path = os.path.join(work_folder, target.name + '.log')
+                return False, f'pdflatex failed with code {completed.returncode}, see `{log_path}`.'
+
+            # Stop early when cross-references are already resolved (aux files are kept between builds).
+            if 'Rerun to get' not in completed.stdout:
+                break
+
+        with open(os.path.join(work_folder, self.stamp_file_name), 'w') as stamp:
+            json.dump(signature, stamp, indent=4)
+
+        self.timings[target.name] = time.perf_counter() - start
+
+        return False, None
+
+    def copy_aux_files(self, source:ZineBuildTarget, target:ZineBuildTarget) -> None:
+        """
+        Copy the aux files of a target to the work folder of another one compiling the same document.
+        The main aux file is named after the job, the aux files of \\include'd files keep their path.
+        """
+
+        source_folder = self.get_work_folder(source)
+        target_folder = self.get_work_folder(target)
+        for root, folders, files in os.walk(source_folder):
+            for file in files:
+                if not file.endswith('.aux'):
+                    continue
+                path = os.path.relpath(os.path.join(root, file), source_folder)
+                copy_path = target.name + '.aux' if path == source.name + '.aux' else path
+                os.makedirs(os.path.join(target_folder, os.path.dirname(copy_path)), exist_ok=True)
+                shutil.copyfile(os.path.join(root, file), os.path.join(target_folder, copy_path))
+
+    def load_timings(self) -> None:
+        """
+        Load the compile times of the previous builds, if any.
+        """
+
+        try:
+            with open(os.path.join(self.build_folder, self.timings_file_name)) as timings:
+                self.timings = json.load(timings)
+        except Exception:
+            self.timings = dict()
+
+    def save_timings(self) -> None:
+        """
+        Keep the compile times for the scheduling of the next build.
+        """
+
+        os.makedirs(self.build_folder, exist_ok=True)
+        with open(os.path.join(self.build_folder, self.timings_file_name), 'w') as timings:
+            json.dump(self.timings, timings, indent=4, sort_keys=True)
+
+    def clean_publish_folders(self) -> None:
+        """
+        Empty the publication folders (print/, web/) like make.sh did, so that they only hold the
+        PDFs of this build: a failed target leaves no stale PDF behind.
+        """
+
+        folders = {os.path.dirname(target.publish_path) for target in self.targets.values() if target.publish_path}
+        for folder in sorted(folder for folder in folders if folder and os.path.isdir(folder)):
+            for file in os.listdir(folder):
+                path = os.path.join(folder, file)
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            logger.debug('Publication folder `%s` emptied.', folder)
+
+    def publish(self, target:ZineBuildTarget) -> None:
+        """
+        Copy the PDF of a target to its publication path (print/ or web/), if any.
+        """
+
+        if target.publish_path is None:
+            return
+
+        os.makedirs(os.path.dirname(target.publish_path), exist_ok=True)
+        shutil.copy2(self.get_output_path(target), target.publish_path)
+
+    def build(self) -> bool:
+        """
+        Build all targets, in parallel as far as dependencies allow. A failed target only
+        prevents the targets depending on it. Return True if all targets were built.
+        """
+
+        pending = dict(self.targets)
+        done = set()
+        failed = set()
+        running = dict()
+        compiled = skipped = 0
+        self.load_timings()
+        self.clean_publish_folders()
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while pending or running:
+
+                # Drop targets whose dependencies failed (transitively), start the ones which are ready.
+                dropped = True
+                while dropped:
+                    dropped = False
+                    for name, target in list(pending.items()):
+                        if any(dependency in failed for dependency in target.dependencies):
+                            logger.error(f'`{name}` not built, a dependency failed.')
+                            failed.add(name)
+                            del pending[name]
+                            dropped = True
+
+                for name, target in sorted(pending.items(), key=lambda item: -self.timings.get(item[0], 0)):
+                    if all(dependency in done for dependency in target.dependencies):
+                        running[pool.submit(self.compile, target)] = target
+                        del pending[name]
+
+                if not running:
+                    for name in pending:
+                        logger.error(f'`{name}` not built, circular dependency.')
+                        failed.add(name)
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    target = running.pop(future)
+
+                    # File system errors (work folder, aux files, publication) only fail this target.
+                    try:
+                        was_skipped, error = future.result()
+                        if error is None:
+                            self.publish(target)
+                    except OSError as err:
+                        error = err
+
+                    if error is not None:
+                        logger.error(f'`{target.name}` failed. {error}')
+                        failed.add(target.name)
+                        continue
+
+                    done.add(target.name)
+                    skipped += was_skipped
+                    compiled += not was_skipped
+
+        self.save_timings()
+        logger.info(f'Build completed: {compiled} compiled, {skipped} up to date, {len(failed)} failed.')
+
+        return not failed
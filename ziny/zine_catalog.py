@@ -0,0 +1,262 @@
+import os
+import re
+import json
+import shlex
+import sqlite3
+import logging
+
+logger = logging.getLogger('Zine Catalog')
+logger.setLevel(logging.INFO)
+
+
+class ZineCatalog():
+    """
+    Persistent (SQLite) catalog of the metadata of a photo archive, to build zines from a selection
+    of images (see select()) instead of a folder. Entries are keyed by image path and kept up to date
+    by ZineFactory.index_catalog(), using the same file signatures as the metadata cache.
+    Columns used by queries are indexed: capture date, camera, lens, aperture, visibility and tags.
+    The complete metadata and sidecar of every image are kept too, so that a selection is built
+    without reading the images again (see ZineFactory.select), as long as they did not change.
+
+    Query syntax: space separated terms, all of which must match. Values with spaces are quoted.
+        date:2023              date:2023-05              date:2023-05-01..2023-06-15    date:2024..
+        camera:"X-T4"          lens:"XF 35mm F1.4 R"     (make or model, case insensitive, * wildcards)
+        aperture:2.8           aperture:1.4..2.8         visibility:hidden
+        tag:portugal           (sidecar "tags" list)     folder:archive/2023
+    """
+
+    # Bump when the catalog format changes.
+    schema_version = 2
+
+    def __init__(self, catalog_file_path:str):
+
+        self.catalog_file_path = catalog_file_path
+        self._connection = None
+
+    def open(self) -> None:
+        """
+        Open (or create) the catalog database.
+        """
+
+        self._connection = sqlite3.connect(self.catalog_file_path)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)')
+
+        row = self._connection.execute("SELECT value FROM info WHERE key = 'schema'").fetchone()
+        if row is not None and row[0] != str(self.schema_version):
+            logger.info('Catalog format changed. Catalog rebuilt.')
+            self._connection.execute('DROP TABLE IF EXISTS images')
+            self._connection.execute('DROP TABLE IF EXISTS tags')
+
+        self._connection.executescript(
+            'CREATE TABLE IF NOT EXISTS images ('
+            'image_path TEXT PRIMARY KEY, folder TEXT, size INTEGER, mtime_ns INTEGER, sidecar_mtime_ns INTEGER, '
+            'taken TEXT, make TEXT COLLATE NOCASE, model TEXT COLLATE NOCASE, lens_make TEXT COLLATE NOCASE, '
+            'lens_model TEXT COLLATE NOCASE, aperture REAL, visibility TEXT, metadata TEXT, sidecar TEXT);'
+            'CREATE TABLE IF NOT EXISTS tags (image_path TEXT, tag TEXT COLLATE NOCASE);'
+            'CREATE INDEX IF NOT EXISTS images_folder ON images (folder);'
+            'CREATE INDEX IF NOT EXISTS images_taken ON images (taken);'
+            'CREATE INDEX IF NOT EXISTS images_make ON images (make);'
+            'CREATE INDEX IF NOT EXISTS images_model ON images (model);'
+            'CREATE INDEX IF NOT EXISTS images_lens_make ON images (lens_make);'
+            'CREATE INDEX IF NOT EXISTS images_lens_model ON images (lens_model);'
+            'CREATE INDEX IF NOT EXISTS images_aperture ON images (aperture);'
+            'CREATE INDEX IF NOT EXISTS images_visibility ON images (visibility);'
+            'CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag);'
+            'CREATE INDEX IF NOT EXISTS tags_image_path ON tags (image_path);'
+        )
+        self._connection.execute(
+            "INSERT OR REPLACE INTO info (key, value) VALUES ('schema', ?)", (str(self.schema_version),)
+        )
+
+        logger.debug('Catalog opened (%s).', self.catalog_file_path)
+
+    def close(self) -> None:
+        """
+        Commit and close.
+        """
+
+        if self._connection is None:
+            return
+
+        self._connection.commit()
+        self._connection.close()
+        self._connection = None
+
+    def get_metadata_version(self) -> str:
+        """
+        Version of the metadata of the entries (see ZineMetadataCache.compute_version), None if unknown.
+        """
+
+        row = self._connection.execute("SELECT value FROM info WHERE key = 'metadata'").fetchone()
+
+        return None if row is None else row[0]
+
+    def set_metadata_version(self, version:str) -> None:
+        self._connection.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('metadata', ?)", (version,))
+
+    def get_signatures(self, folder:str) -> dict:
+        """
+        Return the (size, mtime, sidecar mtime) signature of every cataloged image of a folder
+        (and its subfolders), by image path.
+        """
+
+        condition, parameters = self.get_folder_condition(folder)
+        rows = self._connection.execute(
+            'SELECT image_path, size, mtime_ns, sidecar_mtime_ns FROM images WHERE ' + condition, parameters
+        )
+
+        return {row[0]: tuple(row[1:]) for row in rows}
+
+    def store(self, meta, signature:tuple, taken:str) -> None:
+        """
+        Record the metadata (ZineImageMetadata, sidecar overwrites applied) of an image version.
+        taken is the capture date, as an ISO 8601 string (sortable).
+        """
+
+        size, mtime_ns, sidecar_mtime_ns = signature
+        folder = os.path.dirname(meta.image_path)
+        tags = meta.sidecar.get('tags', list())
+        if isinstance(tags, str):
+            tags = [tags]
+
+        self._connection.execute(
+            'INSERT OR REPLACE INTO images (image_path, folder, size, mtime_ns, sidecar_mtime_ns, taken, make, model, '
+            'lens_make, lens_model, aperture, visibility, metadata, sidecar) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (meta.image_path, folder, size, mtime_ns, sidecar_mtime_ns, taken, meta.make, meta.model,
+             meta.lens_make, meta.lens_model, self.parse_aperture(meta.aperture),
+             meta.sidecar.get('visibility', 'default'), json.dumps(meta.to_dict(), default=str),
+             json.dumps(meta.sidecar))
+        )
+        self._connection.execute('DELETE FROM tags WHERE image_path = ?', (meta.image_path,))
+        self._connection.executemany(
+            'INSERT INTO tags (image_path, tag) VALUES (?, ?)', [(meta.image_path, str(tag)) for tag in tags]
+        )
+
+    def remove(self, image_paths) -> None:
+        """
+        Remove the entries of images that no longer exist.
+        """
+
+        image_paths = [(image_path,) for image_path in image_paths]
+        self._connection.executemany('DELETE FROM images WHERE image_path = ?', image_paths)
+        self._connection.executemany('DELETE FROM tags WHERE image_path = ?', image_paths)
+
+    def select(self, query:str, with_metadata:bool = False) -> list:
+        """
+        Return the paths of the images matching the query (see the class documentation), sorted by path.
+        With metadata, return (image path, signature, metadata, sidecar) tuples instead: the stored
+        file signature, the to_dict() output of the metadata (sidecar overwrites applied) and the sidecar.
+        """
+
+        where, parameters = self.parse_query(query)
+        columns = 'image_path, size, mtime_ns, sidecar_mtime_ns, metadata, sidecar' if with_metadata else 'image_path'
+        sql = f'SELECT {columns} FROM images' + (' WHERE ' + ' AND '.join(where) if where else '') + ' ORDER BY image_path'
+        logger.debug('Catalog query: %s %s', sql, parameters)
+
+        rows = self._connection.execute(sql, parameters)
+        if not with_metadata:
+            return [row[0] for row in rows]
+
+        return [(row[0], tuple(row[1:4]), json.loads(row[4]), json.loads(row[5])) for row in rows]
+
+    def count(self) -> int:
+        return self._connection.execute('SELECT COUNT(*) FROM images').fetchone()[0]
+
+    def parse_query(self, query:str) -> tuple:
+        """
+        Translate a query into SQL conditions and their parameters. Raise ValueError if it is malformed.
+        """
+
+        where = list()
+        parameters = list()
+
+        for term in shlex.split(query):
+            key, separator, value = term.partition(':')
+            if not separator or not value:
+                raise ValueError(f'Malformed query term `{term}`, expected key:value.')
+
+            key = key.lower()
+            if key == 'date':
+                start, end = self.parse_range(value)
+                if start:
+                    where.append('taken >= ?')
+                    parameters.append(start)
+                if end:
+                    # Any date starting with the upper bound is included ('~' sorts after digits and separators).
+                    where.append('taken < ?')
+                    parameters.append(end + '~')
+
+            elif key in ('camera', 'lens'):
+                columns = ('make', 'model') if key == 'camera' else ('lens_make', 'lens_model')
+                if '*' in value:
+                    pattern = value.replace('%', r'\%').replace('_', r'\_').replace('*', '%')
+                    where.append('(' + ' OR '.join(f"{column} LIKE ? ESCAPE '\\'" for column in columns) + ')')
+                    parameters += [pattern] * len(columns)
+                else:
+                    where.append('(' + ' OR '.join(f'{column} = ?' for column in columns) + ')')
+                    parameters += [value] * len(columns)
+
+            elif key == 'aperture':
+                bounds = self.parse_range(value)
+                start, end = (self.parse_aperture(bound) for bound in bounds)
+                if (start is None and bounds[0]) or (end is None and bounds[1]):
+                    raise ValueError(f'Malformed aperture `{value}`.')
+                if start is not None:
+                    where.append('aperture >= ?')
+                    parameters.append(start - 0.05)
+                if end is not None:
+                    where.append('aperture <= ?')
+                    parameters.append(end + 0.05)
+
+            elif key == 'visibility':
+                where.append('visibility = ?')
+                parameters.append(value)
+
+            elif key == 'tag':
+                where.append('image_path IN (SELECT image_path FROM tags WHERE tag = ?)')
+                parameters.append(value)
+
+            elif key == 'folder':
+                condition, folder_parameters = self.get_folder_condition(value)
+                where.append(condition)
+                parameters += folder_parameters
+
+            else:
+                raise ValueError(f'Unknown query key `{key}`. Use date, camera, lens, aperture, visibility, tag or folder.')
+
+        return where, parameters
+
+    def get_folder_condition(self, folder:str) -> tuple:
+        """
+        SQL condition (and its parameters) matching the images of a folder and its subfolders.
+        Subfolders are matched as a range of paths rather than with LIKE, which would take `_` and `%`
+        in folder names for wildcards and ignore case ('0' is the character after '/').
+        """
+
+        folder = folder.rstrip('/')
+
+        return '(folder = ? OR (folder >= ? AND folder < ?))', [folder, folder + '/', folder + '0']
+
+    def parse_range(self, value:str) -> tuple:
+        """
+        Split `a..b`, `a..` or `..b` into its bounds (None when open). A single value is both bounds.
+        """
+
+        if '..' not in value:
+            return value, value
+
+        start, end = value.split('..', 1)
+
+        return start or None, end or None
+
+    @staticmethod
+    def parse_aperture(aperture) -> float:
+        """
+        f-number of an aperture such as `f/2.8` or `2.8`. None if unknown or malformed.
+        """
+
+        match = re.fullmatch(r'\s*(?:f/)?(\d+(?:\.\d+)?)\s*', str(aperture or ''))
+        if match is None:
+            return None
+
+        return float(match.group(1))
@@ -0,0 +1,62 @@
+import logging
+
+logger = logging.getLogger('Zine Duplicate Index')
+logger.setLevel(logging.INFO)
+
+
+class ZineDuplicateIndex():
+    """
+    Finds near-duplicate images from their 64-bit perceptual hashes (see perceptual_hash) without
+    comparing every pair. Hashes are split into `max_distance + 1` bands, and indexed by band value:
+    two hashes within `max_distance` differing bits have at least one identical band (pigeonhole),
+    so only the hashes sharing a band with a new one are compared to it.
+    Bands get narrower as the distance grows: beyond max_indexed_distance, bands are 3 bits or less,
+    nearly all hashes share a band and the index degrades towards comparing every pair.
+    """
+
+    hash_bits = 64
+    max_indexed_distance = 15
+
+    def __init__(self, max_distance:int = 4):
+
+        if not 0 <= max_distance <= self.max_indexed_distance:
+            raise ValueError(f'Perceptual hash distance must be between 0 and {self.max_indexed_distance}.')
+
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_bits = self.hash_bits // self.bands
+
+        self.hashes = dict() # Key -> hash
+        self.buckets = dict() # (band, band value) -> keys
+
+    def get_bands(self, perceptual_hash:int):
+        """
+        Yield the (band, band value) pairs of a hash. The last band takes the remaining bits.
+        """
+
+        mask = (1 << self.band_bits) - 1
+        for band in range(self.bands - 1):
+            yield band, (perceptual_hash >> (band * self.band_bits)) & mask
+        yield self.bands - 1, perceptual_hash >> ((self.bands - 1) * self.band_bits)
+
+    def add(self, key:str, perceptual_hash:int) -> list:
+        """
+        Index a hash. Return the (key, distance) pairs of the already indexed hashes
+        within the maximum distance, closest first.
+        """
+
+        candidates = set()
+        for bucket in self.get_bands(perceptual_hash):
+            keys = self.buckets.setdefault(bucket, list())
+            candidates.update(keys)
+            keys.append(key)
+
+        self.hashes[key] = perceptual_hash
+
+        matches = list()
+        for candidate in candidates:
+            distance = (self.hashes[candidate] ^ perceptual_hash).bit_count()
+            if distance <= self.max_distance:
+                matches.append((candidate, distance))
+
+        return sorted(matches, key=lambda match: (match[1], match[0]))
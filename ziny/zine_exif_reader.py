@@ -0,0 +1,202 @@
+import struct
+import logging
+
+from PIL.TiffImagePlugin import IFDRational
+from PIL.ExifTags import Base
+
+logger = logging.getLogger('Zine EXIF Reader')
+logger.setLevel(logging.INFO)
+
+
+class ZineExifReader():
+    """
+    Minimal JPEG EXIF reader. Walks the JPEG segment headers up to the APP1 (Exif) segment and
+    decodes only the TIFF IFD entries consumed by ZineImageMetadata.parse_exif_data().
+    Only the segment headers and the Exif segment itself are read from disk, a few tens of kB
+    at most, instead of setting up a full PIL image.
+    Values are decoded the same way PIL's _getexif() does, so both readers are interchangeable.
+    """
+
+    # Tags consumed by ZineImageMetadata.parse_exif_data()
+    tags = frozenset(tag.value for tag in (
+        Base.ImageDescription, Base.Make, Base.Model, Base.ISOSpeedRatings, Base.DateTimeOriginal,
+        Base.ExposureTime, Base.FNumber, Base.ExposureBiasValue, Base.LensMake, Base.LensModel,
+        Base.MeteringMode, Base.ExposureProgram, Base.WhiteBalance
+    ))
+
+    exif_ifd_pointer = Base.ExifOffset.value
+
+    # TIFF field types: (struct format, size in bytes)
+    field_types = {
+        2: ('s', 1),  # ASCII
+        3: ('H', 2),  # SHORT
+        4: ('L', 4),  # LONG
+        5: ('L', 8),  # RATIONAL
+        8: ('h', 2),  # SSHORT
+        9: ('l', 4),  # SLONG
+        10: ('l', 8), # SRATIONAL
+    }
+
+    def __init__(self):
+
+        self.bytes_read = 0
+
+    def read(self, image_path:str) -> dict:
+        """
+        Return the {tag: value} dictionary of the relevant EXIF tags, or None if the file could not
+        be decoded (not a JPEG, no Exif segment, corrupted IFD...). Callers should then fall back to PIL.
+        """
+
+        try:
+            segment = self._read_exif_segment(image_path)
+            if segment is None:
+                return None
+            return self._parse_tiff(segment)
+
+        except (OSError, struct.error, ValueError, IndexError) as err:
+            logger.debug('EXIF data of `%s` could not be read directly. %s', image_path, err)
+            return None
+
+    # Start of frame markers (baseline, progressive, lossless...), which hold the image dimensions.
+    start_of_frame_markers = frozenset((0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF))
+
+    def read_dimensions(self, image_path:str) -> tuple:
+        """
+        Return the (width, height) of a JPEG image from its start of frame segment, without
+        decoding anything else. None if the file could not be read this way.
+        """
+
+        try:
+            with open(image_path, 'rb') as imgfile:
+
+                if imgfile.read(2) != b'\xff\xd8':
+                    return None
+                self.bytes_read += 2
+
+                while True:
+                    header = imgfile.read(4)
+                    self.bytes_read += len(header)
+                    if len(header) < 4 or header[0] != 0xFF:
+                        return None
+
+                    marker = header[1]
+                    length = struct.unpack('>H', header[2:])[0]
+
+                    if marker in (0xDA, 0xD9):
+                        return None
+
+                    if marker in self.start_of_frame_markers:
+                        frame = imgfile.read(5)
+                        self.bytes_read += len(frame)
+                        _, height, width = struct.unpack('>BHH', frame)
+                        return width, height
+
+                    imgfile.seek(length - 2, 1)
+
+        except (OSError, struct.error) as err:
+            logger.debug('Dimensions of `%s` could not be read directly. %s', image_path, err)
+            return None
+
+    def _read_exif_segment(self, image_path:str) -> bytes:
+        """
+        Skip from segment header to segment header until the APP1 Exif segment. Return its TIFF payload.
+        """
+
+        with open(image_path, 'rb') as imgfile:
+
+            if imgfile.read(2) != b'\xff\xd8':
+                return None
+            self.bytes_read += 2
+
+            while True:
+                header = imgfile.read(4)
+                self.bytes_read += len(header)
+                if len(header) < 4 or header[0] != 0xFF:
+                    return None
+
+                marker = header[1]
+                length = struct.unpack('>H', header[2:])[0]
+
+                # Start of scan or end of image: no Exif segment before the image data.
+                if marker in (0xDA, 0xD9):
+                    return None
+
+                if marker == 0xE1:
+                    segment = imgfile.read(length - 2)
+                    self.bytes_read += len(segment)
+                    if segment.startswith(b'Exif\x00\x00'):
+                        return segment[6:]
+                else:
+                    imgfile.seek(length - 2, 1)
+
+    def _parse_tiff(self, tiff:bytes) -> dict:
+        """
+        Decode IFD0 and the Exif sub-IFD, keeping only the relevant tags.
+        """
+
+        if tiff[:2] == b'II':
+            byte_order = '<'
+        elif tiff[:2] == b'MM':
+            byte_order = '>'
+        else:
+            raise ValueError('Invalid TIFF byte order.')
+
+        magic, ifd0_offset = struct.unpack(byte_order + 'HL', tiff[2:8])
+        if magic != 42:
+            raise ValueError('Invalid TIFF header.')
+
+        exifdata = dict()
+        exif_ifd_offset = self._parse_ifd(tiff, ifd0_offset, byte_order, exifdata)
+        if exif_ifd_offset is not None:
+            self._parse_ifd(tiff, exif_ifd_offset, byte_order, exifdata)
+
+        return exifdata
+
+    def _parse_ifd(self, tiff:bytes, offset:int, byte_order:str, exifdata:dict) -> int:
+        """
+        Decode the relevant entries of one IFD into exifdata. Return the Exif sub-IFD offset, if any.
+        """
+
+        exif_ifd_offset = None
+        count = struct.unpack(byte_order + 'H', tiff[offset:offset + 2])[0]
+
+        for index in range(count):
+            entry = tiff[offset + 2 + 12 * index:offset + 14 + 12 * index]
+            tag, field_type, value_count = struct.unpack(byte_order + 'HHL', entry[:8])
+
+            if tag == self.exif_ifd_pointer:
+                exif_ifd_offset = struct.unpack(byte_order + 'L', entry[8:])[0]
+            elif tag in self.tags and field_type in self.field_types:
+                exifdata[tag] = self._decode_value(tiff, entry, field_type, value_count, byte_order)
+
+        return exif_ifd_offset
+
+    def _decode_value(self, tiff:bytes, entry:bytes, field_type:int, value_count:int, byte_order:str):
+        """
+        Decode one IFD entry value, following the offset if the value doesn't fit in the entry.
+        """
+
+        fmt, size = self.field_types[field_type]
+        data_size = size * value_count
+
+        if data_size <= 4:
+            data = entry[8:8 + data_size]
+        else:
+            data_offset = struct.unpack(byte_order + 'L', entry[8:])[0]
+            data = tiff[data_offset:data_offset + data_size]
+            if len(data) != data_size:
+                raise ValueError('IFD entry value out of bounds.')
+
+        # Same conventions as PIL: strip one trailing NUL, latin-1 strings, single values unwrapped.
+        if field_type == 2:
+            if data.endswith(b'\x00'):
+                data = data[:-1]
+            return data.decode('latin-1', 'replace')
+
+        if field_type in (5, 10):
+            values = struct.unpack(f'{byte_order}{2 * value_count}{fmt}', data)
+            values = tuple(IFDRational(num, denom) for num, denom in zip(values[::2], values[1::2]))
+        else:
+            values = struct.unpack(f'{byte_order}{value_count}{fmt}', data)
+
+        return values[0] if len(values) == 1 else values
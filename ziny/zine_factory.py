@@ -1,14 +1,42 @@
 import os
+import re
+import json
+import glob
+import hashlib
+import time
+import queue
 import logging
+import threading
+from functools import partial
+from collections import deque
+from contextlib import nullcontext, ExitStack
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from PIL import Image
 
 from ziny.zine_image_metadata import ZineImageMetadata
-from ziny.zine_index_template import ZineIndexTemplate
+from ziny.zine_template_engine import ZineTemplateEngine
+from ziny.zine_metadata_cache import ZineMetadataCache
+from ziny.zine_exif_reader import ZineExifReader
+from ziny.zine_thumbnail_manifest import ZineThumbnailManifest
+from ziny.zine_sidecar_store import ZineSidecarStore
+from ziny.zine_latex_output import ZineLatexOutput
+from ziny.zine_image_processing import render_thumbnail, render_web_image, render_print_image, render_atlas, hash_file
+from ziny.zine_image_processing import run_profiled, run_in_folder
+from ziny.zine_image_processing import read_image_header, estimate_decode_memory, perceptual_hash
+from ziny.zine_latency_recorder import ZineLatencyRecorder
+from ziny.zine_watcher import ZineWatcher
+from ziny.zine_duplicate_index import ZineDuplicateIndex
+from ziny.zine_catalog import ZineCatalog
+from ziny.zine_layout import ZineLayout, ZineLayoutEntry
+from ziny.zine_job_scheduler import ZineJobScheduler
 
 logger = logging.getLogger('Zine Factory')
 logger.setLevel(logging.INFO)
 
+# Shared no-op context manager for unmeasured stages.
+untimed = nullcontext()
+
 
 class ZineFactory():
 
@@ -20,6 +48,12 @@ class ZineFactory():
     \\end{{figure}}
     """
 
+    # Same, with the screen resolution version of the image (web build).
+    web_content_template = content_template.replace('{{{image_path}}}%', '{{{web_image_path}}}%')
+
+    # Same, with the print resolution version of the image (print normalization).
+    print_content_template = content_template.replace('{{{image_path}}}%', '{{{print_image_path}}}%')
+
     # Visibility: default, hidden
     # Layout: auto, single (single image on page)
     # Position: auto, top, bottom (only if layout=single)
@@ -46,26 +80,349 @@ class ZineFactory():
     }"""
 
     # Zine thumbnails for the index.
+    thumbnail_folder = 'thumbnails/'
     thumbnail_size = 1024, 1024
+    thumbnail_resampling = Image.Resampling.LANCZOS
+    thumbnail_manifest_file_name = 'manifest.json'
+
+    # Thumbnail decoding profiles (quality/speed trade-off), as Pillow `reducing_gap` values.
+    # full: decode the whole image, then resample. Slowest, most memory.
+    # quality: let the JPEG decoder scale down to at least twice the thumbnail size (Pillow default).
+    # fast: let the JPEG decoder scale down as close as possible to the thumbnail size.
+    thumbnail_profiles = {
+        'full': None,
+        'quality': 2.0,
+        'fast': 1.0
+    }
 
-    def __init__(self, image_folder:str):
+    # Screen resolution versions of the content images, for the web build.
+    web_image_folder = 'web_images/'
+    web_image_long_edge = 2000
+    web_image_quality = 85
+    web_image_manifest_file_name = 'manifest.json'
+
+    # Print resolution versions of the content images (README export settings: 16.00 cm at 550 dpi).
+    # The box is the \includegraphics one of the content template: 160 mm wide, \textheight
+    # (about 240 mm with the content.tex geometry) high.
+    print_image_folder = 'print_images/'
+    print_image_box_mm = 160, 240
+    print_image_dpi = 550
+    print_image_quality = 96
+
+    # Index atlases: the thumbnails of each index page composed into a single image (contact sheet) at
+    # the print dpi, so that the index embeds one image per page instead of one per entry. Pages hold
+    # `index_atlas_rows` entries of a fixed height, side by side with their cell of the atlas. Thumbnails
+    # are fitted in the cell (width, height in mm), less the space between entries.
+    atlas_folder = 'atlases/'
+    index_atlas_rows = 5
+    index_atlas_cell_mm = 40, 48
+    index_atlas_spacing_mm = 5
+
+    index_atlas_page_template = """
+    \\clearpage
+    \\noindent\\begin{{minipage}}[t]{{0.25\\textwidth}}
+    \\vspace{{0pt}}
+    \\includegraphics[width={width}mm, height={height}mm]{{{atlas_path}}}
+    \\end{{minipage}}
+    \\hfill
+    \\begin{{minipage}}[t]{{0.70\\textwidth}}
+    \\vspace{{0pt}}
+    {cells}\\end{{minipage}}
+    """
+
+    index_atlas_cell_template = (
+        "\\begin{{minipage}}[c][{height}mm]{{\\linewidth}}\n"
+        "{text}"
+        "\\end{{minipage}}\\par\\nointerlineskip\n"
+    )
+
+    # Metadata cache, stored in the image folder.
+    metadata_cache_file_name = '.zine_cache.sqlite'
+
+    # Substitution dictionary (see ZineImageMetadata).
+    dictionary_file_path = 'dictionary.json'
+
+    def __init__(self, image_folder:str, use_cache:bool = True, jobs:int = None,
+                 thumbnail_profile:str = 'quality', scan_concurrency:int = 1, sidecar_store:bool = False,
+                 first_page:int = None, template_folder:str = None, web_image_long_edge:int = None,
+                 web_image_quality:int = None, normalize_print:bool = False, print_image_dpi:int = None,
+                 memory_budget_mb:int = None, skip_duplicates:bool = False, near_duplicate_distance:int = None,
+                 dictionary_file_path:str = None, metadata_cache_file_path:str = None, auto_layout:bool = False,
+                 index_atlas:bool = False):
+
+        if thumbnail_profile not in self.thumbnail_profiles:
+            raise ValueError(f'Unknown thumbnail profile `{thumbnail_profile}`.')
+        if near_duplicate_distance is not None and not 0 <= near_duplicate_distance <= ZineDuplicateIndex.max_indexed_distance:
+            raise ValueError(
+                f'Near duplicate distance must be between 0 and {ZineDuplicateIndex.max_indexed_distance}.'
+            )
 
         self.image_folder = image_folder
-        self.library = dict()
-        self.library_keys = list()
+        self.jobs = jobs or os.cpu_count() or 1
+        self.thumbnail_profile = thumbnail_profile
+        self.scan_concurrency = max(1, scan_concurrency)
+        self.web_image_long_edge = web_image_long_edge or self.web_image_long_edge
+        self.web_image_quality = web_image_quality or self.web_image_quality
+        self.print_image_dpi = print_image_dpi or self.print_image_dpi
+
+        # Print normalization: the content embeds images resampled to the pixel size they are printed at.
+        self.normalize_print = normalize_print
+        content_template = self.print_content_template if normalize_print else self.content_template
+
+        # Memory budget of the image decodes running at once, in bytes (None: unlimited). Decode sizes
+        # are estimated from the image headers, see get_decode_memory().
+        self.memory_budget = memory_budget_mb * 2**20 if memory_budget_mb else None
+        self.oversized_images = dict() # Image path -> estimated decode memory over the budget
+
+        # Exact copies (same content hash) of an image are left out of the library, see discard_duplicates().
+        # Near-duplicates (perceptual hashes of the thumbnails within the distance) are only reported.
+        self.skip_duplicates = skip_duplicates
+        self.near_duplicate_distance = near_duplicate_distance
+        self.duplicates = dict() # Skipped image path -> image path kept in the library
+
+        # Image paths to build the zine from (eg. a catalog selection, see ZineCatalog), instead of the image folder.
+        # Cataloged entries of the selection are loaded as they are, as long as their files did not change.
+        self.selection = None
+        self.cataloged = dict() # Image path -> (signature, metadata, sidecar)
+
+        # Page number of the first image in content.tex. When known, the index contains literal
+        # page numbers instead of \pageref, and content.tex only needs a single pdflatex pass.
+        self.first_page = first_page
+
+        # Auto layout: sidecar layout, position and visibility are honoured, and compatible images share
+        # pages (see ZineLayout). Pages of the last generation, in order. None: one image per page.
+        self.layout = ZineLayout() if auto_layout else None
+        self.layout_pages = list()
+
+        # Index atlases (see atlas_folder). Pages of the last generation, as (atlas path, images) pairs.
+        self.index_atlas = index_atlas
+        self.atlas_pages = list()
+
+        # LaTeX templates, compiled once. Files in the template folder override the defaults.
+        if template_folder is None:
+            self.template_engine = ZineTemplateEngine(
+                content_template, web_content_template=self.web_content_template,
+                web_image_folder=self.web_image_folder, print_image_folder=self.print_image_folder,
+                get_output_file_name=self.get_output_file_name
+            )
+        else:
+            self.template_engine = ZineTemplateEngine.from_folder(
+                template_folder, content_template, self.web_content_template, self.web_image_folder,
+                self.print_image_folder, self.get_output_file_name
+            )
+        self.latency = None
+        self.profiler = None # ZineProfiler, when profiling
+        self.library = dict() # Insertion ordered, image path -> ZineImageMetadata
+        self.latex_outputs = dict() # Output path -> ZineLatexOutput of the last generation
+
+        self.exif_reader = ZineExifReader()
+
+        # Consolidated sidecar store (see ZineSidecarStore). Existing store records are always
+        # honoured. Without the store, a sidecar file is created from the template for images
+        # that have neither a sidecar file nor a store record.
+        self.use_sidecar_store = sidecar_store
+        self.sidecar_store = ZineSidecarStore(
+            ZineImageMetadata.share_sidecar(json.loads(self.sidecar_template))
+        )
+
+        # Substitution dictionary, shared by all metadata records of the process.
+        self.dictionary_file_path = dictionary_file_path or self.dictionary_file_path
+        ZineImageMetadata.dictionary_file_path = self.dictionary_file_path
+
+        # Process pool shared with other factories (batch mode, see ZineBatch). None: one pool per stage.
+        self.pool = None
+
+        # The metadata cache is stored in the image folder, unless another cache file is given
+        # (eg. shared by several zines). Entries are then keyed by absolute path.
+        self.metadata_cache = None
+        if use_cache and metadata_cache_file_path is None:
+            self.metadata_cache = ZineMetadataCache(
+                os.path.join(self.image_folder, self.metadata_cache_file_name), self.dictionary_file_path
+            )
+        elif use_cache:
+            self.metadata_cache = ZineMetadataCache(metadata_cache_file_path, self.dictionary_file_path, os.getcwd())
+
+    @property
+    def library_keys(self):
+        """
+        Image paths of the library, in order. Read-only view on the library keys.
+        """
+
+        return self.library.keys()
 
     def scan(self):
         """
         Lists all image files in the input_dir folder. Sorted by name.
+        With a scan concurrency above 1, the sidecar and EXIF reads of several images overlap
+        (thread pool) to hide storage latency. IDs and library order stay the same, and
+        per-stage latency percentiles are reported.
         """
 
         logger.info(f'Scanning folder `{self.image_folder}`')
 
+        with self.measure('scan'):
+            self._scan()
+
+        logger.info(f'Scanning completed. A total of {len(self.library_keys)} entries were added to the library.')
+
+    def _scan(self):
+        """
+        Body of scan(), measured as a whole.
+        """
+
         self.library.clear()
-        self.library_keys.clear()
-        id = 1 # Start at 1 like normal human beings.
+        bytes_read = self.exif_reader.bytes_read
+
+        if self.metadata_cache is not None:
+            self.metadata_cache.open()
+
+        image_paths = self.discard_duplicates(self.discover_images())
+
+        if self.scan_concurrency <= 1:
+
+            # Start at 1 like normal human beings.
+            for id, relative_image_path in enumerate(image_paths, start=1):
+
+                # Add image data to library (dictionaries keep the insertion order)
+                self.library[relative_image_path] = self.load_image(relative_image_path, id)
+
+        else:
+            self.latency = ZineLatencyRecorder()
+            relative_image_paths = list(image_paths)
+            ids = range(1, len(relative_image_paths) + 1)
+
+            # Executor.map returns results in submission order, whatever the completion order.
+            with ThreadPoolExecutor(max_workers=self.scan_concurrency) as pool:
+                for relative_image_path, meta in zip(relative_image_paths, pool.map(self.load_image, relative_image_paths, ids)):
+                    self.library[relative_image_path] = meta
+
+            self.latency.report()
+            self.latency = None
+
+        # A selection only looks up some of the entries, keep the others (eg. for normal builds).
+        if self.metadata_cache is not None:
+            self.metadata_cache.close(prune=self.selection is None)
+            self.metadata_cache.report()
+
+        self.count('bytes read', self.exif_reader.bytes_read - bytes_read)
+
+    def generate(self) -> None:
+        """
+        Generate everything the LaTeX build needs from the library: thumbnails, web images,
+        print images (with print normalization), the page layout (with auto layout), index atlases
+        (with index atlases), and the content, web content and index LaTeX files.
+        """
+
+        self.generate_thumbnails()
+        if self.near_duplicate_distance is not None:
+            self.report_near_duplicates({key: self.library.get(key).thumbnail_path for key in self.library_keys})
+        self.generate_web_images()
+        if self.normalize_print:
+            self.generate_print_images()
+        if self.layout is not None:
+            self.plan_layout()
+        if self.index_atlas:
+            self.generate_index_atlases()
+        self.generate_latex_content()
+        self.generate_latex_web_content()
+        self.generate_latex_index()
+
+    def update(self, changed_paths) -> set:
+        """
+        Bring the library up to date after changes of image files, sidecar files, sidecar stores or
+        the substitution dictionary. Only the affected images are extracted again (a dictionary
+        change affects them all), the others keep their metadata. IDs and page numbers follow
+        the new image order. Return the paths of the added, modified and removed images.
+        """
+
+        affected = set()
+        reload_all = False
+        for path in changed_paths:
+            file = os.path.basename(path)
+            if os.path.normpath(path) == os.path.normpath(self.dictionary_file_path):
+                reload_all = True
+            elif file == ZineSidecarStore.store_file_name:
+                folder = os.path.dirname(path)
+                self.sidecar_store.forget_folder(folder)
+                affected.update(key for key in self.library_keys if os.path.dirname(key) == folder)
+            elif file.endswith('.jpg.json'):
+                affected.add(path[:-len('.json')])
+            elif file.endswith('.jpg'):
+                affected.add(path)
+
+        if not affected and not reload_all:
+            return set()
+
+        if self.metadata_cache is not None:
+            self.metadata_cache.open()
+
+        image_paths = list(self.discard_duplicates(self.discover_images()))
+        removed = self.library.keys() - set(image_paths)
+        updated = set(removed)
+
+        library = dict()
+        for id, relative_image_path in enumerate(image_paths, start=1):
+            meta = self.library.get(relative_image_path)
+            if meta is None or reload_all or relative_image_path in affected:
+                meta = self.load_image(relative_image_path, id)
+                updated.add(relative_image_path)
+            else:
+                meta.set_id(id)
+                meta.set_page(self.get_page_number(id))
+            library[relative_image_path] = meta
 
-        for root, _, files in os.walk(self.image_folder):
+        # Entries of unchanged images were not looked up, keep them.
+        if self.metadata_cache is not None:
+            self.metadata_cache.close(prune=False)
+
+        self.library = library
+
+        return updated
+
+    def watch(self, on_update = None, debounce:float = 0.5) -> None:
+        """
+        Keep the library in memory, and regenerate the thumbnails and LaTeX outputs whenever
+        images, sidecars or the dictionary change (see update()). Only new and modified images
+        get a new thumbnail, and LaTeX outputs are only rewritten if their content changed.
+        on_update is called after every regeneration (eg. to build the PDFs).
+        Call after a first generation. Blocks until interrupted.
+        """
+
+        folders = [self.image_folder]
+        if self.selection is not None:
+            folders = sorted({os.path.dirname(image_path) or '.' for image_path in self.selection})
+
+        watcher = ZineWatcher(folders + [self.dictionary_file_path], debounce)
+        logger.info(f'Watching `{"`, `".join(folders)}` and `{self.dictionary_file_path}` for changes.')
+
+        try:
+            while True:
+                changed = watcher.wait_for_changes()
+                with self.measure('update'):
+                    updated = self.update(changed)
+                if not updated:
+                    continue
+
+                logger.info(f'{len(updated)} images added, modified or removed. Regenerating.')
+                self.generate()
+
+                if on_update is not None:
+                    on_update()
+
+        finally:
+            watcher.close()
+
+    def discover_images(self, folder:str = None):
+        """
+        Yield the relative path of every image file in the image folder (or the given folder). Sorted by name.
+        With a selection, yield the selected images instead (unless a folder is given).
+        """
+
+        if self.selection is not None and folder is None:
+            yield from self.selection
+            return
+
+        for root, _, files in os.walk(folder or self.image_folder):
 
             # Sorting images to create a first indexing
             for file in sorted(files):
@@ -78,26 +435,399 @@ class ZineFactory():
                 elif file.endswith('.jpg'):
                     relative_image_path = os.path.join(root, file)
                     logger.info(f'Found image `{relative_image_path}`')
+                    yield relative_image_path
 
-                    # Create ZineImageMetadata from reading out EXIF data
-                    meta = self.extract_metadata_from_exif_data(relative_image_path, id)
-                    meta.set_id(id)
-
-                    # Load any additional metadata from sidecar file. Or create it if missing.
-                    relative_sidecar_path = self.get_sidecar_file_path(relative_image_path)
-                    if not self.is_sidecar_file_found(relative_sidecar_path):
-                        logger.warning(f'No Sidecar file found for this image. Creating one based on template.' )
-                        self.create_sidecar_file_from_template(relative_sidecar_path)
-                    
-                    meta.extract_sidecar_data(relative_sidecar_path)
-                    meta.apply_sidecar_overwrites()
-
-                    # Add image data to library and keeping track of the order with self.library_keys
-                    self.library_keys.append(relative_image_path)
-                    self.library[relative_image_path] = meta
-                    id += 1
-        
-        logger.info(f'Scanning completed. A total of {len(self.library_keys)} entries were added to the library.')
+    def discard_duplicates(self, image_paths):
+        """
+        With skip_duplicates, leave out the exact copies (same content hash, see get_content_hashes)
+        of images found earlier, and record them in self.duplicates. Return the remaining image paths.
+        Hashes are looked up in a dictionary, the cost stays linear with the number of images.
+        """
+
+        self.duplicates.clear()
+        if not self.skip_duplicates:
+            return image_paths
+
+        with self.measure('duplicates'):
+            image_paths = list(image_paths)
+            content_hashes = self.get_content_hashes(image_paths)
+
+            originals = dict() # Content hash -> first image path
+            kept = list()
+            for image_path in image_paths:
+                content_hash = content_hashes.get(image_path)
+                original = image_path if content_hash is None else originals.setdefault(content_hash, image_path)
+                if original == image_path:
+                    kept.append(image_path)
+                else:
+                    self.duplicates[image_path] = original
+                    logger.warning(f'`{image_path}` is a copy of `{original}`. Skipped.')
+
+        if self.duplicates:
+            logger.info(f'{len(self.duplicates)} exact duplicates skipped.')
+
+        return kept
+
+    def report_near_duplicates(self, thumbnail_paths:dict) -> list:
+        """
+        Report the images that look alike: perceptual hashes (see perceptual_hash) of their thumbnails
+        (image path -> thumbnail path) within near_duplicate_distance differing bits. Pairs are found
+        with a banded hash index (see ZineDuplicateIndex) instead of comparing every pair.
+        Return the (image path, similar image path, distance) triplets.
+        """
+
+        image_paths = [image_path for image_path, thumbnail_path in thumbnail_paths.items() if thumbnail_path]
+
+        with self.measure('near duplicates'):
+            jobs = [(thumbnail_paths[image_path],) for image_path in image_paths]
+            # Thumbnails are decoded close to 36x32 pixels (see perceptual_hash).
+            costs = [self.get_decode_memory(job[0], (36, 32), 1.0) for job in jobs]
+            results = self.run_jobs(perceptual_hash, jobs, 'perceptual hash', costs)
+
+            index = ZineDuplicateIndex(self.near_duplicate_distance)
+            near_duplicates = list()
+            for image_path, (value, error) in zip(image_paths, results):
+                if error is not None:
+                    logger.error(f'Perceptual hash of `{image_path}` could not be computed. {error}')
+                    continue
+                for similar_image_path, distance in index.add(image_path, value):
+                    near_duplicates.append((image_path, similar_image_path, distance))
+
+        for image_path, similar_image_path, distance in near_duplicates:
+            logger.warning(f'`{image_path}` looks like `{similar_image_path}` ({distance} bits apart).')
+
+        logger.info(f'Near duplicates: {len(near_duplicates)} pairs among {len(image_paths)} images.')
+
+        return near_duplicates
+
+    def index_catalog(self, catalog:ZineCatalog, folder:str) -> tuple:
+        """
+        Add the images of a folder (and subfolders) to the catalog, or bring their entries up to date.
+        Only new and modified images or sidecar files are loaded (see load_image), with the scan
+        concurrency. Entries of deleted images are removed. Return the (updated, removed) counts.
+        """
+
+        logger.info(f'Indexing folder `{folder}` into the catalog `{catalog.catalog_file_path}`.')
+
+        # Entries indexed with another dictionary or inference code are all outdated.
+        version = self.get_metadata_version()
+        cataloged = catalog.get_signatures(folder) if catalog.get_metadata_version() == version else dict()
+        catalog.set_metadata_version(version)
+
+        discovered = set()
+        image_paths = list()
+        signatures = dict()
+        for image_path in self.discover_images(folder):
+            discovered.add(image_path)
+            signature = ZineMetadataCache.get_signature(image_path, self.get_sidecar_file_path(image_path))
+            if cataloged.get(image_path) != signature:
+                image_paths.append(image_path)
+                signatures[image_path] = signature
+        removed = cataloged.keys() - discovered
+
+        if self.metadata_cache is not None:
+            self.metadata_cache.open()
+
+        with ThreadPoolExecutor(max_workers=self.scan_concurrency) as pool:
+            for image_path, meta in zip(image_paths, pool.map(self.load_image, image_paths, range(1, len(image_paths) + 1))):
+                # Without sidecar file, load_image() created one: its modification time is part of the signature.
+                if signatures[image_path][2] is None:
+                    signatures[image_path] = ZineMetadataCache.get_signature(image_path, self.get_sidecar_file_path(image_path))
+                catalog.store(meta, signatures[image_path], self.get_capture_date(meta))
+
+        # Entries of the other images were not looked up, keep them.
+        if self.metadata_cache is not None:
+            self.metadata_cache.close(prune=False)
+
+        catalog.remove(removed)
+
+        logger.info(f'Catalog: {len(image_paths)} entries added or updated, {len(removed)} removed, {catalog.count()} in total.')
+
+        return len(image_paths), len(removed)
+
+    def select(self, catalog:ZineCatalog, query:str) -> list:
+        """
+        Build the zine from the cataloged images matching the query (see ZineCatalog.select) instead
+        of the image folder. Their cataloged metadata is used as long as their files did not change
+        (see load_cataloged_image). Return the selected image paths. Raise ValueError on bad queries.
+        """
+
+        entries = catalog.select(query, with_metadata=True)
+        self.selection = [image_path for image_path, _, _, _ in entries]
+        self.cataloged.clear()
+        if catalog.get_metadata_version() == self.get_metadata_version():
+            self.cataloged.update((image_path, entry) for image_path, *entry in entries)
+        else:
+            logger.warning('The catalog was indexed with another dictionary or version, selected images are read again.')
+
+        return self.selection
+
+    def get_metadata_version(self) -> str:
+        """
+        Fingerprint of the metadata inference (see ZineMetadataCache.compute_version), cataloged metadata
+        is only valid for the same one.
+        """
+
+        return ZineMetadataCache(None, self.dictionary_file_path).version
+
+    def get_capture_date(self, meta:ZineImageMetadata) -> str:
+        """
+        Capture date of an image as an ISO 8601 string, for the catalog: EXIF DateTimeOriginal,
+        or the year and month of the (possibly overwritten) timestamp. None if unknown.
+        """
+
+        if meta.taken:
+            return meta.taken
+
+        try:
+            return time.strftime('%Y-%m', time.strptime(str(meta.timestamp), '%B %Y'))
+        except ValueError:
+            return None
+
+    def load_image(self, relative_image_path:str, id:int) -> ZineImageMetadata:
+        """
+        Create the complete metadata of one image: EXIF data, sidecar data and sidecar overwrites.
+        """
+
+        with self.measure('load image', relative_image_path):
+            meta = self._load_image(relative_image_path, id)
+        self.count('images processed')
+
+        return meta
+
+    def _load_image(self, relative_image_path:str, id:int) -> ZineImageMetadata:
+        """
+        Body of load_image(), measured per image.
+        """
+
+        meta = self.load_cataloged_image(relative_image_path)
+        if meta is not None:
+            meta.set_id(id)
+            meta.set_page(self.get_page_number(id))
+            return meta
+
+        # Create sidecar file if missing. With a sidecar store, use its record (or the default) instead.
+        relative_sidecar_path = self.get_sidecar_file_path(relative_image_path)
+        with self.measure('sidecar check'):
+            sidecar_found = self.is_sidecar_file_found(relative_sidecar_path)
+
+        stored_sidecar = None
+        if not sidecar_found:
+            with self.measure('sidecar store'):
+                stored_sidecar = self.sidecar_store.get(relative_image_path, self.use_sidecar_store)
+
+        if not sidecar_found and stored_sidecar is None:
+            logger.warning(f'No Sidecar file found for this image. Creating one based on template.' )
+            with self.measure('sidecar creation'):
+                self.create_sidecar_file_from_template(relative_sidecar_path)
+
+        # Create ZineImageMetadata from EXIF and sidecar data (or from the cache).
+        meta = self.extract_metadata(relative_image_path, relative_sidecar_path, id, stored_sidecar)
+        meta.set_id(id)
+        meta.set_page(self.get_page_number(id))
+        with self.measure('sidecar overwrites'):
+            meta.apply_sidecar_overwrites()
+
+        return meta
+
+    def load_cataloged_image(self, relative_image_path:str) -> ZineImageMetadata:
+        """
+        Metadata of a selected image from its catalog entry (sidecar overwrites applied), if the image
+        and sidecar files did not change since it was indexed. None otherwise.
+        """
+
+        entry = self.cataloged.get(relative_image_path)
+        if entry is None:
+            return None
+
+        signature, metadata, sidecar = entry
+        try:
+            current = ZineMetadataCache.get_signature(relative_image_path, self.get_sidecar_file_path(relative_image_path))
+        except OSError:
+            return None
+        if current != signature:
+            logger.debug('Catalog entry of `%s` is outdated.', relative_image_path)
+            return None
+
+        self.count('catalog hits')
+        meta = ZineImageMetadata.from_dict(metadata)
+        meta.sidecar = ZineImageMetadata.share_sidecar(sidecar)
+
+        return meta
+
+    def get_page_number(self, id:int) -> int:
+        """
+        Page of an image in the zine, if the first page is known. One image per page.
+        """
+
+        if self.first_page is None:
+            return None
+
+        return self.first_page + id - 1
+
+    def plan_layout(self) -> list:
+        """
+        Lay out the library on pages (auto layout), from the image dimensions read in the JPEG headers
+        and the sidecar layout, position and visibility. Page numbers follow the layout: hidden images
+        have none, and images sharing a page have the same one. Return the pages.
+        """
+
+        logger.info('Laying out the photo library.')
+
+        with self.measure('layout'):
+            entries = list()
+            for key in self.library_keys:
+                meta = self.library.get(key)
+                width, height = self.get_image_dimensions(meta.image_path)
+                entries.append(ZineLayoutEntry(
+                    meta.image_path, width, height, meta.sidecar.get('layout'), meta.sidecar.get('position'),
+                    meta.sidecar.get('visibility')
+                ))
+                meta.set_page(None)
+
+            self.layout_pages = self.layout.plan(entries)
+
+        if self.first_page is not None:
+            for index, page in enumerate(self.layout_pages):
+                for image_path in page.image_paths:
+                    self.library.get(image_path).set_page(self.first_page + index)
+
+        visible = sum(len(page.image_paths) for page in self.layout_pages)
+        shared = sum(1 for page in self.layout_pages if len(page.image_paths) > 1)
+        logger.info(
+            f'{visible} images laid out on {len(self.layout_pages)} pages ({shared} shared), '
+            f'{len(self.library) - visible} hidden.'
+        )
+
+        return self.layout_pages
+
+    def get_image_dimensions(self, image_path:str) -> tuple:
+        """
+        (width, height) of an image, read from its header. (None, None) if it could not be read.
+        """
+
+        dimensions = self.exif_reader.read_dimensions(image_path)
+        if dimensions is not None:
+            return dimensions
+
+        try:
+            return read_image_header(image_path)[:2]
+        except Exception as err:
+            logger.warning(f'Dimensions of `{image_path}` could not be read, laid out on its own page. {err}')
+            return None, None
+
+    def read_page_labels(self, aux_folder:str) -> dict:
+        """
+        Pages of the image labels (image path -> page, as written) in the aux files of the content build.
+        """
+
+        label = re.compile(r'\\newlabel\{img:(.+?)\}\{\{[^}]*\}\{([^}]*)\}')
+        actual_pages = dict()
+        for aux_path in glob.glob(os.path.join(aux_folder, '*.aux')):
+            with open(aux_path, errors='replace') as aux:
+                for match in label.finditer(aux.read()):
+                    actual_pages[match.group(1)] = match.group(2)
+
+        return actual_pages
+
+    def verify_page_numbers(self, aux_folder:str) -> list:
+        """
+        Compare the resolved page numbers with the labels pdflatex wrote in the aux files of the
+        content build. Return the (image path, resolved page, actual page) mismatches.
+        Raise ValueError if the aux files have no image label at all (nothing to verify against).
+        """
+
+        actual_pages = self.read_page_labels(aux_folder)
+        if not actual_pages:
+            raise ValueError(f'No image page labels found in the aux files of `{aux_folder}`.')
+
+        mismatches = list()
+        for key in self.library_keys:
+            meta = self.library.get(key)
+            if meta.page is not None and str(meta.page) != actual_pages.get(meta.image_path):
+                mismatches.append((meta.image_path, meta.page, actual_pages.get(meta.image_path)))
+
+        return mismatches
+
+    def find_first_page(self, mismatches:list) -> int:
+        """
+        The first page which would have resolved the given mismatches (see verify_page_numbers):
+        the actual page of the first image, when all the images are off by the same number of pages
+        (front matter). None otherwise.
+        """
+
+        paged = sum(1 for key in self.library_keys if self.library.get(key).page is not None)
+        if len(mismatches) != paged:
+            return None
+
+        offsets = set()
+        for image_path, page, actual_page in mismatches:
+            try:
+                offsets.add(int(actual_page) - page)
+            except (TypeError, ValueError):
+                return None
+
+        if len(offsets) != 1:
+            return None
+
+        return self.first_page + offsets.pop()
+
+    def measure(self, stage:str, image_path:str = None):
+        """
+        Time a stage with the latency recorder and the profiler, if any. The stage can be attached
+        to an image, to find the slowest images. Costs close to nothing otherwise.
+        """
+
+        if self.profiler is None:
+            if self.latency is None:
+                return untimed
+            return self.latency.measure(stage)
+
+        if self.latency is None:
+            return self.profiler.measure(stage, image_path)
+
+        stack = ExitStack()
+        stack.enter_context(self.latency.measure(stage))
+        stack.enter_context(self.profiler.measure(stage, image_path))
+        return stack
+
+    def count(self, counter:str, value:int = 1) -> None:
+        """
+        Increment a profiler counter, if profiling.
+        """
+
+        if self.profiler is not None:
+            self.profiler.count(counter, value)
+
+    def get_worker(self, worker):
+        """
+        Worker function to run jobs with. When profiling, jobs are timed in the worker process.
+        With a shared pool, jobs run in the folder of this factory (job paths are relative).
+        """
+
+        if self.profiler is not None:
+            worker = partial(run_profiled, worker)
+
+        if self.pool is not None:
+            worker = partial(run_in_folder, os.getcwd(), worker)
+
+        return worker
+
+    def collect_result(self, stage:str, job:tuple, result:tuple, size:int = None) -> tuple:
+        """
+        Worker result of a job run with get_worker(). When profiling, record its timing
+        (attached to the image of the job, its first item) and the bytes read: size, or the size
+        of the image (see get_job_size).
+        """
+
+        if self.profiler is None:
+            return result
+
+        result, start, duration, pid = result
+        self.profiler.add_event(stage, start, duration, pid=pid, tid=pid, image_path=job[0])
+        self.count('bytes read', self.get_job_size(job) if size is None else size)
+
+        return result
 
     def get_sidecar_file_path(self, relative_image_file_path:str) -> str:
         """
@@ -126,17 +856,65 @@ class ZineFactory():
             sidecar_file.write(self.sidecar_template)
 
 
+    def extract_metadata(self, image_path:str, sidecar_path:str, id:int = 0,
+                         sidecar:dict = None) -> ZineImageMetadata:
+        """
+        Create a ZineImageMetadata object from the EXIF and sidecar data. Use the metadata cache
+        when available, EXIF data is then only decoded for new or modified images.
+        If the sidecar data is given (eg. from the sidecar store), the sidecar file is not read.
+        Note: sidecar overwrites are not applied.
+        """
+
+        if self.metadata_cache is None:
+            meta = self.extract_metadata_from_exif_data(image_path, id)
+            if sidecar is not None:
+                meta.sidecar = sidecar
+            else:
+                with self.measure('sidecar read'):
+                    meta.extract_sidecar_data(sidecar_path)
+            return meta
+
+        with self.measure('cache lookup'):
+            signature = self.metadata_cache.get_signature(image_path, sidecar_path)
+            cached_metadata, cached_sidecar = self.metadata_cache.lookup(image_path, signature)
+
+        if cached_metadata is None:
+            self.count('cache misses')
+            meta = self.extract_metadata_from_exif_data(image_path, id)
+        else:
+            self.count('cache hits')
+            logger.debug('Metadata of `%s` loaded from cache.', image_path)
+            meta = ZineImageMetadata.from_dict(cached_metadata)
+
+        if sidecar is not None:
+            meta.sidecar = ZineImageMetadata.share_sidecar(sidecar)
+        elif cached_sidecar is None:
+            with self.measure('sidecar read'):
+                meta.extract_sidecar_data(sidecar_path)
+        else:
+            meta.sidecar = ZineImageMetadata.share_sidecar(cached_sidecar)
+
+        self.metadata_cache.store(image_path, signature, meta.to_dict(), meta.sidecar)
+
+        return meta
+
     def extract_metadata_from_exif_data(self, image_path, id:int = 0) -> ZineImageMetadata:
         """
         Create a ZineImageMetadata object, and parse the EXIF data extracted from the 
-        image file.
+        image file. EXIF data is read directly from the JPEG header (see ZineExifReader),
+        PIL is only used as a fallback for files the header reader can't handle.
         """
 
-        with Image.open(image_path) as imgfile:
-                exifdata = imgfile._getexif()
-                
-        meta = ZineImageMetadata(id, image_path)
-        meta.parse_exif_data(exifdata)
+        with self.measure('exif read'):
+            exifdata = self.exif_reader.read(image_path)
+            if exifdata is None:
+                logger.debug('Falling back to PIL to read EXIF data of `%s`.', image_path)
+                with Image.open(image_path) as imgfile:
+                    exifdata = imgfile._getexif()
+
+        with self.measure('exif parse'):
+            meta = ZineImageMetadata(id, image_path)
+            meta.parse_exif_data(exifdata)
 
         return meta
     
@@ -145,20 +923,765 @@ class ZineFactory():
         Generate index thumbnail images from the main image library to use in the Photo Index.
         LANCZOS Resamspling is deemed to be the best quality albeit the slowest algorithm. 
         See https://pillow.readthedocs.io/en/stable/handbook/concepts.html#filters-comparison-table
+        Thumbnails are only rendered again when their source image or the rendering settings changed
+        (see ZineThumbnailManifest). Orphaned thumbnails are deleted.
         """
         
         logger.info('Generating thumbnails for images registered in the library.')
 
+        with self.measure('thumbnails'):
+            return self._generate_thumbnails()
+
+    def _generate_thumbnails(self):
+        """
+        Body of generate_thumbnails(), measured as a whole.
+        """
+
+        manifest = self.open_thumbnail_manifest()
+
+        # Sort out up to date thumbnails, queue the others for rendering.
+        queue = list()
         for key in self.library_keys:
             meta = self.library.get(key)
-            relative_thumbnail_path = 'thumbnails/' + meta.get_image_file_name()
+            pending = self.get_thumbnail_job(manifest, meta)
+            if pending is not None:
+                queue.append((meta, pending))
+
+        # Render in parallel. Results come back in library order.
+        jobs = [job for _, (job, _) in queue]
+        costs = [self.get_decode_memory(job[0], job[2], job[4]) for job in jobs]
+        results = self.run_jobs(render_thumbnail, jobs, 'thumbnail', costs)
+
+        failed = list()
+        for (meta, pending), (_, error) in zip(queue, results):
+            if not self.complete_thumbnail_job(manifest, meta, pending, error):
+                failed.append(meta.image_path)
+
+        removed = self.close_thumbnail_manifest(
+            manifest, {self.library.get(key).thumbnail_path for key in self.library_keys}
+        )
+
+        logger.info(
+            f'Thumbnails: {len(queue) - len(failed)} rendered, {len(self.library_keys) - len(queue)} up to date, '
+            f'{len(failed)} failed, {len(removed)} orphans removed.'
+        )
 
-            with Image.open(meta.image_path) as imgfile:
-                imgfile.thumbnail(self.thumbnail_size, Image.Resampling.LANCZOS)
-                imgfile.save(relative_thumbnail_path)
-                meta.set_thumbnail_path(relative_thumbnail_path)
+        return failed
 
-                logger.debug(f'Thumbnail {meta.thumbnail_path} generated successfully.')
+    def open_thumbnail_manifest(self, folder:str = None) -> ZineThumbnailManifest:
+        """
+        Create the thumbnail folder (or another rendering folder) if needed, and load its manifest.
+        """
+
+        folder = folder or self.thumbnail_folder
+        os.makedirs(folder, exist_ok=True)
+        manifest = ZineThumbnailManifest(os.path.join(folder, self.thumbnail_manifest_file_name))
+        manifest.load()
+
+        return manifest
+
+    def close_thumbnail_manifest(self, manifest:ZineThumbnailManifest, thumbnail_paths:set,
+                                 folder:str = None) -> list:
+        """
+        Delete orphaned thumbnails (or other renderings) and save the manifest. Return the deleted files.
+        """
+
+        removed = manifest.collect_garbage(folder or self.thumbnail_folder, thumbnail_paths)
+        manifest.save()
+
+        return removed
+
+    def get_thumbnail_job(self, manifest:ZineThumbnailManifest, meta:ZineImageMetadata) -> tuple:
+        """
+        Return the (render_thumbnail job, manifest signature) pair of an image,
+        or None if its thumbnail is up to date.
+        """
+
+        relative_thumbnail_path = os.path.join(self.thumbnail_folder, self.get_output_file_name(meta.image_path))
+        profile = self.get_thumbnail_profile(meta.image_path)
+        signature = manifest.get_signature(
+            meta.image_path, self.thumbnail_size, self.thumbnail_resampling.name, profile
+        )
+
+        if manifest.is_up_to_date(relative_thumbnail_path, signature):
+            meta.set_thumbnail_path(relative_thumbnail_path)
+            logger.debug('Thumbnail %s is up to date.', meta.thumbnail_path)
+            return None
+
+        job = (
+            meta.image_path, relative_thumbnail_path, self.thumbnail_size, self.thumbnail_resampling,
+            self.thumbnail_profiles[profile]
+        )
+
+        return job, signature
+
+    def get_thumbnail_profile(self, image_path:str) -> str:
+        """
+        Decoding profile of a thumbnail. With a memory budget, images whose decode would take more
+        than their share of the budget (budget / jobs) fall back to the fast profile, the smallest decode.
+        """
+
+        if self.memory_budget is None or self.thumbnail_profile == 'fast':
+            return self.thumbnail_profile
+
+        share = self.memory_budget / self.jobs
+        gap = self.thumbnail_profiles[self.thumbnail_profile]
+        if self.get_decode_memory(image_path, self.thumbnail_size, gap, report=False) <= share:
+            return self.thumbnail_profile
+
+        logger.debug('`%s` is too large for a %s decode within the memory budget, decoding it fast.',
+                     image_path, self.thumbnail_profile)
+
+        return 'fast'
+
+    def get_decode_memory(self, image_path:str, size:tuple, reducing_gap:float, report:bool = True) -> int:
+        """
+        Estimated memory needed to render an image fitted in size (see estimate_decode_memory),
+        from its header. 0 without memory budget, or if the header can't be read (the rendering
+        will report the error). Images over the whole budget are reported (once), they are then
+        decoded alone.
+        """
+
+        if self.memory_budget is None:
+            return 0
+
+        try:
+            header = read_image_header(image_path)
+        except Exception as err:
+            logger.debug('Header of `%s` could not be read. %s', image_path, err)
+            return 0
+
+        memory = estimate_decode_memory(header, size, reducing_gap)
+        if report and memory > self.memory_budget and memory > self.oversized_images.get(image_path, 0):
+            self.oversized_images[image_path] = memory
+            logger.warning(
+                f'`{image_path}` ({header[0]}x{header[1]}) needs about {memory / 2**20:.0f} MB to be decoded, '
+                f'over the memory budget of {self.memory_budget / 2**20:.0f} MB. It is decoded alone.'
+            )
+
+        return memory
+
+    def complete_thumbnail_job(self, manifest:ZineThumbnailManifest, meta:ZineImageMetadata,
+                               pending:tuple, error:str) -> bool:
+        """
+        Record the result of a render_thumbnail job. Return False if it failed.
+        """
+
+        if error is not None:
+            logger.error(f'Thumbnail for `{meta.image_path}` could not be generated. {error}')
+            return False
+
+        job, signature = pending
+        relative_thumbnail_path = job[1]
+        manifest.record(relative_thumbnail_path, signature)
+        meta.set_thumbnail_path(relative_thumbnail_path)
+        logger.debug('Thumbnail %s generated successfully.', meta.thumbnail_path)
+
+        return True
+
+    def generate_web_images(self, image_paths = None) -> list:
+        """
+        Generate the screen resolution versions of the images (library images by default), which
+        the web build embeds instead of the originals. Like thumbnails, they are rendered in
+        parallel, only when their source image or the settings changed, and orphans are deleted.
+        Return the images that failed.
+        """
+
+        logger.info('Generating web images for images registered in the library.')
+
+        start = time.perf_counter()
+        image_paths = list(self.library_keys if image_paths is None else image_paths)
+
+        with self.measure('web images'):
+            manifest = self.open_thumbnail_manifest(self.web_image_folder)
+
+            queue = list()
+            for image_path in image_paths:
+                pending = self.get_web_image_job(manifest, image_path)
+                if pending is not None:
+                    queue.append(pending)
+
+            jobs = [job for job, _ in queue]
+            costs = [self.get_decode_memory(job[0], (job[2], job[2]), 2.0) for job in jobs]
+            results = self.run_jobs(render_web_image, jobs, 'web image', costs)
+
+            failed = list()
+            for (job, signature), (_, error) in zip(queue, results):
+                if error is not None:
+                    logger.error(f'Web image for `{job[0]}` could not be generated. {error}')
+                    failed.append(job[0])
+                else:
+                    manifest.record(job[1], signature)
+
+            removed = self.close_thumbnail_manifest(
+                manifest, {self.get_web_image_path(image_path) for image_path in image_paths}, self.web_image_folder
+            )
+
+        logger.info(
+            f'Web images: {len(queue) - len(failed)} rendered, {len(image_paths) - len(queue)} up to date, '
+            f'{len(failed)} failed, {len(removed)} orphans removed, in {time.perf_counter() - start:.1f} s.'
+        )
+        self.report_rendered_images('Web images', image_paths, self.get_web_image_path)
+
+        return failed
+
+    def get_output_file_name(self, image_path:str) -> str:
+        """
+        File name of the renderings of an image (thumbnail, web and print images). Images of the
+        image folder keep their name. Others (subfolders, catalog selections) get a hash of their
+        path appended, so that images of different folders don't overwrite each other's renderings.
+        """
+
+        image_path = os.path.normpath(image_path)
+        if os.path.dirname(image_path) == os.path.normpath(self.image_folder):
+            return os.path.basename(image_path)
+
+        name, extension = os.path.splitext(os.path.basename(image_path))
+
+        return f'{name}-{hashlib.sha1(image_path.encode()).hexdigest()[:8]}{extension}'
+
+    def get_web_image_path(self, image_path:str) -> str:
+        """
+        Path of the screen resolution version of an image.
+        """
+
+        return os.path.join(self.web_image_folder, self.get_output_file_name(image_path))
+
+    def get_web_image_job(self, manifest:ZineThumbnailManifest, image_path:str) -> tuple:
+        """
+        Return the (render_web_image job, manifest signature) pair of an image,
+        or None if its web image is up to date.
+        """
+
+        web_image_path = self.get_web_image_path(image_path)
+        size = self.web_image_long_edge, self.web_image_long_edge
+        signature = manifest.get_signature(image_path, size, 'LANCZOS', f'quality {self.web_image_quality}')
+
+        if manifest.is_up_to_date(web_image_path, signature):
+            logger.debug('Web image %s is up to date.', web_image_path)
+            return None
+
+        return (image_path, web_image_path, self.web_image_long_edge, self.web_image_quality), signature
+
+    def generate_print_images(self, image_paths = None) -> list:
+        """
+        Generate the print resolution versions of the images (library images by default), which
+        the content embeds instead of the originals: resampled to the exact pixel size of the
+        content \\includegraphics box at the print dpi, stripped of metadata and converted to sRGB.
+        They are only rendered again when the content of their source image (SHA-1, see
+        get_content_hashes) or the settings changed, and orphans are deleted.
+        Return the images that failed.
+        """
+
+        logger.info('Generating print images for images registered in the library.')
+
+        start = time.perf_counter()
+        image_paths = list(self.library_keys if image_paths is None else image_paths)
+
+        with self.measure('print images'):
+            content_hashes = self.get_content_hashes(image_paths)
+            manifest = self.open_thumbnail_manifest(self.print_image_folder)
+
+            queue = list()
+            for image_path in image_paths:
+                pending = self.get_print_image_job(manifest, image_path, content_hashes.get(image_path))
+                if pending is not None:
+                    queue.append(pending)
+
+            jobs = [job for job, _ in queue]
+            costs = [self.get_decode_memory(job[0], job[2], 1.0) for job in jobs]
+            results = self.run_jobs(render_print_image, jobs, 'print image', costs)
+
+            failed = list()
+            for (job, signature), (_, error) in zip(queue, results):
+                if error is not None:
+                    logger.error(f'Print image for `{job[0]}` could not be generated. {error}')
+                    failed.append(job[0])
+                else:
+                    manifest.record(job[1], signature)
+
+            removed = self.close_thumbnail_manifest(
+                manifest, {self.get_print_image_path(image_path) for image_path in image_paths}, self.print_image_folder
+            )
+
+        logger.info(
+            f'Print images: {len(queue) - len(failed)} rendered, {len(image_paths) - len(queue)} up to date, '
+            f'{len(failed)} failed, {len(removed)} orphans removed, in {time.perf_counter() - start:.1f} s.'
+        )
+        self.report_rendered_images('Print images', image_paths, self.get_print_image_path)
+
+        return failed
+
+    def get_print_image_path(self, image_path:str) -> str:
+        """
+        Path of the print resolution version of an image.
+        """
+
+        return os.path.join(self.print_image_folder, self.get_output_file_name(image_path))
+
+    def get_print_image_box(self) -> tuple:
+        """
+        Size of the content image box in pixels at the print dpi.
+        """
+
+        return tuple(round(mm / 25.4 * self.print_image_dpi) for mm in self.print_image_box_mm)
+
+    def get_print_image_job(self, manifest:ZineThumbnailManifest, image_path:str, content_hash:str) -> tuple:
+        """
+        Return the (render_print_image job, manifest signature) pair of an image,
+        or None if its print image is up to date. The signature holds the source content hash
+        rather than its modification time: touching or copying an image back does not cost a rendering.
+        """
+
+        print_image_path = self.get_print_image_path(image_path)
+        box = self.get_print_image_box()
+        signature = dict(
+            source = image_path, source_hash = content_hash, size = list(box),
+            resampling = 'LANCZOS', profile = f'quality {self.print_image_quality}'
+        )
+
+        if content_hash is not None and manifest.is_up_to_date(print_image_path, signature):
+            logger.debug('Print image %s is up to date.', print_image_path)
+            return None
+
+        return (image_path, print_image_path, box, self.print_image_quality), signature
+
+    def get_content_hashes(self, image_paths) -> dict:
+        """
+        SHA-1 of the content of the images, as an image path -> hex digest dictionary. Hashes are
+        kept in the metadata cache (by file size and modification time), only new or modified
+        images are read, in parallel. Images that could not be read are left out.
+        """
+
+        image_paths = list(image_paths)
+        content_hashes = dict()
+        stats = dict()
+
+        # The cache may already be open (scan).
+        use_cache = self.metadata_cache is not None
+        opened = use_cache and not self.metadata_cache.is_open
+        if opened:
+            self.metadata_cache.open()
+
+        missing = list()
+        for image_path in image_paths:
+            try:
+                stat = os.stat(image_path)
+            except OSError as err:
+                logger.error(f'`{image_path}` could not be hashed. {err}')
+                continue
+            stats[image_path] = stat.st_size, stat.st_mtime_ns
+
+            if use_cache:
+                content_hash = self.metadata_cache.lookup_content_hash(image_path, *stats[image_path])
+                if content_hash is not None:
+                    content_hashes[image_path] = content_hash
+                    continue
+            missing.append(image_path)
+
+        # Files are read by chunks of 1 MiB.
+        costs = [min(stats[image_path][0], 1 << 20) for image_path in missing]
+        results = self.run_jobs(hash_file, [(image_path,) for image_path in missing], 'hash', costs)
+        for image_path, (content_hash, error) in zip(missing, results):
+            if error is not None:
+                logger.error(f'`{image_path}` could not be hashed. {error}')
+                continue
+            content_hashes[image_path] = content_hash
+            if use_cache:
+                self.metadata_cache.store_content_hash(image_path, *stats[image_path], content_hash)
+
+        if opened:
+            self.metadata_cache.close(prune=False)
+
+        logger.debug('Content hashes: %s cached, %s computed.', len(image_paths) - len(missing), len(missing))
+
+        return content_hashes
+
+    def generate_index_atlases(self) -> list:
+        """
+        Compose the thumbnails of every index page into its atlas (see atlas_folder), in parallel.
+        Atlases are only rendered again when the content of their thumbnails (SHA-1, see
+        get_content_hashes) or the settings changed, and orphans are deleted.
+        Return the atlases that failed.
+        """
+
+        logger.info('Generating index atlases from the thumbnails.')
+
+        start = time.perf_counter()
+        metas = self.get_index_images()
+
+        with self.measure('index atlases'):
+            content_hashes = self.get_content_hashes(
+                meta.thumbnail_path for meta in metas if meta.thumbnail_path is not None
+            )
+            manifest = self.open_thumbnail_manifest(self.atlas_folder)
+
+            self.atlas_pages = list()
+            queue = list()
+            for index in range(0, len(metas), self.index_atlas_rows):
+                atlas_path = os.path.join(self.atlas_folder, f'index-{index // self.index_atlas_rows + 1:03d}.jpg')
+                page = metas[index:index + self.index_atlas_rows]
+                self.atlas_pages.append((atlas_path, page))
+
+                pending = self.get_atlas_job(manifest, atlas_path, [meta.thumbnail_path for meta in page], content_hashes)
+                if pending is not None:
+                    queue.append(pending)
+
+            jobs = [job for job, _ in queue]
+            sizes = [sum(self.get_job_size((thumbnail_path,)) for thumbnail_path in job[1]) for job in jobs]
+            costs = [self.get_atlas_memory(job) for job in jobs]
+            results = self.run_jobs(render_atlas, jobs, 'atlas', costs, sizes)
+
+            failed = list()
+            for (job, signature), (_, error) in zip(queue, results):
+                if error is not None:
+                    logger.error(f'Index atlas `{job[0]}` could not be generated. {error}')
+                    failed.append(job[0])
+                else:
+                    manifest.record(job[0], signature)
+
+            removed = self.close_thumbnail_manifest(
+                manifest, {atlas_path for atlas_path, _ in self.atlas_pages}, self.atlas_folder
+            )
+
+        logger.info(
+            f'Index atlases: {len(queue) - len(failed)} rendered, {len(self.atlas_pages) - len(queue)} up to date, '
+            f'{len(failed)} failed, {len(removed)} orphans removed, in {time.perf_counter() - start:.1f} s.'
+        )
+
+        return failed
+
+    def get_atlas_job(self, manifest:ZineThumbnailManifest, atlas_path:str, thumbnail_paths:list,
+                      content_hashes:dict) -> tuple:
+        """
+        Return the (render_atlas job, manifest signature) pair of an index page, or None if its atlas
+        is up to date. The signature holds the content hashes of the thumbnails, in order.
+        """
+
+        cell = tuple(round(mm / 25.4 * self.print_image_dpi) for mm in self.index_atlas_cell_mm)
+        box = cell[0], cell[1] - round(self.index_atlas_spacing_mm / 25.4 * self.print_image_dpi)
+        thumbnail_hashes = [content_hashes.get(thumbnail_path) for thumbnail_path in thumbnail_paths]
+        signature = dict(
+            thumbnail_hashes = thumbnail_hashes, cell = list(cell), box = list(box),
+            dpi = self.print_image_dpi, profile = f'quality {self.print_image_quality}'
+        )
+
+        hashed = all(content_hash is not None for thumbnail_path, content_hash in zip(thumbnail_paths, thumbnail_hashes)
+                     if thumbnail_path is not None)
+        if hashed and manifest.is_up_to_date(atlas_path, signature):
+            logger.debug('Index atlas %s is up to date.', atlas_path)
+            return None
+
+        return (atlas_path, thumbnail_paths, cell, box, self.print_image_dpi, self.print_image_quality), signature
+
+    def get_atlas_memory(self, job:tuple) -> int:
+        """
+        Estimated memory needed to render an atlas: the atlas itself (RGB, 4 bytes per pixel, as
+        Pillow stores it) and the largest thumbnail decode. 0 without memory budget.
+        """
+
+        if self.memory_budget is None:
+            return 0
+
+        atlas_path, thumbnail_paths, cell, box, dpi, quality = job
+        decodes = [self.get_decode_memory(thumbnail_path, box, 2.0)
+                   for thumbnail_path in thumbnail_paths if thumbnail_path is not None]
+
+        return cell[0] * cell[1] * len(thumbnail_paths) * 4 + max(decodes, default=0)
+
+    def report_rendered_images(self, label:str, image_paths:list, get_rendered_path) -> None:
+        """
+        Log the size of rendered versions of the images (web or print), against the originals.
+        pdflatex embeds JPEG files as they are, so this is the image payload of the PDF.
+        """
+
+        original_size = rendered_size = 0
+        for image_path in image_paths:
+            try:
+                rendered_size += os.path.getsize(get_rendered_path(image_path))
+                original_size += os.path.getsize(image_path)
+            except OSError:
+                pass
+
+        if original_size:
+            logger.info(
+                f'{label} weigh {rendered_size / 1e6:.1f} MB instead of {original_size / 1e6:.1f} MB '
+                f'for the originals ({rendered_size / original_size:.0%}).'
+            )
+
+    def run_jobs(self, worker, jobs:list, stage:str = 'job', costs:list = None, sizes:list = None) -> list:
+        """
+        Run the jobs through the worker function on a process pool (self.jobs processes, or the
+        shared pool). Jobs of the largest source files start first, so that the slowest jobs don't
+        end up running alone at the end. Results are returned in the same order as the jobs.
+        A job whose worker process died is reported as failed, as a (None, error) tuple.
+        Jobs are profiled as `stage`. With a memory budget, costs are the memory estimates
+        of the jobs (see get_decode_memory). Sizes are the bytes read by the jobs, for jobs
+        whose first item is not their source file (default: see get_job_size).
+        """
+
+        profiled_worker = self.get_worker(worker)
+
+        if self.jobs <= 1 or len(jobs) <= 1:
+            return [
+                self.collect_result(stage, job, profiled_worker(job), None if sizes is None else sizes[index])
+                for index, job in enumerate(jobs)
+            ]
+
+        if sizes is None:
+            sizes = [self.get_job_size(job) for job in jobs]
+        order = sorted(range(len(jobs)), key=lambda index: -sizes[index])
+
+        if self.memory_budget is not None:
+            return self.run_budgeted_jobs(profiled_worker, jobs, stage, costs or [0] * len(jobs), order, sizes)
+
+        results = [None] * len(jobs)
+        with self.get_pool(len(jobs)) as pool:
+            futures = {index: pool.submit(profiled_worker, jobs[index]) for index in order}
+            for index, job in enumerate(jobs):
+                try:
+                    results[index] = self.collect_result(stage, job, futures[index].result(), sizes[index])
+                except Exception as err:
+                    results[index] = (None, f'{type(err).__name__}: {err}')
+
+        return results
+
+    def get_pool(self, job_count:int):
+        """
+        Context manager providing the process pool for a stage: the shared pool (left running),
+        or a new pool of at most self.jobs processes.
+        """
+
+        if self.pool is not None:
+            return nullcontext(self.pool)
+
+        return ProcessPoolExecutor(max_workers=min(self.jobs, job_count))
+
+    def get_job_size(self, job:tuple) -> int:
+        """
+        Size of the source file of a job (its first item), to start the longest jobs first. 0 if unknown.
+        """
+
+        try:
+            return os.path.getsize(job[0])
+        except (OSError, TypeError, IndexError):
+            return 0
+
+    def run_budgeted_jobs(self, profiled_worker, jobs:list, stage:str, costs:list, order:list, sizes:list) -> list:
+        """
+        Same as run_jobs(), but jobs only start while the memory estimates of the running jobs
+        stay within the memory budget (see ZineJobScheduler). Jobs start in the given order.
+        """
+
+        results = [None] * len(jobs)
+        futures = dict() # Job index -> future
+
+        with self.get_pool(len(jobs)) as pool:
+            scheduler = ZineJobScheduler(pool, self.jobs, self.memory_budget)
+            for index in order:
+                futures[index] = scheduler.submit(profiled_worker, jobs[index], costs[index])
+
+            for index, job in enumerate(jobs):
+                try:
+                    results[index] = self.collect_result(stage, job, futures[index].result(), sizes[index])
+                except Exception as err:
+                    results[index] = (None, f'{type(err).__name__}: {err}')
+
+        self.report_budget_waits(stage, scheduler)
+
+        return results
+
+    def report_budget_waits(self, stage:str, scheduler:ZineJobScheduler) -> None:
+        """
+        Log how often the jobs of a stage were held back by the memory budget.
+        """
+
+        if scheduler.waits:
+            logger.info(f'Memory budget: {stage} jobs were held back {scheduler.waits} times.')
+
+    def stream(self, content_output_path:str = 'images.tex', index_output_path:str = 'index.tex',
+               buffer_size:int = 16, web_content_output_path:str = 'images-web.tex') -> None:
+        """
+        Streaming alternative to scan() and generate(). Each image flows through EXIF and sidecar
+        extraction, thumbnail rendering and the LaTeX writers, with bounded buffers between the
+        stages: memory stays flat whatever the size of the library, and output is written right away.
+        Web and print images are generated afterwards, from the image paths only.
+        The library is not kept in memory. Output is identical to the batch mode.
+        """
+
+        if self.layout is not None or self.index_atlas:
+            raise ValueError('The auto layout and index atlases need the whole library, they are not available in streaming mode.')
+
+        logger.info(f'Streaming folder `{self.image_folder}` to {content_output_path} and {index_output_path}.')
+
+        self.library.clear()
+        images = self.buffer_stage(self.stream_metadata(), buffer_size)
+        thumbnails = self.buffer_stage(self.stream_thumbnails(images, buffer_size), buffer_size)
+
+        image_paths = list()
+        thumbnail_paths = dict()
+        try:
+            with ZineLatexOutput(content_output_path) as content_latex, ZineLatexOutput(index_output_path) as index_latex, \
+                 ZineLatexOutput(web_content_output_path) as web_content_latex:
+                for meta in thumbnails:
+                    content_latex.write(meta.image_path, self.render_latex_content(meta))
+                    web_content_latex.write(meta.image_path, self.template_engine.render_web_content(meta))
+                    if self.has_thumbnail(meta):
+                        index_latex.write(meta.image_path, self.render_latex_index(meta))
+                    image_paths.append(meta.image_path)
+                    thumbnail_paths[meta.image_path] = meta.thumbnail_path
+
+        finally:
+            # Stop the stages if writing failed, downstream first (no-op once they completed).
+            thumbnails.close()
+            images.close()
+
+        self.report_latex_output(content_latex)
+        self.report_latex_output(web_content_latex)
+        self.report_latex_output(index_latex)
+
+        if self.near_duplicate_distance is not None:
+            self.report_near_duplicates(thumbnail_paths)
+        self.generate_web_images(image_paths)
+        if self.normalize_print:
+            self.generate_print_images(image_paths)
+
+        logger.info(f'Streaming completed. A total of {len(image_paths)} images were processed.')
+
+    def stream_metadata(self):
+        """
+        Pipeline stage: yield the complete metadata of every image, in scan order.
+        """
+
+        if self.metadata_cache is not None:
+            self.metadata_cache.open()
+
+        bytes_read = self.exif_reader.bytes_read
+        completed = False
+        try:
+            for id, relative_image_path in enumerate(self.discard_duplicates(self.discover_images()), start=1):
+                yield self.load_image(relative_image_path, id)
+            completed = True
+
+        finally:
+            if self.metadata_cache is not None:
+                self.metadata_cache.close(prune=completed and self.selection is None)
+                self.metadata_cache.report()
+            self.count('bytes read', self.exif_reader.bytes_read - bytes_read)
+
+    def stream_thumbnails(self, images, window:int):
+        """
+        Pipeline stage: render the thumbnails of the incoming images, at most `window` at a time,
+        and yield the images in their incoming order once their thumbnail is ready. Jobs are
+        submitted through the scheduler of the memory budget, as in generate_thumbnails().
+        """
+
+        manifest = self.open_thumbnail_manifest()
+        pool = self.pool
+        if pool is None and self.jobs > 1:
+            pool = ProcessPoolExecutor(max_workers=self.jobs)
+        scheduler = None if pool is None else ZineJobScheduler(pool, self.jobs, self.memory_budget)
+        worker = self.get_worker(render_thumbnail)
+        in_flight = deque()
+        thumbnail_paths = set()
+        counts = dict(rendered=0, up_to_date=0, failed=0)
+
+        def complete(meta, pending, result):
+            if pending is None:
+                counts['up_to_date'] += 1
+            else:
+                if pool is None:
+                    result = self.collect_result('thumbnail', pending[0], result)
+                else:
+                    try:
+                        result = self.collect_result('thumbnail', pending[0], result.result())
+                    except Exception as err:
+                        result = (None, f'{type(err).__name__}: {err}')
+                if self.complete_thumbnail_job(manifest, meta, pending, result[-1]):
+                    counts['rendered'] += 1
+                else:
+                    counts['failed'] += 1
+
+            thumbnail_paths.add(meta.thumbnail_path)
+            return meta
+
+        try:
+            for meta in images:
+                pending = self.get_thumbnail_job(manifest, meta)
+                result = None
+                if pending is not None:
+                    job = pending[0]
+                    if scheduler is None:
+                        result = worker(job)
+                    else:
+                        result = scheduler.submit(worker, job, self.get_decode_memory(job[0], job[2], job[4]))
+                in_flight.append((meta, pending, result))
+
+                while len(in_flight) > window:
+                    yield complete(*in_flight.popleft())
+
+            while in_flight:
+                yield complete(*in_flight.popleft())
+
+        finally:
+            if pool is not None and pool is not self.pool:
+                pool.shutdown(cancel_futures=True)
+
+        removed = self.close_thumbnail_manifest(manifest, thumbnail_paths)
+
+        if scheduler is not None:
+            self.report_budget_waits('thumbnail', scheduler)
+        logger.info(
+            f'Thumbnails: {counts["rendered"]} rendered, {counts["up_to_date"]} up to date, '
+            f'{counts["failed"]} failed, {len(removed)} orphans removed.'
+        )
+
+    def buffer_stage(self, stage, buffer_size:int):
+        """
+        Run a pipeline stage (generator) in a background thread, feeding a bounded queue.
+        Yield the items of the stage. Exceptions raised by the stage are re-raised here.
+        If the consumer stops early (exception, close()), the stage is closed in its thread,
+        so that its own clean-up runs (eg. the metadata cache is closed).
+        """
+
+        buffer = queue.Queue(maxsize=buffer_size)
+        cancelled = threading.Event()
+        end_of_stage = object()
+
+        def produce():
+            try:
+                for item in stage:
+                    if cancelled.is_set():
+                        break
+                    buffer.put((item, None))
+            except BaseException as err:
+                buffer.put((end_of_stage, err))
+                return
+            finally:
+                stage.close()
+            buffer.put((end_of_stage, None))
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                item, error = buffer.get()
+                if error is not None:
+                    raise error
+                if item is end_of_stage:
+                    break
+                yield item
+
+        finally:
+            # Drain the queue so that a producer blocked on a full buffer sees the cancellation.
+            cancelled.set()
+            while thread.is_alive():
+                try:
+                    buffer.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            thread.join()
 
     def generate_latex_content(self, output_path:str = 'images.tex'):
         """
@@ -167,12 +1690,40 @@ class ZineFactory():
         
         logger.info(f'Generating content latex file from photo library ({output_path}).')
 
-        with open(output_path, 'w') as latex:
+        with self.measure('latex content'), ZineLatexOutput(output_path) as latex:
+            if self.layout is None:
+                latex.write_all(self.library_keys, self.template_engine.render_content_batch(self.library.values()))
+            else:
+                get_path = self.get_print_image_path if self.normalize_print else str
+                self.write_layout_pages(latex, get_path)
 
-            for key in self.library_keys:
-                meta = self.library.get(key)
-                content = self.content_template.format(**meta.to_dict())
-                latex.write(content)
+        self.report_latex_output(latex)
+
+    def generate_latex_web_content(self, output_path:str = 'images-web.tex'):
+        """
+        Generate the latex code of the main photographic content for the web build, with the
+        screen resolution versions of the images (see generate_web_images).
+        """
+
+        logger.info(f'Generating web content latex file from photo library ({output_path}).')
+
+        with self.measure('latex web content'), ZineLatexOutput(output_path) as latex:
+            if self.layout is None:
+                latex.write_all(self.library_keys, self.template_engine.render_web_content_batch(self.library.values()))
+            else:
+                self.write_layout_pages(latex, self.get_web_image_path)
+
+        self.report_latex_output(latex)
+
+    def write_layout_pages(self, latex:ZineLatexOutput, get_path) -> None:
+        """
+        Write the pages of the auto layout, including the files given by get_path(image path).
+        """
+
+        latex.write_all(
+            [page.get_key() for page in self.layout_pages],
+            [self.layout.render_page(page, get_path) for page in self.layout_pages]
+        )
 
     def generate_latex_index(self, output_path:str = 'index.tex'):
         """
@@ -181,9 +1732,81 @@ class ZineFactory():
 
         logger.info(f'Generating index latex file from photo library ({output_path}).')
         
-        with open(output_path, 'w') as latex:
+        with self.measure('latex index'), ZineLatexOutput(output_path) as latex:
+            if self.index_atlas:
+                self.write_index_atlas_pages(latex)
+            else:
+                metas = [meta for meta in self.get_index_images() if self.has_thumbnail(meta)]
+                latex.write_all([meta.image_path for meta in metas], self.template_engine.render_index_batch(metas))
 
-            for key in self.library_keys:
-                content = ZineIndexTemplate()
-                content.configure(meta=self.library.get(key))
-                latex.write(content.get_template())
\ No newline at end of file
+        self.report_latex_output(latex)
+
+    def get_index_images(self) -> list:
+        """
+        Metadata of the images of the index, in order. Hidden images are left out of the auto layout, and of the index.
+        """
+
+        metas = list(self.library.values())
+        if self.layout is not None:
+            metas = [meta for meta in metas if meta.sidecar.get('visibility') != 'hidden']
+
+        return metas
+
+    def has_thumbnail(self, meta:ZineImageMetadata) -> bool:
+        """
+        Whether an image has a thumbnail to show in the index. Images whose thumbnail could not be
+        generated are left out of the index (their error is reported by the thumbnail stage).
+        """
+
+        if meta.thumbnail_path is None:
+            logger.warning(f'`{meta.image_path}` has no thumbnail. Left out of the index.')
+            return False
+
+        return True
+
+    def write_index_atlas_pages(self, latex:ZineLatexOutput) -> None:
+        """
+        Write the index pages of the atlases (see generate_index_atlases): the atlas, and the entry texts in its cells.
+        """
+
+        width, height = self.index_atlas_cell_mm
+        fragments = list()
+        for atlas_path, metas in self.atlas_pages:
+            cells = ''.join(
+                self.index_atlas_cell_template.format(height=height, text=text)
+                for text in self.template_engine.render_index_text_batch(metas)
+            )
+            fragments.append(self.index_atlas_page_template.format(
+                atlas_path=atlas_path, width=width, height=height * len(metas), cells=cells
+            ))
+
+        latex.write_all([atlas_path for atlas_path, _ in self.atlas_pages], fragments)
+
+    def report_latex_output(self, latex:ZineLatexOutput) -> None:
+        """
+        Keep track of a generated LaTeX output (see self.latex_outputs) and log what changed.
+        """
+
+        self.latex_outputs[latex.output_path] = latex
+
+        if latex.changed:
+            logger.info(
+                f'`{latex.output_path}` updated: {len(latex.get_changed_entries())} entries changed, '
+                f'{len(latex.get_removed_entries())} removed.'
+            )
+        else:
+            logger.info(f'`{latex.output_path}` unchanged, not rewritten.')
+
+    def render_latex_content(self, meta:ZineImageMetadata) -> str:
+        """
+        Latex code of one image of the main photographic content.
+        """
+
+        return self.template_engine.render_content(meta)
+
+    def render_latex_index(self, meta:ZineImageMetadata) -> str:
+        """
+        Latex code of one image of the index.
+        """
+
+        return self.template_engine.render_index(meta)
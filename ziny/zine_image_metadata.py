@@ -1,24 +1,73 @@
 import os
+import sys
 import json
 import logging
+import weakref
 from datetime import datetime
 
 from PIL.TiffImagePlugin import IFDRational
 from PIL.ExifTags import Base, IFD
 
 from ziny.zine_exif_constants import WhiteBalance, ExposureProgram, ExposureMode, MeteringMode
+from ziny.zine_substitution_dictionary import ZineSubstitutionDictionary
 
 logger = logging.getLogger('Zine Image Metadata')
 logger.setLevel(logging.INFO)
 
+class ZineSidecar(dict):
+    """
+    Read-only sidecar content, shared between the records with identical sidecars
+    (see ZineImageMetadata.share_sidecar).
+    """
+
+    __slots__ = ('__weakref__',)
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('Shared sidecar contents are read-only.')
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
 class ZineImageMetadata():
     """
     Creates human-readable representations of the photo metadata.
     The step of translating the input intot he final formatted attribute is 
     called "inferance" althrough sometimes the inpout and output have the 
     correct format already.
+    Records use __slots__ (no per-instance __dict__), and repeated strings (camera, lens,
+    settings) and identical sidecars are shared between records to keep large libraries small.
     """
 
+    __slots__ = (
+        'id', 'image_path', 'thumbnail_path', 'timestamp', 'taken', 'description',
+        'make', 'model', 'lens_make', 'lens_model', 'aperture', 'speed', 'iso',
+        'exposure_compensation', 'program', 'metering_mode', 'white_balance', 'temperature',
+        'page', 'sidecar', '_dictionary'
+    )
+
+    # Substitution dictionary of all records (see ZineFactory).
+    dictionary_file_path = 'dictionary.json'
+
+    # Fields a sidecar can overwrite (see apply_sidecar_overwrites): the metadata shown in the zine.
+    public_fields = (
+        'timestamp', 'taken', 'description', 'make', 'model', 'lens_make', 'lens_model', 'aperture',
+        'speed', 'iso', 'exposure_compensation', 'program', 'metering_mode', 'white_balance'
+    )
+
+    # Fields repeated across a library (camera, lens, month, settings), interned when loaded from a cache.
+    # Paths, capture dates and descriptions are mostly unique: interning them would only fill the table.
+    interned_fields = (
+        'make', 'model', 'lens_make', 'lens_model', 'timestamp', 'speed', 'aperture', 'exposure_compensation'
+    )
+
+    # Identical sidecar contents (typically the untouched template) share a single read-only
+    # ZineSidecar. Entries go away with the last record (or store) using them.
+    _shared_sidecars = weakref.WeakValueDictionary()
+
     def __init__(self, id=None, image_path=None, thumbnail_path=None,
                  timestamp=None, description=None,
                  make=None, model=None, lens_make=None, lens_model=None, 
@@ -29,6 +78,7 @@ class ZineImageMetadata():
         self.image_path=image_path
         self.thumbnail_path=thumbnail_path
         self.timestamp=timestamp
+        self.taken = None # Capture date and time (EXIF DateTimeOriginal), as ISO 8601.
         self.description=description
         self.make=make
         self.model=model
@@ -41,24 +91,18 @@ class ZineImageMetadata():
         self.program=program
         self.metering_mode=metering_mode
         self.white_balance = wb_mode
+        self.temperature = None
+        self.page = None # Page of the image in the zine, if resolved ahead of the LaTeX build.
 
         self.sidecar = dict()
 
-        logger.debug(f'ID: {self.id}')
-        logger.debug(f'Image Path: {self.image_path}')
-        self.load_substitution_dictionary('dictionary.json')
+        logger.debug('ID: %s', self.id)
+        logger.debug('Image Path: %s', self.image_path)
+        self.load_substitution_dictionary(self.dictionary_file_path)
 
     def _substitute_and_sanitize(self, something:str) -> str:
 
-        if self._substitutions is not None:
-            for sub in self._substitutions:
-                something = something.replace(sub['original'], sub['substitution'])
-        
-        # Special cases and escaping
-        something = something.replace('&', '\&')
-        something = something.replace(chr(0), '')
-
-        return something
+        return self._dictionary.substitute_and_sanitize(something)
     
     def get_attribute_by_key(self, key:str) -> object:
         return self.__getattribute__(key)
@@ -73,6 +117,7 @@ class ZineImageMetadata():
             image_path = self.image_path,
             thumbnail_path = self.thumbnail_path,
             timestamp = self.timestamp,
+            taken = self.taken,
             description = self.description,
             make = self.make,
             model = self.model,
@@ -88,7 +133,21 @@ class ZineImageMetadata():
         )
 
         return td
-    
+
+    @classmethod
+    def from_dict(cls, td:dict) -> 'ZineImageMetadata':
+        """
+        Rebuild a metadata object from the output of to_dict(), eg. from the metadata cache.
+        """
+
+        meta = cls()
+        for key, value in td.items():
+            if isinstance(value, str) and key in cls.interned_fields:
+                value = sys.intern(value)
+            meta.set_attribute_by_key(key, value)
+
+        return meta
+
     def get_image_file_name(self) -> str:
         return os.path.basename(self.image_path)
     
@@ -98,6 +157,9 @@ class ZineImageMetadata():
     def set_thumbnail_path(self, thumbnail_path:str) -> None:
         self.thumbnail_path = thumbnail_path
 
+    def set_page(self, page:int) -> None:
+        self.page = page
+
     def parse_exif_data(self, exifdata) -> None:
         """
         Extract the relevant exif data.
@@ -122,14 +184,14 @@ class ZineImageMetadata():
 
         self.description = description
 
-        logger.debug(f'Description: {self.description}')
+        logger.debug('Description: %s', self.description)
 
     def infer_iso(self, sensitivity) -> None:
 
         # Nothing to infer
         self.iso = sensitivity
 
-        logger.debug(f'ISO: {self.iso}')
+        logger.debug('ISO: %s', self.iso)
 
     def infer_program(self, program) -> None:
 
@@ -138,7 +200,7 @@ class ZineImageMetadata():
             if program == enum.value:
                 self.program = enum.label
         
-        logger.debug(f'Program: {self.program}')
+        logger.debug('Program: %s', self.program)
 
     def infer_metering(self, mode) -> None:
 
@@ -147,7 +209,7 @@ class ZineImageMetadata():
             if mode == enum.value:
                 self.metering_mode = enum.label
 
-        logger.debug(f'Metering mode: {self.metering_mode}')
+        logger.debug('Metering mode: %s', self.metering_mode)
 
     def infer_exposure_compensation_fraction(self, bias:float) -> None:
 
@@ -169,8 +231,8 @@ class ZineImageMetadata():
         elif bias < 0:
             exposure_compensation = '-' + exposure_compensation
 
-        self.exposure_compensation = exposure_compensation
-        logger.debug(f'Exposure Compensation: {self.exposure_compensation}')
+        self.exposure_compensation = sys.intern(exposure_compensation)
+        logger.debug('Exposure Compensation: %s', self.exposure_compensation)
 
     def infer_white_balance(self, wb:str, temperature:int = None) -> None:
 
@@ -183,32 +245,33 @@ class ZineImageMetadata():
             logger.warning('White Balance could not be inferred. Verify output.')
 
 
-        logger.debug(f'White balance: {self.white_balance}')
+        logger.debug('White balance: %s', self.white_balance)
 
         # Not supported yet
         logger.warning('White Balance Inferrence is not currently supported. Oopsie.')
         self.temperature = temperature
-        logger.debug(f'Temperature: {self.temperature}')
+        logger.debug('Temperature: %s', self.temperature)
 
     def infer_make_and_model(self, make:str, model:str) -> None:
 
-        self.make = self._substitute_and_sanitize(make)
-        logger.debug(f'Camera Make: {self.make}')
-        self.model = self._substitute_and_sanitize(model)
-        logger.debug(f'Camera Model: {self.model}')
+        self.make = sys.intern(self._substitute_and_sanitize(make))
+        logger.debug('Camera Make: %s', self.make)
+        self.model = sys.intern(self._substitute_and_sanitize(model))
+        logger.debug('Camera Model: %s', self.model)
 
     def infer_lens_make_and_model(self, lens_make:str, lens_model:str) -> None:
 
-        self.lens_make = self._substitute_and_sanitize(lens_make)
-        logger.debug(f'Lens Make: {self.lens_make}')
-        self.lens_model = self._substitute_and_sanitize(lens_model)
-        logger.debug(f'Lens Model: {self.lens_model}')
+        self.lens_make = sys.intern(self._substitute_and_sanitize(lens_make))
+        logger.debug('Lens Make: %s', self.lens_make)
+        self.lens_model = sys.intern(self._substitute_and_sanitize(lens_model))
+        logger.debug('Lens Model: %s', self.lens_model)
 
     def infer_timestamp(self, ts) -> None:
         timestamp = datetime.strptime(ts,  '%Y:%m:%d %H:%M:%S')
+        self.taken = timestamp.isoformat(sep=' ')
         timestamp = datetime.strftime(timestamp, '%B %Y')
-        self.timestamp = timestamp
-        logger.debug(f'Timestamp: {self.timestamp}')
+        self.timestamp = sys.intern(timestamp)
+        logger.debug('Timestamp: %s', self.timestamp)
 
     def infer_speed_fraction(self, exposure_time) -> None:
 
@@ -216,8 +279,8 @@ class ZineImageMetadata():
         if exposure_time < 1:
             speed = '1/{0:.0f} sec'.format(int(1.0 / exposure_time))
 
-        self.speed = speed
-        logger.debug(f'Speed: {self.speed}')
+        self.speed = sys.intern(speed)
+        logger.debug('Speed: %s', self.speed)
 
     def infer_aperture(self, f_number:IFDRational) -> None:
 
@@ -226,8 +289,8 @@ class ZineImageMetadata():
             floating_f_number = f_number.numerator / f_number.denominator
             aperture = 'f/{0:.1f}'.format(floating_f_number)
 
-        self.aperture = aperture
-        logger.debug(f'Aperture: {self.aperture}')
+        self.aperture = sys.intern(aperture)
+        logger.debug('Aperture: %s', self.aperture)
 
     def extract_sidecar_data(self, sidecar_file_path:str) -> None:
         """
@@ -237,42 +300,52 @@ class ZineImageMetadata():
         try:
             with open(sidecar_file_path) as scf:
                 logger.info(f'Loading sidecar data from `{sidecar_file_path}`')
-                self.sidecar  = json.load(scf)
+                self.sidecar = self.share_sidecar(json.load(scf))
 
                 for key, value in self.sidecar.items():
-                    logger.debug(f'Additional information `{key}` contained in sidecar: {value}')
+                    logger.debug('Additional information `%s` contained in sidecar: %s', key, value)
 
         except Exception as err:
             logger.error('Sidecar data file could not be loaded. Verify output.')
             logger.debug(err.msg)
 
 
+    @classmethod
+    def share_sidecar(cls, sidecar:dict) -> dict:
+        """
+        Return the shared, read-only instance of this sidecar content, so that identical sidecars
+        (eg. thousands of untouched templates) only exist once in memory.
+        """
+
+        fingerprint = json.dumps(sidecar, sort_keys=True)
+        shared = cls._shared_sidecars.get(fingerprint)
+        if shared is None:
+            shared = sidecar if isinstance(sidecar, ZineSidecar) else ZineSidecar(sidecar)
+            cls._shared_sidecars[fingerprint] = shared
+
+        return shared
+
     def apply_sidecar_overwrites(self) -> None:
         """
         Apply any manuel overwrites from the Sidecar (json) file.
-        Skip any empty field.
+        Skip any empty field, and any field which is not part of the public metadata.
         """
         logger.info('Applying overwrites from Sidecar file (if any).')
         overwrites = self.sidecar.get('overwrites', dict())
 
         for key in overwrites.keys():
             if overwrites.get(key, None): 
-                logger.debug(f'Metadata `{key}` was overwritten by sidecar file. {self.get_attribute_by_key(key)} is now { overwrites[key]}')
-                self.set_attribute_by_key(key, overwrites[key]) # Pray here.
+                if key not in self.public_fields:
+                    logger.warning(f'Unknown metadata `{key}` in sidecar overwrites. Ignored.')
+                    continue
+                logger.debug('Metadata `%s` was overwritten by sidecar file. %s is now %s', key, self.get_attribute_by_key(key), overwrites[key])
+                self.set_attribute_by_key(key, overwrites[key])
 
     def load_substitution_dictionary(self, dictionary_file_path = 'dictionary.json'):
         """
         To avoid poorly formatted camera and lens maker data and information, a substitution
         dictionary is available. Load substitutions pairs from dictionary. 
-        Note: Default to dictionary.json.
+        Note: Default to dictionary.json. The dictionary is loaded once and shared by all images.
         """
 
-        try:
-            with open(dictionary_file_path) as dico:
-                logger.debug(f'Substitution dictionary loaded ({dictionary_file_path}).')
-                substitutions = json.load(dico)
-        except:
-            substitutions = None
-            logger.warning('Substitution dictionary could not be loaded. Verify output.')
-
-        self._substitutions = substitutions
+        self._dictionary = ZineSubstitutionDictionary.load(dictionary_file_path)
@@ -0,0 +1,283 @@
+import io
+import os
+import struct
+import time
+import hashlib
+import logging
+
+from PIL import Image
+
+try:
+    from PIL import ImageCms
+except ImportError:
+    ImageCms = None
+
+logger = logging.getLogger('Zine Image Processing')
+logger.setLevel(logging.INFO)
+
+# Image processing jobs, executed in the worker processes of ZineFactory.
+# Workers take a single tuple of arguments (pickled to the worker) and return a tuple whose
+# last item is None on success, or an error message. Exceptions never leave a worker so that
+# one broken image does not take the whole batch down.
+
+
+def render_thumbnail(job:tuple) -> tuple:
+    """
+    Resize a single image into its thumbnail file. The reducing gap controls how close to the target
+    size the JPEG is decoded (DCT scaling) before the final resampling. None decodes at full resolution.
+    Job: (image_path, thumbnail_path, size, resampling, reducing_gap). Returns (thumbnail_path, error).
+    """
+
+    image_path, thumbnail_path, size, resampling, reducing_gap = job
+
+    try:
+        with Image.open(image_path) as imgfile:
+            imgfile.thumbnail(size, resampling, reducing_gap=reducing_gap)
+            imgfile.save(thumbnail_path)
+    except Exception as err:
+        return thumbnail_path, f'{type(err).__name__}: {err}'
+
+    return thumbnail_path, None
+
+
+def render_web_image(job:tuple) -> tuple:
+    """
+    Render the screen resolution version of an image: long edge limited to `long_edge` pixels
+    (never upscaled), optimized JPEG at the given quality, without EXIF data. The colour
+    profile is kept. Job: (image_path, web_image_path, long_edge, quality). Returns (web_image_path, error).
+    """
+
+    image_path, web_image_path, long_edge, quality = job
+
+    try:
+        with Image.open(image_path) as imgfile:
+            icc_profile = imgfile.info.get('icc_profile')
+            imgfile.thumbnail((long_edge, long_edge), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            image = imgfile if imgfile.mode in ('RGB', 'L', 'CMYK') else imgfile.convert('RGB')
+            image.save(web_image_path, 'JPEG', quality=quality, optimize=True, icc_profile=icc_profile)
+    except Exception as err:
+        return web_image_path, f'{type(err).__name__}: {err}'
+
+    return web_image_path, None
+
+
+def render_print_image(job:tuple) -> tuple:
+    """
+    Resample an image to the exact pixel size it is printed at: fitted in the box (width, height
+    in pixels) keeping its aspect ratio, never upscaled. EXIF and other metadata are dropped, and
+    colours are converted to sRGB so that no ICC profile needs to be embedded (without littleCMS
+    in Pillow, non-sRGB profiles are kept). JPEG images are decoded at no less than twice the
+    target size (as the `quality` thumbnail profile) before the final resampling. sRGB JPEG images
+    already small enough are not re-encoded: their compressed data is copied, without the metadata
+    segments (see strip_jpeg_metadata).
+    Job: (image_path, print_image_path, box, quality). Returns (print_image_path, error).
+    """
+
+    image_path, print_image_path, box, quality = job
+
+    try:
+        with Image.open(image_path) as imgfile:
+            icc_profile = imgfile.info.get('icc_profile')
+            scale = min(box[0] / imgfile.width, box[1] / imgfile.height)
+            save_options = dict(quality=quality)
+
+            # sRGB is what printers assume without a profile, it can simply be dropped.
+            source_profile = None
+            if icc_profile and ImageCms is not None:
+                source_profile = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+                if 'sRGB' in ImageCms.getProfileDescription(source_profile):
+                    source_profile = None
+            elif icc_profile:
+                save_options['icc_profile'] = icc_profile
+
+            if scale < 1:
+                size = max(1, round(imgfile.width * scale)), max(1, round(imgfile.height * scale))
+                imgfile.draft(imgfile.mode, (size[0] * 2, size[1] * 2))
+                image = imgfile.resize(size, Image.Resampling.LANCZOS)
+            elif imgfile.format == 'JPEG' and imgfile.mode in ('RGB', 'L') and source_profile is None:
+                strip_jpeg_metadata(image_path, print_image_path, 'icc_profile' in save_options)
+                return print_image_path, None
+            else:
+                image = imgfile.copy()
+
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+
+            if source_profile is not None:
+                image = ImageCms.profileToProfile(
+                    image, source_profile, ImageCms.createProfile('sRGB'), outputMode=image.mode
+                )
+
+            image.save(print_image_path, 'JPEG', **save_options)
+    except Exception as err:
+        return print_image_path, f'{type(err).__name__}: {err}'
+
+    return print_image_path, None
+
+
+def strip_jpeg_metadata(image_path:str, output_path:str, keep_icc_profile:bool = False) -> None:
+    """
+    Copy a JPEG file without its metadata segments (EXIF, XMP, IPTC, comments, and the ICC profile
+    unless kept) nor the data following the end of the image (eg. embedded previews). The JFIF and
+    Adobe segments, which tell how to decode the colours, and the compressed image data are copied
+    as they are: no generation loss. Raise ValueError if the file is not a well-formed JPEG.
+    """
+
+    with open(image_path, 'rb') as source:
+        data = source.read()
+
+    if data[:2] != b'\xff\xd8':
+        raise ValueError('Not a JPEG file.')
+
+    output = [data[:2]]
+    position = 2
+    while True:
+        # Markers can be preceded by fill bytes.
+        while data[position:position + 2] == b'\xff\xff':
+            position += 1
+        if position + 4 > len(data) or data[position] != 0xFF:
+            raise ValueError('Malformed JPEG segment.')
+
+        marker = data[position + 1]
+        end = position + 2 + struct.unpack('>H', data[position + 2:position + 4])[0]
+
+        # Start of scan: copy the compressed data up to the end of image marker.
+        if marker == 0xDA:
+            end_of_image = data.find(b'\xff\xd9', end)
+            output.append(data[position:len(data) if end_of_image < 0 else end_of_image + 2])
+            break
+
+        segment = data[position:end]
+        metadata = 0xE1 <= marker <= 0xEF and marker != 0xEE or marker == 0xFE
+        if not metadata or marker == 0xE2 and keep_icc_profile and segment[4:16] == b'ICC_PROFILE\0':
+            output.append(segment)
+        position = end
+
+    with open(output_path, 'wb') as output_file:
+        output_file.write(b''.join(output))
+
+
+def hash_file(job:tuple) -> tuple:
+    """
+    SHA-1 of a file content, read in chunks. Job: (file_path,). Returns (hex digest, error).
+    """
+
+    file_path, = job
+
+    digest = hashlib.sha1()
+    try:
+        with open(file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                digest.update(chunk)
+    except Exception as err:
+        return None, f'{type(err).__name__}: {err}'
+
+    return digest.hexdigest(), None
+
+
+def perceptual_hash(job:tuple) -> tuple:
+    """
+    64-bit difference hash (dHash) of an image, typically its thumbnail: the image is reduced to
+    9x8 grey levels, and each bit tells whether a pixel is brighter than its right neighbour.
+    Re-exports, resized and recompressed copies get the same or a close hash.
+    Job: (image_path,). Returns (hash, error).
+    """
+
+    image_path, = job
+
+    try:
+        with Image.open(image_path) as imgfile:
+            imgfile.draft('L', (36, 32))
+            pixels = list(imgfile.convert('L').resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    except Exception as err:
+        return None, f'{type(err).__name__}: {err}'
+
+    value = 0
+    for row in range(8):
+        for column in range(8):
+            value = value << 1 | (pixels[row * 9 + column] > pixels[row * 9 + column + 1])
+
+    return value, None
+
+
+def render_atlas(job:tuple) -> tuple:
+    """
+    Compose the thumbnails of an index page into a single image (contact sheet): one column of cells
+    (width, height in pixels), top to bottom. Each thumbnail is fitted in the thumbnail box of its cell,
+    left aligned and vertically centred, on white. Missing thumbnails (None) leave their cell blank.
+    Job: (atlas_path, thumbnail_paths, cell, box, dpi, quality). Returns (atlas_path, error).
+    """
+
+    atlas_path, thumbnail_paths, cell, box, dpi, quality = job
+
+    try:
+        atlas = Image.new('RGB', (cell[0], cell[1] * len(thumbnail_paths)), 'white')
+        for row, thumbnail_path in enumerate(thumbnail_paths):
+            if thumbnail_path is None:
+                continue
+            with Image.open(thumbnail_path) as imgfile:
+                imgfile.thumbnail(box, Image.Resampling.LANCZOS)
+                image = imgfile if imgfile.mode == 'RGB' else imgfile.convert('RGB')
+                atlas.paste(image, (0, row * cell[1] + (cell[1] - image.height) // 2))
+        atlas.save(atlas_path, 'JPEG', quality=quality, dpi=(dpi, dpi))
+    except Exception as err:
+        return atlas_path, f'{type(err).__name__}: {err}'
+
+    return atlas_path, None
+
+
+def read_image_header(image_path:str) -> tuple:
+    """
+    Return the (width, height, bands, format) of an image, read from its header. Nothing is decoded.
+    """
+
+    with Image.open(image_path) as imgfile:
+        return imgfile.width, imgfile.height, len(imgfile.getbands()), imgfile.format
+
+
+def estimate_decode_memory(header:tuple, size:tuple, reducing_gap:float) -> int:
+    """
+    Bytes held in memory to render an image (header from read_image_header) fitted in size:
+    the decoded image and the resampled one, as Pillow stores them (4 bytes per pixel for colour).
+    JPEG images are decoded at 1/2, 1/4 or 1/8 scale (DCT scaling) when they are at least
+    reducing_gap times larger than the target, as Image.thumbnail and Image.draft do.
+    A reducing gap of None means a full resolution decode.
+    """
+
+    width, height, bands, format = header
+    pixel_size = 1 if bands == 1 else 4
+
+    ratio = min(1, size[0] / width, size[1] / height)
+    target_width, target_height = max(1, round(width * ratio)), max(1, round(height * ratio))
+
+    scale = 1
+    if format == 'JPEG' and reducing_gap is not None and ratio < 1:
+        factor = min(width // (target_width * reducing_gap), height // (target_height * reducing_gap))
+        scale = next((scale for scale in (8, 4, 2) if factor >= scale), 1)
+
+    decoded = -(-width // scale) * -(-height // scale)
+
+    return (decoded + target_width * target_height) * pixel_size
+
+
+def run_in_folder(folder:str, worker, job:tuple) -> tuple:
+    """
+    Run a job in the given working folder, for pools shared by several zines (job paths are relative).
+    """
+
+    if os.getcwd() != folder:
+        os.chdir(folder)
+
+    return worker(job)
+
+
+def run_profiled(worker, job:tuple) -> tuple:
+    """
+    Run a job through a worker, timing it in the worker process for ZineProfiler.
+    Returns (worker result, start, duration, pid), start and duration in perf_counter nanoseconds.
+    """
+
+    start = time.perf_counter_ns()
+    result = worker(job)
+
+    return result, start, time.perf_counter_ns() - start, os.getpid()
@@ -44,11 +44,17 @@ class ZineIndexTemplate(object):
     def get_title_and_description_template(self) -> str:
         """
         Build index title and description (if any).
+        The page is a literal number when resolved ahead of the build, a reference otherwise
+        (which needs a second pdflatex pass).
         """
         
+        page = self.meta.page
+        if page is None:
+            page = f"\\pageref{{img:{self.meta.image_path}}}"
+
         tpl = f"\t\\par \\raisebox{{-0.1\\height}}{{\\faImage[regular]}}~\\textbf{{Photo \\#{self.meta.id}}}"
         tpl += "$\\cdot$"
-        tpl += f"Page~\\pageref{{img:{self.meta.image_path}}} $\\cdot$ {self.meta.timestamp}\n"
+        tpl += f"Page~{page} $\\cdot$ {self.meta.timestamp}\n"
 
         if self.meta.description:
             tpl += f"\t\\par {self.meta.description}\n"
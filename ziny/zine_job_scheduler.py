@@ -0,0 +1,61 @@
+import logging
+from concurrent.futures import wait, FIRST_COMPLETED
+
+logger = logging.getLogger('Zine Job Scheduler')
+logger.setLevel(logging.INFO)
+
+
+class ZineJobScheduler():
+    """
+    Submits jobs to a process pool, at most `jobs` running at a time, and only while the memory
+    estimates of the running jobs stay within the memory budget (None: no budget). A job over the
+    whole budget runs alone. Submitting waits for running jobs to complete when needed, so the
+    callers (ZineFactory.run_jobs, the streaming stages) hold back their jobs in the same way.
+    """
+
+    def __init__(self, pool, jobs:int, memory_budget:int = None):
+
+        self.pool = pool
+        self.jobs = jobs
+        self.memory_budget = memory_budget
+
+        self.running = dict() # Future -> memory estimate
+        self.memory = 0
+        self.waits = 0 # Submissions held back by the memory budget
+
+    def release(self) -> None:
+        """
+        Forget the jobs which completed, and their memory.
+        """
+
+        for future in [future for future in self.running if future.done()]:
+            self.memory -= self.running.pop(future)
+
+    def fits(self, cost:int) -> bool:
+        """
+        Whether a job of this memory estimate can start now.
+        """
+
+        self.release()
+        if len(self.running) >= self.jobs:
+            return False
+
+        return self.memory_budget is None or not self.running or self.memory + cost <= self.memory_budget
+
+    def submit(self, worker, job:tuple, cost:int = 0):
+        """
+        Submit a job once it fits (see fits), and return its future.
+        """
+
+        if not self.fits(cost):
+            if len(self.running) < self.jobs:
+                self.waits += 1
+                logger.debug('Job held back, %s bytes running for a budget of %s.', self.memory, self.memory_budget)
+            while not self.fits(cost):
+                wait(self.running, return_when=FIRST_COMPLETED)
+
+        future = self.pool.submit(worker, job)
+        self.running[future] = cost
+        self.memory += cost
+
+        return future
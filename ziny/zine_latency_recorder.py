@@ -0,0 +1,66 @@
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger('Zine Latency Recorder')
+logger.setLevel(logging.INFO)
+
+
+class ZineLatencyRecorder():
+    """
+    Collects the duration of every occurrence of a stage (eg. EXIF read, sidecar read), from any
+    thread, and reports latency percentiles per stage. Used to tune the scan concurrency.
+    """
+
+    percentiles = 50, 90, 99
+
+    def __init__(self):
+
+        self.samples = dict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, stage:str):
+        """
+        Context manager timing one occurrence of a stage.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage:str, duration:float) -> None:
+        """
+        Record one duration (seconds) for this stage.
+        """
+
+        with self._lock:
+            self.samples.setdefault(stage, list()).append(duration)
+
+    def get_percentile(self, stage:str, percentile:float) -> float:
+        """
+        Return the given percentile (nearest rank) of the durations of a stage, in seconds.
+        """
+
+        samples = sorted(self.samples.get(stage, list()))
+        if not samples:
+            return 0.0
+
+        rank = max(0, min(len(samples) - 1, math.ceil(percentile / 100 * len(samples)) - 1))
+        return samples[rank]
+
+    def report(self) -> None:
+        """
+        Log count, percentiles and maximum latency of every stage, in milliseconds.
+        """
+
+        for stage, samples in self.samples.items():
+            percentiles = ', '.join(
+                f'p{percentile} {self.get_percentile(stage, percentile) * 1000:.2f}'
+                for percentile in self.percentiles
+            )
+            logger.info(f'{stage}: {len(samples)} calls, {percentiles}, max {max(samples) * 1000:.2f} ms')
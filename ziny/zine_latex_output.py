@@ -0,0 +1,126 @@
+import os
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger('Zine Latex Output')
+logger.setLevel(logging.INFO)
+
+
+class ZineLatexOutput():
+    """
+    Change-aware LaTeX output file. Fragments are written to a temporary file as they come, and
+    the output file is only replaced (atomically) if the new content differs from the current one,
+    so that unchanged outputs keep their modification time and don't trigger pdflatex runs.
+    The hash of every fragment is recorded in <output>.fragments.json, which tells a build tool
+    which entries changed since the previous generation.
+
+    Usage:
+        with ZineLatexOutput('images.tex') as latex:
+            latex.write(key, fragment)
+    """
+
+    def __init__(self, output_path:str):
+
+        self.output_path = output_path
+        self.temporary_path = output_path + '.tmp'
+        self.fragments_path = output_path + '.fragments.json'
+
+        self.fragment_hashes = dict()
+        self.previous_fragment_hashes = dict()
+        self.changed = False
+
+        self._file = None
+
+    def __enter__(self) -> 'ZineLatexOutput':
+
+        try:
+            with open(self.fragments_path) as fragments:
+                self.previous_fragment_hashes = json.load(fragments)
+        except Exception:
+            self.previous_fragment_hashes = dict()
+
+        self._file = open(self.temporary_path, 'w')
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+
+        self._file.close()
+        self._file = None
+
+        if exc_type is not None:
+            os.remove(self.temporary_path)
+            return False
+
+        self.changed = self.commit()
+
+        return False
+
+    def write(self, key:str, fragment:str) -> None:
+        """
+        Append the fragment of one entry (eg. one image) to the output.
+        """
+
+        self._file.write(fragment)
+        self.fragment_hashes[key] = hashlib.sha1(fragment.encode()).hexdigest()
+
+    def write_all(self, keys:list, fragments:list) -> None:
+        """
+        Append the fragments of many entries with a single write.
+        """
+
+        self._file.write(''.join(fragments))
+        for key, fragment in zip(keys, fragments):
+            self.fragment_hashes[key] = hashlib.sha1(fragment.encode()).hexdigest()
+
+    def commit(self) -> bool:
+        """
+        Replace the output file with the new content if it changed. Return True if it did.
+        """
+
+        if self.fragment_hashes != self.previous_fragment_hashes:
+            with open(self.fragments_path, 'w') as fragments:
+                json.dump(self.fragment_hashes, fragments, indent=4)
+
+        if self.get_file_hash(self.temporary_path) == self.get_file_hash(self.output_path):
+            os.remove(self.temporary_path)
+            logger.debug('`%s` is unchanged and was not rewritten.', self.output_path)
+            return False
+
+        os.replace(self.temporary_path, self.output_path)
+
+        logger.debug('`%s` was updated.', self.output_path)
+        return True
+
+    def get_changed_entries(self) -> list:
+        """
+        Return the keys of the entries that are new or changed since the previous generation.
+        """
+
+        return [
+            key for key, fragment_hash in self.fragment_hashes.items()
+            if self.previous_fragment_hashes.get(key) != fragment_hash
+        ]
+
+    def get_removed_entries(self) -> list:
+        """
+        Return the keys of the entries that were in the previous generation but aren't anymore.
+        """
+
+        return [key for key in self.previous_fragment_hashes if key not in self.fragment_hashes]
+
+    def get_file_hash(self, path:str) -> str:
+        """
+        Return the SHA-256 hash of a file's content, None if the file doesn't exist.
+        """
+
+        digest = hashlib.sha256()
+        try:
+            with open(path, 'rb') as file:
+                for chunk in iter(lambda: file.read(1 << 16), b''):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            return None
+
+        return digest.hexdigest()
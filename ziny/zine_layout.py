@@ -0,0 +1,177 @@
+import logging
+
+logger = logging.getLogger('Zine Layout')
+logger.setLevel(logging.INFO)
+
+
+class ZineLayoutPage():
+    """
+    One page of the content: its kind (see ZineLayout.templates) and image paths, in slot order.
+    """
+
+    __slots__ = ('kind', 'image_paths')
+
+    def __init__(self, kind:str, image_paths:list):
+
+        self.kind = kind
+        self.image_paths = image_paths
+
+    def get_key(self) -> str:
+        return '+'.join(self.image_paths)
+
+
+class ZineLayoutEntry():
+    """
+    What the layout needs to know about an image: its pixel dimensions (from the JPEG header)
+    and the layout, position and visibility requested in its sidecar.
+    """
+
+    __slots__ = ('image_path', 'width', 'height', 'layout', 'position', 'visibility')
+
+    def __init__(self, image_path:str, width:int, height:int, layout:str = 'auto', position:str = 'auto',
+                 visibility:str = 'default'):
+
+        self.image_path = image_path
+        self.width = width
+        self.height = height
+        self.layout = layout or 'auto'
+        self.position = position or 'auto'
+        self.visibility = visibility or 'default'
+
+
+class ZineLayout():
+    """
+    Lays out the content images on pages: landscape images are stacked by two, portrait images
+    placed side by side by two, other images (panoramas, squares, unknown dimensions) get a page
+    of their own, as do images with `layout: single` (placed at the `position` they ask for).
+    Hidden images (`visibility: hidden`) are left out.
+    Pages follow the library order. An image waiting for a partner of its kind keeps its page for
+    the next `window` pages at most, so pairing only moves images a few pages ahead, and the whole
+    layout is a single pass over the library.
+    """
+
+    # Text block of content.tex and space between images, in mm.
+    text_width = 160
+    text_height = 240
+    gap = 8
+
+    window = 4
+
+    # Page templates. Format fields: {path_0}, {label_0}, {path_1}, {label_1} (labels are the original image paths).
+    templates = dict(
+        single = """
+    \\begin{{figure}}
+    \\centering
+    \\phantomsection\\label{{img:{label_0}}}
+    \\includegraphics[height=\\textheight, width=160mm, keepaspectratio]{{{path_0}}}%
+    \\end{{figure}}
+    """,
+        single_top = """
+    \\begin{{figure}}[p]
+    \\begin{{minipage}}[c][\\textheight][t]{{\\textwidth}}
+    \\centering
+    \\phantomsection\\label{{img:{label_0}}}
+    \\includegraphics[height=\\textheight, width=160mm, keepaspectratio]{{{path_0}}}%
+    \\end{{minipage}}
+    \\end{{figure}}
+    """,
+        single_bottom = """
+    \\begin{{figure}}[p]
+    \\begin{{minipage}}[c][\\textheight][b]{{\\textwidth}}
+    \\centering
+    \\phantomsection\\label{{img:{label_0}}}
+    \\includegraphics[height=\\textheight, width=160mm, keepaspectratio]{{{path_0}}}%
+    \\end{{minipage}}
+    \\end{{figure}}
+    """,
+        landscape_pair = """
+    \\begin{{figure}}[p]
+    \\centering
+    \\phantomsection\\label{{img:{label_0}}}
+    \\includegraphics[height=116mm, width=160mm, keepaspectratio]{{{path_0}}}%
+    \\par\\vspace{{8mm}}
+    \\phantomsection\\label{{img:{label_1}}}
+    \\includegraphics[height=116mm, width=160mm, keepaspectratio]{{{path_1}}}%
+    \\end{{figure}}
+    """,
+        portrait_pair = """
+    \\begin{{figure}}[p]
+    \\centering
+    \\phantomsection\\label{{img:{label_0}}}
+    \\includegraphics[height=\\textheight, width=76mm, keepaspectratio]{{{path_0}}}%
+    \\hspace{{8mm}}%
+    \\phantomsection\\label{{img:{label_1}}}
+    \\includegraphics[height=\\textheight, width=76mm, keepaspectratio]{{{path_1}}}%
+    \\end{{figure}}
+    """,
+    )
+
+    def __init__(self, window:int = None):
+
+        self.window = self.window if window is None else window
+
+        # Aspect ratios (width / height) which can share a page without shrinking much:
+        # two landscapes at full width fit in the height, two portraits at half width too.
+        self.min_landscape_ratio = 2 * self.text_width / (self.text_height - self.gap)
+        self.min_portrait_ratio = (self.text_width - self.gap) / 2 / self.text_height
+        self.max_portrait_ratio = 0.85
+
+    def get_pair_kind(self, entry:ZineLayoutEntry) -> str:
+        """
+        Kind of page an image can share with another one, None if it needs a page of its own.
+        """
+
+        if entry.layout == 'single' or not entry.width or not entry.height:
+            return None
+
+        ratio = entry.width / entry.height
+        if ratio >= self.min_landscape_ratio:
+            return 'landscape_pair'
+        if self.min_portrait_ratio <= ratio <= self.max_portrait_ratio:
+            return 'portrait_pair'
+
+        return None
+
+    def plan(self, entries) -> list:
+        """
+        Return the pages (ZineLayoutPage) of the visible images, in order.
+        """
+
+        pages = list()
+        waiting = dict() # Pair kind -> index of the page waiting for a second image
+
+        for entry in entries:
+            if entry.visibility == 'hidden':
+                logger.debug('`%s` is hidden, left out of the layout.', entry.image_path)
+                continue
+
+            kind = self.get_pair_kind(entry)
+            if kind is None:
+                position = entry.position if entry.layout == 'single' and entry.position in ('top', 'bottom') else None
+                pages.append(ZineLayoutPage('single' if position is None else 'single_' + position, [entry.image_path]))
+                continue
+
+            index = waiting.pop(kind, None)
+            if index is not None and len(pages) - index <= self.window:
+                pages[index].kind = kind
+                pages[index].image_paths.append(entry.image_path)
+            else:
+                waiting[kind] = len(pages)
+                pages.append(ZineLayoutPage('single', [entry.image_path]))
+
+        logger.debug('%s pages laid out.', len(pages))
+
+        return pages
+
+    def render_page(self, page:ZineLayoutPage, get_path) -> str:
+        """
+        LaTeX code of a page. get_path gives the path of the file to include for an image path
+        (eg. its print or web version).
+        """
+
+        fields = dict()
+        for slot, image_path in enumerate(page.image_paths):
+            fields[f'label_{slot}'] = image_path
+            fields[f'path_{slot}'] = get_path(image_path)
+
+        return self.templates[page.kind].format(**fields)
@@ -0,0 +1,267 @@
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+
+import ziny.zine_exif_reader
+import ziny.zine_image_metadata
+import ziny.zine_exif_constants
+import ziny.zine_substitution_dictionary
+
+logger = logging.getLogger('Zine Metadata Cache')
+logger.setLevel(logging.INFO)
+
+
+class ZineMetadataCache():
+    """
+    On-disk (SQLite) cache of the parsed and inferred image metadata and of the sidecar contents.
+    Image entries are keyed by path, size and modification time, sidecar entries by their own
+    modification time, so that editing a sidecar does not force the EXIF data to be decoded again.
+    The whole cache is invalidated whenever the substitution dictionary, the EXIF reader or the
+    inference code changes.
+    With a root folder, entries are keyed by absolute path so that several zine projects can share
+    the cache (batch mode), and pruning only affects the entries of that root folder.
+    """
+
+    # Bump when the cached format or the inference output changes in a way the source hash can't see.
+    schema_version = 1
+
+    def __init__(self, cache_file_path:str, dictionary_file_path:str = 'dictionary.json', root:str = None):
+
+        self.cache_file_path = cache_file_path
+        self.dictionary_file_path = dictionary_file_path
+        self.root = root
+        self.version = self.compute_version()
+        self.seen = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.sidecar_hits = 0
+        self.sidecar_misses = 0
+
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def compute_version(self) -> str:
+        """
+        Fingerprint of everything that influences the cached values: schema version,
+        substitution dictionary, the EXIF reader and the inference source code.
+        """
+
+        digest = hashlib.sha1(str(self.schema_version).encode())
+        for path in (self.dictionary_file_path,
+                     ziny.zine_exif_reader.__file__,
+                     ziny.zine_image_metadata.__file__,
+                     ziny.zine_exif_constants.__file__,
+                     ziny.zine_substitution_dictionary.__file__):
+            try:
+                with open(path, 'rb') as source:
+                    digest.update(source.read())
+            except OSError:
+                digest.update(b'missing')
+
+        return digest.hexdigest()
+
+    def open(self) -> None:
+        """
+        Open (or create) the cache database. Drop every entry if the version changed.
+        """
+
+        # The dictionary may have changed since the last opening (watch mode).
+        self.version = self.compute_version()
+
+        # The connection is shared by the scan threads, access is serialized with self._lock.
+        self._connection = sqlite3.connect(self.cache_file_path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)'
+        )
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'image_path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, '
+            'sidecar_mtime_ns INTEGER, metadata TEXT, sidecar TEXT)'
+        )
+
+        # Content hashes don't depend on the dictionary or the inference code, they survive invalidations.
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS hashes (image_path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT)'
+        )
+
+        row = self._connection.execute("SELECT value FROM info WHERE key = 'version'").fetchone()
+        if row is None or row[0] != self.version:
+            if row is not None:
+                logger.info('Dictionary, EXIF reader or inference code changed. Metadata cache invalidated.')
+            self._connection.execute('DELETE FROM entries')
+            self._connection.execute(
+                "INSERT OR REPLACE INTO info (key, value) VALUES ('version', ?)", (self.version,)
+            )
+            self._connection.commit()
+
+        self.seen.clear()
+        self.hits = self.misses = self.sidecar_hits = self.sidecar_misses = 0
+
+        logger.debug('Metadata cache opened (%s).', self.cache_file_path)
+
+    @property
+    def is_open(self) -> bool:
+        return self._connection is not None
+
+    def close(self, prune:bool = True) -> None:
+        """
+        Remove entries of images that were not seen since opening (if requested), commit and close.
+        """
+
+        if self._connection is None:
+            return
+
+        if prune:
+            stale = [
+                row[0] for row in self._connection.execute('SELECT image_path FROM entries')
+                if row[0] not in self.seen and (self.root is None or row[0].startswith(self.root + os.sep))
+            ]
+            self._connection.executemany(
+                'DELETE FROM entries WHERE image_path = ?', [(path,) for path in stale]
+            )
+            # Content hashes are kept as long as their file exists (eg. thumbnails, hashed after the scan).
+            stale_hashes = [
+                row[0] for row in self._connection.execute('SELECT image_path FROM hashes')
+                if row[0] not in self.seen and (self.root is None or row[0].startswith(self.root + os.sep))
+                and not os.path.exists(row[0])
+            ]
+            self._connection.executemany(
+                'DELETE FROM hashes WHERE image_path = ?', [(path,) for path in stale_hashes]
+            )
+            if stale:
+                logger.debug('%s stale entries removed from the metadata cache.', len(stale))
+
+        self._connection.commit()
+        self._connection.close()
+        self._connection = None
+
+    def get_key(self, image_path:str) -> str:
+        """
+        Cache key of an image: its path, absolute with a root folder.
+        """
+
+        if self.root is None:
+            return image_path
+
+        return os.path.normpath(os.path.join(self.root, image_path))
+
+    @staticmethod
+    def get_signature(image_path:str, sidecar_path:str) -> tuple:
+        """
+        Return the (size, mtime, sidecar mtime) triplet identifying the current file versions.
+        """
+
+        image_stat = os.stat(image_path)
+        try:
+            sidecar_mtime_ns = os.stat(sidecar_path).st_mtime_ns
+        except OSError:
+            sidecar_mtime_ns = None
+
+        return image_stat.st_size, image_stat.st_mtime_ns, sidecar_mtime_ns
+
+    def lookup(self, image_path:str, signature:tuple) -> tuple:
+        """
+        Return the cached (metadata, sidecar) pair. Either is None if missing or outdated.
+        """
+
+        key = self.get_key(image_path)
+        size, mtime_ns, sidecar_mtime_ns = signature
+
+        with self._lock:
+            self.seen.add(key)
+            row = self._connection.execute(
+                'SELECT size, mtime_ns, sidecar_mtime_ns, metadata, sidecar FROM entries WHERE image_path = ?',
+                (key,)
+            ).fetchone()
+
+        metadata = None
+        sidecar = None
+        if row is not None and row[0] == size and row[1] == mtime_ns:
+            metadata = json.loads(row[3])
+            if sidecar_mtime_ns is not None and row[2] == sidecar_mtime_ns:
+                sidecar = json.loads(row[4])
+
+        with self._lock:
+            if metadata is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+            if sidecar is None:
+                self.sidecar_misses += 1
+            else:
+                self.sidecar_hits += 1
+
+        return metadata, sidecar
+
+    def store(self, image_path:str, signature:tuple, metadata:dict, sidecar:dict) -> None:
+        """
+        Record the metadata (before sidecar overwrites) and sidecar contents of an image.
+        """
+
+        key = self.get_key(image_path)
+        size, mtime_ns, sidecar_mtime_ns = signature
+        metadata = {name: self._to_cacheable(value) for name, value in metadata.items()}
+
+        with self._lock:
+            self.seen.add(key)
+            self._connection.execute(
+                'INSERT OR REPLACE INTO entries '
+                '(image_path, size, mtime_ns, sidecar_mtime_ns, metadata, sidecar) VALUES (?, ?, ?, ?, ?, ?)',
+                (key, size, mtime_ns, sidecar_mtime_ns, json.dumps(metadata), json.dumps(sidecar))
+            )
+
+    def lookup_content_hash(self, image_path:str, size:int, mtime_ns:int) -> str:
+        """
+        Return the cached content hash of an image, None if missing or outdated.
+        """
+
+        key = self.get_key(image_path)
+
+        with self._lock:
+            self.seen.add(key)
+            row = self._connection.execute(
+                'SELECT hash FROM hashes WHERE image_path = ? AND size = ? AND mtime_ns = ?',
+                (key, size, mtime_ns)
+            ).fetchone()
+
+        return None if row is None else row[0]
+
+    def store_content_hash(self, image_path:str, size:int, mtime_ns:int, content_hash:str) -> None:
+        """
+        Record the content hash of an image version.
+        """
+
+        key = self.get_key(image_path)
+
+        with self._lock:
+            self.seen.add(key)
+            self._connection.execute(
+                'INSERT OR REPLACE INTO hashes (image_path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)',
+                (key, size, mtime_ns, content_hash)
+            )
+
+    def report(self) -> None:
+        """
+        Log the hit/miss counts of the last scan.
+        """
+
+        logger.info(
+            f'Metadata cache: {self.hits} hits, {self.misses} misses. '
+            f'Sidecars: {self.sidecar_hits} hits, {self.sidecar_misses} misses.'
+        )
+
+    def _to_cacheable(self, value):
+        """
+        Keep JSON natives as they are. Anything else (enums, rationals) is stored as the string
+        it renders to, so that cached entries produce the exact same LaTeX output.
+        """
+
+        if value is None or type(value) in (str, int, float, bool):
+            return value
+
+        return str(value)
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger('Zine Profiler')
+logger.setLevel(logging.INFO)
+
+
+class ZineProfiler():
+    """
+    Records the stages of a run as Chrome trace events (chrome://tracing, ui.perfetto.dev), from
+    any thread or worker process, along with counters (bytes read, images processed, cache hits...).
+    Stages attached to an image are also summed per image, to report the slowest images.
+    Timestamps come from perf_counter_ns, a system-wide monotonic clock, so that events
+    timed in worker processes line up with the ones of the main process.
+    """
+
+    def __init__(self):
+
+        self.origin = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self.events = list()
+        self.counters = dict()
+        self.image_durations = dict() # Image path -> {stage: seconds}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, stage:str, image_path:str = None):
+        """
+        Context manager recording one occurrence of a stage.
+        """
+
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add_event(stage, start, time.perf_counter_ns() - start, image_path=image_path)
+
+    def add_event(self, stage:str, start:int, duration:int, pid:int = None, tid:int = None,
+                  image_path:str = None) -> None:
+        """
+        Record one complete event. Start and duration in perf_counter nanoseconds.
+        """
+
+        event = dict(
+            name=stage, cat='zine', ph='X', ts=(start - self.origin) / 1000, dur=duration / 1000,
+            pid=pid or self.pid, tid=tid or threading.get_ident()
+        )
+        if image_path is not None:
+            event['args'] = dict(image=image_path)
+
+        with self._lock:
+            self.events.append(event)
+            if image_path is not None:
+                durations = self.image_durations.setdefault(image_path, dict())
+                durations[stage] = durations.get(stage, 0) + duration / 1e9
+
+    def count(self, counter:str, value:int = 1) -> None:
+        """
+        Increment a counter. Its value over time is part of the trace.
+        """
+
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+            self.events.append(dict(
+                name=counter, cat='zine', ph='C', ts=(time.perf_counter_ns() - self.origin) / 1000,
+                pid=self.pid, args={counter: self.counters[counter]}
+            ))
+
+    def save(self, trace_file_path:str) -> None:
+        """
+        Write the trace in the Chrome trace event JSON format.
+        """
+
+        with self._lock:
+            pids = sorted({event['pid'] for event in self.events} | {self.pid})
+            names = [
+                dict(name='process_name', ph='M', pid=pid,
+                     args=dict(name='main' if pid == self.pid else f'worker {pid}'))
+                for pid in pids
+            ]
+            trace = dict(traceEvents=names + self.events, displayTimeUnit='ms')
+
+        with open(trace_file_path, 'w') as trace_file:
+            json.dump(trace, trace_file)
+
+        logger.info(f'Trace written to `{trace_file_path}` ({len(self.events)} events).')
+
+    def report(self, top:int = 10) -> None:
+        """
+        Log the total time per stage, the counters, and the slowest images with their stage breakdown.
+        """
+
+        totals = dict()
+        for event in self.events:
+            if event['ph'] == 'X':
+                calls, duration = totals.get(event['name'], (0, 0))
+                totals[event['name']] = (calls + 1, duration + event['dur'] / 1000)
+
+        for stage, (calls, duration) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            logger.info(f'{stage}: {calls} calls, {duration:.1f} ms')
+
+        for counter, value in self.counters.items():
+            logger.info(f'{counter}: {value}')
+
+        if not self.image_durations:
+            return
+
+        stages = sorted({stage for durations in self.image_durations.values() for stage in durations})
+        slowest = sorted(self.image_durations.items(), key=lambda item: -sum(item[1].values()))[:top]
+        width = max(len(image_path) for image_path, _ in slowest)
+
+        logger.info('Slowest images (ms):')
+        logger.info(f'{"image":<{width}} {"total":>9} ' + ' '.join(f'{stage:>14}' for stage in stages))
+        for image_path, durations in slowest:
+            logger.info(
+                f'{image_path:<{width}} {sum(durations.values()) * 1000:>9.1f} '
+                + ' '.join(f'{durations.get(stage, 0) * 1000:>14.1f}' for stage in stages)
+            )
@@ -0,0 +1,129 @@
+import os
+import json
+import logging
+import threading
+
+logger = logging.getLogger('Zine Sidecar Store')
+logger.setLevel(logging.INFO)
+
+
+class ZineSidecarStore():
+    """
+    Consolidated sidecar data: one JSON Lines file per image folder, holding one record
+    `{"image": <file name>, "sidecar": {...}}` per image, bulk-loaded once.
+    Images without a record simply get the default sidecar, nothing needs to be written for them.
+    Per-image sidecar files (<image>.json) are still honoured and take precedence over the store,
+    so that hand-edited files keep working.
+    """
+
+    store_file_name = 'sidecars.jsonl'
+
+    def __init__(self, default_sidecar:dict):
+
+        self.default_sidecar = default_sidecar
+        self.folders = dict()
+        self._lock = threading.Lock()
+
+    def get_store_file_path(self, folder:str) -> str:
+        """
+        Return the store file path of an image folder.
+        """
+
+        return os.path.join(folder, self.store_file_name)
+
+    def load_folder(self, folder:str) -> dict:
+        """
+        Return the {image file name: sidecar} records of a folder, loading its store file on first access.
+        """
+
+        with self._lock:
+            records = self.folders.get(folder)
+            if records is not None:
+                return records
+
+            records = dict()
+            store_file_path = self.get_store_file_path(folder)
+            try:
+                with open(store_file_path) as store:
+                    for line_number, line in enumerate(store, start=1):
+                        if not line.strip():
+                            continue
+                        try:
+                            record = json.loads(line)
+                            records[record['image']] = record['sidecar']
+                        except (ValueError, KeyError):
+                            logger.error(f'Invalid sidecar record at `{store_file_path}` line {line_number}. Ignored.')
+                logger.debug('%s sidecar records loaded from `%s`.', len(records), store_file_path)
+            except FileNotFoundError:
+                pass
+
+            self.folders[folder] = records
+            return records
+
+    def forget_folder(self, folder:str) -> None:
+        """
+        Drop the loaded records of a folder, its store file is loaded again on next access.
+        """
+
+        with self._lock:
+            self.folders.pop(folder, None)
+
+    def get(self, image_path:str, use_default:bool = True) -> dict:
+        """
+        Return the sidecar of an image from the store. If it has no record, return the default
+        sidecar, or None if use_default is False.
+        """
+
+        folder, file = os.path.split(image_path)
+        return self.load_folder(folder).get(file, self.default_sidecar if use_default else None)
+
+    def save_folder(self, folder:str) -> None:
+        """
+        Write the records of a folder back to its store file, sorted by image file name.
+        """
+
+        records = self.load_folder(folder)
+        with open(self.get_store_file_path(folder), 'w') as store:
+            for file in sorted(records):
+                store.write(json.dumps(dict(image=file, sidecar=records[file]), ensure_ascii=False) + '\n')
+
+    def import_sidecar_files(self, image_folder:str, sidecar_suffix:str = '.json', remove_files:bool = True) -> int:
+        """
+        Migrate per-image sidecar files (<image>.jpg.json) of an image folder tree into the stores.
+        Untouched sidecars (identical to the default) are dropped rather than recorded.
+        Imported files are removed once the stores are written, since they would otherwise take precedence.
+        Return the number of imported files.
+        """
+
+        imported = list()
+        for root, _, files in os.walk(image_folder):
+            records = self.load_folder(root)
+            for file in sorted(files):
+                if not file.endswith('.jpg' + sidecar_suffix):
+                    continue
+
+                sidecar_file_path = os.path.join(root, file)
+                try:
+                    with open(sidecar_file_path) as sidecar_file:
+                        sidecar = json.load(sidecar_file)
+                except Exception:
+                    logger.error(f'Sidecar file `{sidecar_file_path}` could not be loaded. Not imported.')
+                    continue
+
+                image_file = file[:-len(sidecar_suffix)]
+                if sidecar == self.default_sidecar:
+                    records.pop(image_file, None)
+                else:
+                    records[image_file] = sidecar
+                imported.append(sidecar_file_path)
+
+            if records or os.path.exists(self.get_store_file_path(root)):
+                self.save_folder(root)
+
+        if remove_files:
+            for sidecar_file_path in imported:
+                os.remove(sidecar_file_path)
+
+        logger.info(f'{len(imported)} sidecar files imported into sidecar stores.')
+
+        return len(imported)
@@ -0,0 +1,81 @@
+import os
+import re
+import json
+import logging
+
+logger = logging.getLogger('Zine Substitution Dictionary')
+logger.setLevel(logging.INFO)
+
+
+class ZineSubstitutionDictionary():
+    """
+    Substitution dictionary (see dictionary.json), compiled into a single alternation regex.
+    All substitutions are applied in one pass over the input string, longest original first,
+    and substituted text is never substituted again. Results are memoized per input string:
+    a library only ever contains a handful of distinct camera and lens names.
+    Dictionaries are shared process-wide, and only reloaded when the file modification time changes.
+    """
+
+    _loaded = dict()
+
+    def __init__(self, substitutions:list = None):
+
+        self.substitutions = dict()
+        for sub in substitutions or list():
+            self.substitutions.setdefault(sub['original'], sub['substitution'])
+
+        self._pattern = None
+        if self.substitutions:
+            originals = sorted(self.substitutions.keys(), key=len, reverse=True)
+            self._pattern = re.compile('|'.join(re.escape(original) for original in originals))
+
+        self._memo = dict()
+
+    @classmethod
+    def load(cls, dictionary_file_path:str = 'dictionary.json') -> 'ZineSubstitutionDictionary':
+        """
+        Return the shared dictionary for this file, loading or reloading it if needed.
+        A missing or broken file results in an empty dictionary (sanitization only).
+        """
+
+        # Keyed by absolute path: the same relative path may designate another file after a chdir (batch mode).
+        key = os.path.abspath(dictionary_file_path)
+        try:
+            mtime_ns = os.stat(dictionary_file_path).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+
+        loaded = cls._loaded.get(key)
+        if loaded is not None and loaded[0] == mtime_ns:
+            return loaded[1]
+
+        try:
+            with open(dictionary_file_path) as dico:
+                dictionary = cls(json.load(dico))
+                logger.debug('Substitution dictionary loaded (%s).', dictionary_file_path)
+        except Exception:
+            dictionary = cls()
+            logger.warning('Substitution dictionary could not be loaded. Verify output.')
+
+        cls._loaded[key] = (mtime_ns, dictionary)
+
+        return dictionary
+
+    def substitute_and_sanitize(self, something:str) -> str:
+        """
+        Apply substitutions, then escape LaTeX special cases. Memoized.
+        """
+
+        result = self._memo.get(something)
+        if result is None:
+            result = something
+            if self._pattern is not None:
+                result = self._pattern.sub(lambda match: self.substitutions[match.group(0)], result)
+
+            # Special cases and escaping
+            result = result.replace('&', '\\&')
+            result = result.replace(chr(0), '')
+
+            self._memo[something] = result
+
+        return result
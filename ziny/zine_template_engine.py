@@ -0,0 +1,211 @@
+import os
+import string
+import logging
+
+from ziny.zine_image_metadata import ZineImageMetadata
+
+logger = logging.getLogger('Zine Template Engine')
+logger.setLevel(logging.INFO)
+
+
+class ZineTemplateEngine():
+    """
+    Renders the content and index LaTeX fragments of the library from format templates compiled
+    once into Python functions, and renders whole libraries in a single batch.
+    Templates use Python format syntax (LaTeX braces doubled) with the fields of
+    ZineImageMetadata.to_dict(), plus `page` (number or \\pageref) and, for the index,
+    `description_block` (the rendered description template, empty without description).
+    Fields are plain names, with optional conversion and format spec (eg. {iso:>5}).
+    The web content template also has `web_image_path`, the screen resolution version of the image,
+    and any content template `print_image_path`, the print resolution version (see ZineFactory), both
+    named by get_output_file_name(image path) (default: the image file name).
+    Any template can be overridden by a file in a template folder: content.tex.tpl,
+    content_web.tex.tpl, index.tex.tpl, index_description.tex.tpl and index_text.tex.tpl.
+    """
+
+    # Text of an index entry, without the thumbnail (index atlases, see ZineFactory).
+    index_text_template = (
+        "\t\\raggedright\n"
+        "\t\\par \\raisebox{{-0.1\\height}}{{\\faImage[regular]}}~\\textbf{{Photo \\#{id}}}"
+        "$\\cdot$Page~{page} $\\cdot$ {timestamp}\n"
+        "{description_block}"
+        "\t\\par {make} {model}\n"
+        "\t\\par {lens_make} {lens_model}\n"
+        "\t\\par {aperture} $\\cdot$ {speed} $\\cdot$ ISO {iso}\n"
+        "\t\\par {program} $\\cdot$ {metering_mode} Metering {exposure_compensation} stop\n"
+    )
+
+    # Same output as ZineIndexTemplate.
+    index_template = (
+        "\\begin{{minipage}}{{0.25\\textwidth}}\n"
+        "\t\\includegraphics[width=40mm, keepaspectratio]{{{thumbnail_path}}}\n"
+        "\\end{{minipage}}\n"
+        "\\hfill\n"
+        "\\begin{{minipage}}{{0.70\\textwidth}}\n"
+        + index_text_template +
+        "\\end{{minipage}}\n"
+        "\\vspace{{0.5cm}}\n\n"
+    )
+
+    index_description_template = (
+        "\t\\par {description}\n"
+        "\t\\vspace{{0.25cm}}\n"
+    )
+
+    template_file_suffix = '.tex.tpl'
+
+    def __init__(self, content_template:str, index_template:str = None, index_description_template:str = None,
+                 web_content_template:str = None, web_image_folder:str = 'web_images/',
+                 print_image_folder:str = 'print_images/', index_text_template:str = None,
+                 get_output_file_name = None):
+
+        self.content_template = content_template
+        self.index_template = index_template or self.index_template
+        self.index_description_template = index_description_template or self.index_description_template
+        self.index_text_template = index_text_template or self.index_text_template
+        self.web_content_template = web_content_template or content_template
+        self.web_image_folder = web_image_folder
+        self.print_image_folder = print_image_folder
+        self.get_output_file_name = get_output_file_name or os.path.basename
+
+        self._render_content = self.compile_template(self.content_template)
+        self._render_web_content = self.compile_template(self.web_content_template)
+        self._render_index = self.compile_template(self.index_template)
+        self._render_index_description = self.compile_template(self.index_description_template)
+        self._render_index_text = self.compile_template(self.index_text_template)
+
+    @classmethod
+    def from_folder(cls, template_folder:str, content_template:str, web_content_template:str = None,
+                    web_image_folder:str = 'web_images/', print_image_folder:str = 'print_images/',
+                    get_output_file_name = None) -> 'ZineTemplateEngine':
+        """
+        Create an engine using the template files found in the folder, defaults otherwise.
+        """
+
+        templates = dict()
+        for name in ('content', 'content_web', 'index', 'index_description', 'index_text'):
+            template_path = os.path.join(template_folder, name + cls.template_file_suffix)
+            if os.path.exists(template_path):
+                with open(template_path) as template:
+                    templates[name] = template.read()
+                logger.info(f'Using {name} template from `{template_path}`.')
+
+        return cls(
+            templates.get('content', content_template),
+            templates.get('index'),
+            templates.get('index_description'),
+            templates.get('content_web', web_content_template),
+            web_image_folder,
+            print_image_folder,
+            templates.get('index_text'),
+            get_output_file_name
+        )
+
+    def compile_template(self, template:str):
+        """
+        Compile a format template into a function rendering one ZineImageMetadata, reading the
+        fields straight from the metadata attributes. Same output as template.format(**fields).
+        """
+
+        computed_fields = dict(page='_page', description_block='_description_block', web_image_path='_web_image_path',
+                               print_image_path='_print_image_path')
+        conversions = dict(r='repr', s='str', a='ascii')
+
+        parts = list()
+        for literal, field, spec, conversion in string.Formatter().parse(template):
+            if literal:
+                parts.append(repr(literal))
+            if field is None:
+                continue
+
+            if field in computed_fields:
+                value = f'{computed_fields[field]}(meta)'
+            elif field.isidentifier() and field in ZineImageMetadata.__slots__ and not field.startswith('_'):
+                value = f'meta.{field}'
+            else:
+                raise ValueError(f'Unknown template field `{field}`.')
+
+            if '{' in spec:
+                raise ValueError(f'Nested format specifications are not supported (`{field}`).')
+            if conversion:
+                value = f'{conversions[conversion]}({value})'
+
+            parts.append(f'format({value}, {spec!r})')
+
+        source = 'def render(meta):\n    return \'\'.join((' + ', '.join(parts) + ',))\n'
+        namespace = dict(_page=self.get_page, _description_block=self.get_description_block,
+                         _web_image_path=self.get_web_image_path, _print_image_path=self.get_print_image_path)
+        exec(compile(source, '<zine template>', 'exec'), namespace)
+
+        return namespace['render']
+
+    def get_page(self, meta:ZineImageMetadata):
+        """
+        Page number of an image if resolved, page reference otherwise.
+        """
+
+        if meta.page is not None:
+            return meta.page
+
+        return f'\\pageref{{img:{meta.image_path}}}'
+
+    def get_web_image_path(self, meta:ZineImageMetadata) -> str:
+        """
+        Path of the screen resolution version of an image.
+        """
+
+        return os.path.join(self.web_image_folder, self.get_output_file_name(meta.image_path))
+
+    def get_print_image_path(self, meta:ZineImageMetadata) -> str:
+        """
+        Path of the print resolution version of an image.
+        """
+
+        return os.path.join(self.print_image_folder, self.get_output_file_name(meta.image_path))
+
+    def get_description_block(self, meta:ZineImageMetadata) -> str:
+        """
+        Rendered description template, empty if the image has no description.
+        """
+
+        if meta.description:
+            return self._render_index_description(meta)
+
+        return ''
+
+    def render_content(self, meta:ZineImageMetadata) -> str:
+        return self._render_content(meta)
+
+    def render_index(self, meta:ZineImageMetadata) -> str:
+        return self._render_index(meta)
+
+    def render_web_content(self, meta:ZineImageMetadata) -> str:
+        return self._render_web_content(meta)
+
+    def render_content_batch(self, metas) -> list:
+        """
+        Render the content fragments of all images in one go, in order.
+        """
+
+        return list(map(self._render_content, metas))
+
+    def render_web_content_batch(self, metas) -> list:
+        """
+        Render the web content fragments (screen resolution images) of all images in one go, in order.
+        """
+
+        return list(map(self._render_web_content, metas))
+
+    def render_index_batch(self, metas) -> list:
+        """
+        Render the index fragments of all images in one go, in order.
+        """
+
+        return list(map(self._render_index, metas))
+
+    def render_index_text_batch(self, metas) -> list:
+        """
+        Render the index entry texts (without thumbnail) of all images in one go, in order.
+        """
+
+        return list(map(self._render_index_text, metas))
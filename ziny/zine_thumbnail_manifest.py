@@ -0,0 +1,94 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger('Zine Thumbnail Manifest')
+logger.setLevel(logging.INFO)
+
+
+class ZineThumbnailManifest():
+    """
+    Keeps track of how every thumbnail was rendered (source file version, target size,
+    resampling filter and decoding profile) so that only new or modified images need to be rendered again.
+    """
+
+    def __init__(self, manifest_file_path:str):
+
+        self.manifest_file_path = manifest_file_path
+        self.entries = dict()
+
+    def load(self) -> None:
+        """
+        Load the manifest from disk. A missing or broken manifest simply means an empty one.
+        """
+
+        try:
+            with open(self.manifest_file_path) as manifest:
+                self.entries = json.load(manifest)
+                logger.debug('Thumbnail manifest loaded (%s).', self.manifest_file_path)
+        except FileNotFoundError:
+            self.entries = dict()
+        except Exception:
+            logger.warning('Thumbnail manifest could not be loaded. All thumbnails will be generated again.')
+            self.entries = dict()
+
+    def save(self) -> None:
+        """
+        Write the manifest to disk.
+        """
+
+        with open(self.manifest_file_path, 'w') as manifest:
+            json.dump(self.entries, manifest, indent=4, sort_keys=True)
+
+    def get_signature(self, source_path:str, size:tuple, resampling:str, profile:str) -> dict:
+        """
+        Describe the source file version and the rendering settings of a thumbnail.
+        """
+
+        source_stat = os.stat(source_path)
+
+        return dict(
+            source = source_path,
+            source_size = source_stat.st_size,
+            source_mtime_ns = source_stat.st_mtime_ns,
+            size = list(size),
+            resampling = resampling,
+            profile = profile
+        )
+
+    def is_up_to_date(self, thumbnail_path:str, signature:dict) -> bool:
+        """
+        Check whether the thumbnail exists and was rendered from the same source with the same settings.
+        """
+
+        return self.entries.get(thumbnail_path) == signature and os.path.exists(thumbnail_path)
+
+    def record(self, thumbnail_path:str, signature:dict) -> None:
+        """
+        Register a freshly rendered thumbnail.
+        """
+
+        self.entries[thumbnail_path] = signature
+
+    def collect_garbage(self, thumbnail_folder:str, thumbnail_paths:set) -> list:
+        """
+        Delete thumbnails (and manifest entries) which do not belong to the library anymore.
+        Return the list of deleted files.
+        """
+
+        for thumbnail_path in list(self.entries.keys()):
+            if thumbnail_path not in thumbnail_paths:
+                del self.entries[thumbnail_path]
+
+        removed = list()
+        manifest_file_name = os.path.basename(self.manifest_file_path)
+        for file in sorted(os.listdir(thumbnail_folder)):
+            thumbnail_path = os.path.join(thumbnail_folder, file)
+            if file == manifest_file_name or not os.path.isfile(thumbnail_path):
+                continue
+            if thumbnail_path not in thumbnail_paths:
+                os.remove(thumbnail_path)
+                removed.append(thumbnail_path)
+                logger.debug('Orphaned thumbnail `%s` deleted.', thumbnail_path)
+
+        return removed
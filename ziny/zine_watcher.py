@@ -0,0 +1,222 @@
+import os
+import time
+import struct
+import select
+import ctypes
+import ctypes.util
+import logging
+
+logger = logging.getLogger('Zine Watcher')
+logger.setLevel(logging.INFO)
+
+
+class ZineWatcher():
+    """
+    Watches folders (recursively) and single files for changes, and reports the changed file paths
+    once things calm down: events are collected until nothing happened for `debounce` seconds,
+    so that a bulk copy results in a single update.
+    Uses inotify on Linux, and falls back to polling the file sizes and modification times elsewhere.
+    Paths are reported the way os.walk builds them (eg. images/001.jpg for the folder images/).
+    When the inotify event queue overflows, events are lost: every watched file is then reported.
+    """
+
+    # inotify(7) constants.
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+    IN_NONBLOCK = 0o4000
+
+    watch_mask = IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    event_header = struct.Struct('iIII')
+
+    def __init__(self, paths:list, debounce:float = 0.5, poll_interval:float = 1.0, use_inotify:bool = True):
+
+        self.folders = [path for path in paths if os.path.isdir(path)]
+        self.files = {os.path.normpath(path) for path in paths if path not in self.folders}
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+
+        self._fd = None
+        self._watches = dict() # Watch descriptor -> folder
+        self._snapshot = dict()
+
+        if use_inotify:
+            try:
+                self._start_inotify()
+            except (OSError, AttributeError) as err:
+                logger.debug('inotify not available, polling instead. %s', err)
+                self.close()
+
+        if self._fd is None:
+            self._snapshot = self.take_snapshot()
+
+        logger.debug('Watching %s with %s.', ', '.join(self.folders + sorted(self.files)),
+                     'inotify' if self._fd is not None else 'polling')
+
+    def _start_inotify(self) -> None:
+        """
+        Set up inotify watches on every watched folder and subfolder, and on the folders of the watched files.
+        """
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_CLOEXEC | self.IN_NONBLOCK)
+        if self._fd < 0:
+            self._fd = None
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+        self._watch_folders()
+        for path in self.files:
+            self._add_watch(os.path.dirname(path) or '.')
+
+    def _watch_folders(self) -> None:
+        """
+        Watch every folder and subfolder of the watched folders not watched yet.
+        """
+
+        for folder in self.folders:
+            for root, _, _ in os.walk(folder):
+                self._add_watch(root)
+
+    def _add_watch(self, folder:str) -> None:
+        """
+        Watch one folder (not recursive), unless already watched.
+        """
+
+        if folder in self._watches.values():
+            return
+
+        descriptor = self._libc.inotify_add_watch(self._fd, os.fsencode(folder), self.watch_mask)
+        if descriptor < 0:
+            raise OSError(ctypes.get_errno(), f'{folder}: {os.strerror(ctypes.get_errno())}')
+
+        self._watches[descriptor] = folder
+
+    def close(self) -> None:
+        """
+        Stop watching (inotify).
+        """
+
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._watches.clear()
+
+    def is_watched(self, path:str) -> bool:
+        """
+        Check whether a path is a watched file, or inside a watched folder.
+        """
+
+        return os.path.normpath(path) in self.files or any(
+            os.path.commonpath([os.path.abspath(path), os.path.abspath(folder)]) == os.path.abspath(folder)
+            for folder in self.folders
+        )
+
+    def wait_for_changes(self) -> set:
+        """
+        Block until something changed, then until nothing changed for `debounce` seconds.
+        Return the changed (created, modified, moved or deleted) file paths.
+        """
+
+        changed = set()
+        while not changed:
+            changed |= self._wait(None)
+
+        while True:
+            more = self._wait(self.debounce)
+            if not more:
+                return changed
+            changed |= more
+
+    def _wait(self, timeout:float) -> set:
+        """
+        Return the paths changed within the timeout (None: until the next event for inotify,
+        one polling interval for polling).
+        """
+
+        if self._fd is None:
+            time.sleep(self.poll_interval if timeout is None else timeout)
+            snapshot = self.take_snapshot()
+            changed = {
+                path for path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            return changed
+
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        return self._read_events()
+
+    def _read_events(self) -> set:
+        """
+        Decode the pending inotify events. New folders are watched right away, and the files
+        they already contain are reported as changed. After a queue overflow, every watched file
+        is reported (full rescan), and the folders created meanwhile are watched.
+        """
+
+        changed = set()
+        try:
+            buffer = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        overflowed = False
+        while offset < len(buffer):
+            descriptor, mask, _, length = self.event_header.unpack_from(buffer, offset)
+            offset += self.event_header.size
+            name = os.fsdecode(buffer[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & self.IN_Q_OVERFLOW:
+                overflowed = True
+                continue
+
+            folder = self._watches.get(descriptor)
+            if folder is None or not name:
+                continue
+
+            path = os.path.join(folder, name)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO) and self.is_watched(path):
+                    for root, _, files in os.walk(path):
+                        self._add_watch(root)
+                        changed.update(os.path.join(root, file) for file in files)
+                continue
+
+            if os.path.normpath(path) in self.files:
+                changed.add(os.path.normpath(path))
+            elif self.is_watched(path):
+                changed.add(path)
+
+        if overflowed:
+            logger.warning('Too many changes at once, some were missed. Rescanning every watched file.')
+            self._watch_folders()
+            changed.update(self.take_snapshot())
+
+        return changed
+
+    def take_snapshot(self) -> dict:
+        """
+        Size and modification time of every watched file.
+        """
+
+        snapshot = dict()
+        paths = [os.path.join(root, file) for folder in self.folders for root, _, files in os.walk(folder) for file in files]
+        for path in paths + sorted(self.files):
+            try:
+                stat = os.stat(path)
+                snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                pass
+
+        return snapshot